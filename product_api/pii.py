@@ -1,9 +1,18 @@
 """PII scanning utilities for phone/email/ID18 detection."""
 
 import json
+import os
 import re
 from typing import Any
 
+# orjson is optional; FDO_JSON_BACKEND=json forces the stdlib encoder (as in src/fast_json.py).
+orjson = None
+if os.environ.get("FDO_JSON_BACKEND") in (None, "", "orjson"):
+    try:
+        import orjson
+    except ImportError:
+        pass
+
 PHONE_RE = re.compile(r"(?<!\d)(1[3-9]\d{9})(?!\d)")
 EMAIL_RE = re.compile(r"([a-zA-Z0-9_.+\-]+@[a-zA-Z0-9\-]+\.[a-zA-Z0-9\-.]+)")
 ID18_RE = re.compile(r"(?<!\d)(\d{17}[\dXx])(?!\d)")
@@ -11,6 +20,11 @@ ID18_RE = re.compile(r"(?<!\d)(\d{17}[\dXx])(?!\d)")
 
 def _record_to_text(record: dict[str, Any]) -> str:
     """Serialize a record into scanable text."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(record).decode()
+        except TypeError:
+            pass  # ints past 64 bits, non-str keys, ...: the stdlib encoder takes those
     try:
         return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
     except (TypeError, ValueError):
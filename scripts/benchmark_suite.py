@@ -0,0 +1,391 @@
+"""
+Python performance suite: gate, DOIP repository, PII scanner, parsers,
+entropy metrics and dashboard API handlers, measured on pinned synthetic
+datasets.
+
+Each benchmark is calibrated so one round lasts at least --min-time, then
+timed for --rounds rounds; the median per-item time is what gets saved and
+compared. Groups whose dependencies are missing (numpy, pandas, httpx for
+FastAPI's TestClient, ...) are reported as skipped, not faked. -k selects by
+benchmark name before any setup runs, so unselected groups build nothing,
+and files a group writes are removed once its benchmarks finish.
+
+    python scripts/benchmark_suite.py                          # run and print
+    python scripts/benchmark_suite.py --save baseline.json     # write a baseline
+    python scripts/benchmark_suite.py --compare baseline.json  # exit 1 on regression
+    python scripts/benchmark_suite.py -k gate -k pii           # only matching names
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.join(script_dir, "..")
+sys.path.append(os.path.join(repo_root, "src"))
+sys.path.append(repo_root)
+
+# Pin the dashboard's demo data so every run measures the same work.
+os.environ.setdefault("DATA_MODE", "demo")
+os.environ.setdefault("DEMO_SEED", "2026")
+os.environ.setdefault("SIM_START_DATE", "2026-01-01")
+
+DATASET_SEED = 20260101
+GATE_EPOCH_MS = 1_700_000_000_000 & 0xFFFFFFFF
+GATE_PACKETS = 20000
+PII_RECORDS = 2000
+PARSER_ROWS = 2000
+DOIP_OBJECTS = 2000
+API_PATHS = (
+    "/api/v1/overview",
+    "/api/v1/trends",
+    "/api/v1/alerts",
+    "/api/v1/risk-map",
+    "/api/v1/leader-summary",
+    "/api/v1/entropy/status",
+    "/api/v1/risk/overview",
+)
+
+BENCHMARKS = []
+
+
+def group(name, *bench_names):
+    """
+    Register a setup function for the benchmarks `bench_names`. It is called
+    with an ExitStack that is closed after the group has run (for temporary
+    files and the like) and returns [(bench_name, items, callable), ...].
+    """
+    def register(setup):
+        BENCHMARKS.append((name, bench_names, setup))
+        return setup
+    return register
+
+
+@group(
+    "gate",
+    "gate.process_packet",
+    "gate.arbitrate",
+    "gate.validate_batch[list]",
+    "gate.validate_batch[buffer]",
+    "gate_vector.validate_buffer",
+)
+def gate_benchmarks(resources):
+    from fdo_gate import FDOGate
+    from gate_clock import SimulatedClock
+
+    rng = random.Random(DATASET_SEED)
+    gate = FDOGate(clock=SimulatedClock(GATE_EPOCH_MS))
+    policy_ids = [rng.choice([0x01, 0x02, 0x03, 0x04, 0xFF]) for _ in range(GATE_PACKETS)]
+    payloads = [rng.randbytes(rng.randrange(0, 48)) for _ in range(GATE_PACKETS)]
+    buffer, offsets = gate.create_packets(0xFD01, policy_ids, payloads)
+    for i in range(0, GATE_PACKETS, 10):
+        buffer[offsets[i]] ^= 0x01  # checksum failures
+    buffer = bytes(buffer)
+    packets = [buffer[offsets[i]:offsets[i + 1]] for i in range(GATE_PACKETS)]
+
+    def process_packet():
+        for packet in packets:
+            gate.process_packet(packet)
+
+    def arbitrate():
+        for packet in packets:
+            gate.arbitrate(packet)
+
+    benches = [
+        ("gate.process_packet", GATE_PACKETS, process_packet),
+        ("gate.arbitrate", GATE_PACKETS, arbitrate),
+        ("gate.validate_batch[list]", GATE_PACKETS, lambda: gate.validate_batch(packets)),
+        ("gate.validate_batch[buffer]", GATE_PACKETS, lambda: gate.validate_batch(buffer, offsets)),
+    ]
+    try:
+        import gate_vector
+    except ImportError:
+        return benches
+    benches.append((
+        "gate_vector.validate_buffer", GATE_PACKETS,
+        lambda: gate_vector.validate_buffer(gate, buffer, offsets),
+    ))
+    return benches
+
+
+@group(
+    "doip",
+    "doip.retrieve",
+    "doip.retrieve[json bytes]",
+    "doip.update[shared attributes]",
+    "doip.create+delete",
+    "doip.search",
+)
+def doip_benchmarks(resources):
+    import fast_json
+    from doip_segments.repository import DoipRepository
+
+    rng = random.Random(DATASET_SEED)
+    service = "21.T/bench"
+    repo = DoipRepository(service)
+    types = ["Document", "Dataset", "Image", "Person"]
+    ids = [f"21.T/obj-{i}" for i in range(DOIP_OBJECTS)]
+    for i, object_id in enumerate(ids):
+        repo.handle({
+            "operationId": "0.DOIP/Op.Create", "targetId": service,
+            "input": {"id": object_id, "type": types[i % len(types)],
+                      "attributes": {"title": f"object {i}", "year": 1990 + rng.randrange(35),
+                                     "meta": {"lang": rng.choice(["en", "de", "zh"])}},
+                      "elements": [{"id": "file", "type": "application/octet-stream"}]}},
+            element_data={"file": rng.randbytes(256)},
+        )
+    retrieves = [{"operationId": "0.DOIP/Op.Retrieve", "targetId": object_id} for object_id in ids]
+    raw_retrieves = [fast_json.dumps(request) for request in retrieves]
+    updates = [
+        {"operationId": "0.DOIP/Op.Update", "targetId": object_id,
+         "input": {"id": object_id, "type": types[i % len(types)], "elements": [{"id": "file"}]}}
+        for i, object_id in enumerate(ids)
+    ]
+    searches = [
+        {"operationId": "0.DOIP/Op.Search", "targetId": service,
+         "attributes": {"query": query, "pageSize": 20, "type": "id"}}
+        for query in ("type:Dataset", "meta.lang:de", "type:Image year:20*", "object 7")
+    ]
+    scratch = [{"operationId": "0.DOIP/Op.Create", "targetId": service,
+                "input": {"id": f"21.T/scratch-{i}", "type": "Scratch", "attributes": {"n": i}}}
+               for i in range(DOIP_OBJECTS)]
+    deletes = [{"operationId": "0.DOIP/Op.Delete", "targetId": f"21.T/scratch-{i}"} for i in range(DOIP_OBJECTS)]
+
+    def run(requests):
+        for request in requests:
+            repo.handle(request)
+
+    def create_delete():
+        run(scratch)
+        run(deletes)
+
+    return [
+        ("doip.retrieve", DOIP_OBJECTS, lambda: run(retrieves)),
+        ("doip.retrieve[json bytes]", DOIP_OBJECTS, lambda: run(raw_retrieves)),
+        ("doip.update[shared attributes]", DOIP_OBJECTS, lambda: run(updates)),
+        ("doip.create+delete", DOIP_OBJECTS, create_delete),
+        ("doip.search", len(searches), lambda: run(searches)),
+    ]
+
+
+def _pii_records(count):
+    rng = random.Random(DATASET_SEED)
+    records = []
+    for i in range(count):
+        content = {
+            "name": f"user{i}",
+            "note": " ".join(rng.choice(["alpha", "beta", "gamma", "delta"]) for _ in range(12)),
+            "amount": rng.randrange(100000),
+        }
+        if i % 3 == 0:
+            content["phone"] = f"1{rng.randrange(3, 10)}{rng.randrange(10**9):09d}"
+        if i % 4 == 0:
+            content["email"] = f"user{i}@example.com"
+        if i % 7 == 0:
+            content["id"] = f"{rng.randrange(10**17):017d}X"
+        records.append({
+            "source_type": "json",
+            "record_id": f"rec-{i}",
+            "content": content,
+            "metadata": {"item_index": i},
+        })
+    return records
+
+
+@group("pii", "pii.scan_records")
+def pii_benchmarks(resources):
+    from product_api.pii import scan_records
+
+    records = _pii_records(PII_RECORDS)
+    return [("pii.scan_records", PII_RECORDS, lambda: scan_records(records))]
+
+
+@group("parser", "parser.parse_csv", "parser.parse_json", "parser.parse_txt")
+def parser_benchmarks(resources):
+    from product_api.parser import parse_csv, parse_json, parse_txt
+
+    records = _pii_records(PARSER_ROWS)
+    rows = [r["content"] for r in records]
+    workdir = resources.enter_context(tempfile.TemporaryDirectory(prefix="fdo-bench-"))
+    csv_path = os.path.join(workdir, "records.csv")
+    json_path = os.path.join(workdir, "records.json")
+    txt_path = os.path.join(workdir, "records.txt")
+    columns = ["name", "note", "amount", "phone", "email", "id"]
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.write(",".join(columns) + "\n")
+        for row in rows:
+            f.write(",".join(str(row.get(c, "")) for c in columns) + "\n")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False)
+    with open(txt_path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return [
+        ("parser.parse_csv", PARSER_ROWS, lambda: parse_csv(csv_path, "records.csv")),
+        ("parser.parse_json", PARSER_ROWS, lambda: parse_json(json_path, "records.json")),
+        ("parser.parse_txt", PARSER_ROWS, lambda: parse_txt(txt_path, "records.txt")),
+    ]
+
+
+@group("metabolism", "metabolism.calculate_total_entropy")
+def metabolism_benchmarks(resources):
+    from product_api.metabolism.metrics import calculate_total_entropy
+
+    return [("metabolism.calculate_total_entropy", 1, calculate_total_entropy)]
+
+
+@group("api", *(f"api GET {path}" for path in API_PATHS))
+def api_benchmarks(resources):
+    # Starlette's TestClient raises RuntimeError, not ImportError, without httpx.
+    import httpx  # noqa: F401
+    from fastapi.testclient import TestClient
+    from product_api.app import app
+
+    client = TestClient(app)
+    benches = []
+    for path in API_PATHS:
+        def get(path=path):
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} -> {response.status_code}")
+        benches.append((f"api GET {path}", 1, get))
+    return benches
+
+
+def measure(func, items, rounds, min_time):
+    """Calibrate iterations per round to >= min_time, then time `rounds` rounds."""
+    func()
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or iterations >= 1 << 20:
+            break
+        iterations *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        samples.append((time.perf_counter() - start) / (iterations * items))
+    median = statistics.median(samples)
+    return {
+        "items": items,
+        "iterations": iterations,
+        "rounds": rounds,
+        "min_s": min(samples),
+        "median_s": median,
+        "mean_s": statistics.fmean(samples),
+        "stddev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "items_per_s": 1.0 / median if median else 0.0,
+    }
+
+
+def _selected(bench_name, selected):
+    return not selected or any(pattern in bench_name for pattern in selected)
+
+
+def run_suite(selected, rounds, min_time):
+    results = {}
+    skipped = {}
+    for name, bench_names, setup in BENCHMARKS:
+        if not any(_selected(bench_name, selected) for bench_name in bench_names):
+            continue
+        with contextlib.ExitStack() as resources:
+            try:
+                benches = setup(resources)
+            except ImportError as exc:
+                skipped[name] = f"missing dependency: {exc}"
+                continue
+            except Exception as exc:  # setup failures are reported, not fatal
+                skipped[name] = f"setup failed: {exc!r}"
+                continue
+            for bench_name, items, func in benches:
+                if not _selected(bench_name, selected):
+                    continue
+                results[bench_name] = measure(func, items, rounds, min_time)
+                stats = results[bench_name]
+                print(
+                    f"{bench_name:40s} {stats['median_s'] * 1e9:12,.0f} ns/item"
+                    f" {stats['items_per_s']:14,.0f} items/s  (±{stats['stddev_s'] / stats['median_s'] * 100:4.1f}%)",
+                    flush=True,
+                )
+    for name, reason in skipped.items():
+        print(f"{name + ' (skipped)':40s} {reason}")
+    return results, skipped
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print per-benchmark deltas against a baseline; return the regressed names."""
+    regressions = []
+    if baseline.get("environment") != environment():
+        print("note: baseline was recorded on a different environment")
+    print(f"\n{'benchmark':40s} {'baseline':>14s} {'current':>14s} {'change':>8s}")
+    for name, stats in results.items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            print(f"{name:40s} {'-':>14s} {stats['median_s'] * 1e9:11,.0f} ns {'new':>8s}")
+            continue
+        change = stats["median_s"] / base["median_s"] - 1.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:40s} {base['median_s'] * 1e9:11,.0f} ns {stats['median_s'] * 1e9:11,.0f} ns"
+            f" {change * 100:+7.1f}%{flag}"
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Python performance suite")
+    parser.add_argument("-k", dest="select", action="append", default=[],
+                        help="only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per round (after calibration)")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="compare against a JSON baseline; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed median slowdown before a benchmark counts as regressed")
+    args = parser.parse_args(argv)
+
+    results, skipped = run_suite(args.select, args.rounds, args.min_time)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(
+                {"environment": environment(), "benchmarks": results, "skipped": skipped},
+                f, indent=2, sort_keys=True,
+            )
+        print(f"baseline written to {args.save}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "src"))
+
+from fdo_gate import MappedMsBVTable, load_policy_table, write_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a policy dictionary into an MsBV snapshot")
+    parser.add_argument("policy_file", help="Policy_Dictionary.json (or an existing snapshot)")
+    parser.add_argument("-o", "--output", help="snapshot path (default: <policy_file>.msbv)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.policy_file)[0] + ".msbv"
+    start = time.perf_counter()
+    table = load_policy_table(args.policy_file)
+    compiled = time.perf_counter()
+    write_snapshot(table, output)
+    written = time.perf_counter()
+    MappedMsBVTable(output)
+    mapped = time.perf_counter()
+
+    print(f"Policies: {len(table)}")
+    print(f"Compile: {(compiled - start) * 1000:.2f} ms | Write: {(written - compiled) * 1000:.2f} ms"
+          f" | Map+verify: {(mapped - written) * 1000:.2f} ms")
+    print(f"Snapshot written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""
+pytest setup for the checks in scripts/: the gate modules in src/ import
+each other as top-level modules, so src/ goes on sys.path (each check does
+the same when run as a script).
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")))
@@ -0,0 +1,103 @@
+"""
+Import-time benchmark for the generated DOIP segment models.
+
+Each scenario runs in a fresh interpreter (bytecode caches on) and reports
+the median wall time of its import block over --runs:
+
+- pydantic: `from pydantic import BaseModel` alone (the floor for any model)
+- eager:    import every src/doip_segments model module up front
+- package:  `import doip_segments` only (lazy loader, no schemas built)
+- touch:    lazy import of the two models a Retrieve/Search handler needs
+- dispatch: package + registry validating one Retrieve and one Search segment
+- all:      lazy access to every segment model (worst case for the loader)
+
+    python scripts/doip_import_benchmark.py
+    python scripts/doip_import_benchmark.py --runs 21 --importtime
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(script_dir, "..", "src"))
+
+SCENARIOS = {
+    "pydantic": "from pydantic import BaseModel\n",
+    "eager": (
+        "import glob, importlib, os\n"
+        "for path in sorted(glob.glob(os.path.join('doip_segments', '*_re*.py'))):\n"
+        "    importlib.import_module('doip_segments.' + os.path.basename(path)[:-3])\n"
+    ),
+    "package": "import doip_segments\n",
+    "touch": "from doip_segments import RetrieveRequest, SearchRequest\n",
+    "dispatch": (
+        "from doip_segments.registry import validate_request\n"
+        "validate_request({'operationId': '0.DOIP/Op.Retrieve', 'targetId': '21.T/x'})\n"
+        "validate_request({'operationId': '0.DOIP/Op.Search', 'targetId': '21.T/x', 'attributes': {'query': 'q'}})\n"
+    ),
+    "all": "import doip_segments\nfor name in doip_segments.__all__:\n    getattr(doip_segments, name)\n",
+}
+
+TIMER = (
+    "import time, sys\n"
+    "start = time.perf_counter()\n"
+    "{body}"
+    "elapsed = time.perf_counter() - start\n"
+    "print(elapsed, sum(m.startswith('doip_segments.') for m in sys.modules))\n"
+)
+
+
+def run_scenario(body, runs):
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    code = TIMER.format(body=body)
+    times = []
+    modules = 0
+    for _ in range(runs + 1):  # the first run also writes any missing bytecode
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=src_dir, env=env, capture_output=True, text=True, check=True
+        )
+        elapsed, modules = result.stdout.split()
+        times.append(float(elapsed))
+    return statistics.median(times[1:]), int(modules)
+
+
+def importtime_top(body, limit=8):
+    """Slowest imports (cumulative) reported by -X importtime for one scenario."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", body], cwd=src_dir, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        fields = line[len("import time:"):].split("|")
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            rows.append((int(fields[1]), fields[2].rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DOIP segment model import-time benchmark")
+    parser.add_argument("--runs", type=int, default=11)
+    parser.add_argument("--importtime", action="store_true", help="also show -X importtime hot spots")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, body in SCENARIOS.items():
+        median, modules = run_scenario(body, args.runs)
+        results[name] = {"median_ms": median * 1e3, "model_modules": modules}
+        print(f"{name:10s} {median * 1e3:8.1f} ms   {modules:3d} model modules imported", flush=True)
+        if args.importtime:
+            for cumulative_us, module in importtime_top(body):
+                print(f"{'':10s} {cumulative_us / 1e3:8.1f} ms   {module}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
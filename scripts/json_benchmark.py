@@ -0,0 +1,165 @@
+"""
+JSON backend benchmark: every backend src/fast_json.py can load here, on the
+payloads our hot paths actually carry.
+
+- doip[small|medium|large]: a Create request segment with 1 / 20 / 500
+  elements and attributes (~350 B / ~3 KB / ~65 KB);
+- mcp[validate_segments]: a JSON-RPC tools/call with 256 hex packets, and
+  its response;
+- pii[record]: one parsed upload record as pii._record_to_text sees it.
+
+Each payload is timed through dumps and loads per backend. DOIP segments are
+also timed end to end through three validation paths: pydantic's
+validate_json on the bytes, pydantic_core.from_json + validate_python, and
+the registry path (fast_json.loads + validate_python). Dumping is timed as
+stdlib json.dumps(model_dump()) against registry.dump_segment. Times are
+medians, in µs per payload.
+
+    python scripts/json_benchmark.py
+    python scripts/json_benchmark.py --rounds 9 --json results.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "src"))
+
+import fast_json  # noqa: E402
+
+SEED = 20260101
+DOIP_SIZES = {"small": 1, "medium": 20, "large": 500}
+
+
+def doip_segment(elements):
+    return {
+        "operationId": "0.DOIP/Op.Create",
+        "targetId": "21.T/service",
+        "requestId": "req-0001",
+        "authentication": {"token": "c2VjcmV0"},
+        "input": {
+            "id": "21.T/do-0001",
+            "type": "0.TYPE/DO",
+            "attributes": {
+                "title": "benchmark object",
+                "keywords": [f"keyword-{i}" for i in range(elements)],
+                "metadata": {f"field{i}": f"value {i} — ünïcode" for i in range(elements)},
+            },
+            "elements": [
+                {"id": f"element-{i}", "length": str(i * 4096), "type": "application/octet-stream",
+                 "attributes": {"checksum": f"{i:064x}", "index": i}}
+                for i in range(elements)
+            ],
+        },
+    }
+
+
+def mcp_messages():
+    rng = random.Random(SEED)
+    packets = [rng.randbytes(32).hex() for _ in range(256)]
+    request = {"jsonrpc": "2.0", "id": 42, "method": "tools/call",
+               "params": {"name": "validate_segments", "arguments": {"packets": packets}}}
+    result = {"count": 256, "forwarded": 200, "verdicts": [rng.randrange(6) for _ in range(256)]}
+    response = {"jsonrpc": "2.0", "id": 42,
+                "result": {"content": [{"type": "text", "text": json.dumps(result, separators=(",", ":"))}]}}
+    return request, response
+
+
+def pii_record():
+    return {
+        "source_type": "json",
+        "record_id": "rec-17",
+        "content": {"name": "张三", "phone": "13812345678", "email": "user17@example.com",
+                    "note": " ".join(["alpha", "beta", "gamma"] * 8), "amount": 12345},
+        "metadata": {"item_index": 17},
+    }
+
+
+def median_us(func, rounds, min_time=0.02):
+    func()
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        if time.perf_counter() - start >= min_time:
+            break
+        iterations *= 2
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+    return statistics.median(samples)
+
+
+def backends():
+    available = []
+    for name in fast_json.BACKENDS:
+        try:
+            available.append(fast_json.get_backend(name))
+        except ImportError:
+            print(f"{name}: not installed, skipped")
+    return available
+
+
+def codec_results(payloads, rounds):
+    results = {}
+    for backend in backends():
+        for label, value in payloads.items():
+            data = backend.dumps(value)
+            results[f"{label} dumps [{backend.name}]"] = median_us(lambda: backend.dumps(value), rounds)
+            results[f"{label} loads [{backend.name}]"] = median_us(lambda: backend.loads(data), rounds)
+    return results
+
+
+def doip_results(rounds):
+    from pydantic_core import from_json
+
+    from doip_segments.registry import dump_segment, request_adapter, validate_request
+
+    adapter = request_adapter("0.DOIP/Op.Create")
+    results = {}
+    for size, elements in DOIP_SIZES.items():
+        data = fast_json.dumps(doip_segment(elements))
+        model = validate_request(data)
+        label = f"doip[{size}]"
+        results[f"{label} validate_json"] = median_us(lambda: adapter.validate_json(data), rounds)
+        results[f"{label} from_json+validate"] = median_us(lambda: adapter.validate_python(from_json(data)), rounds)
+        results[f"{label} registry.validate_request"] = median_us(lambda: validate_request(data), rounds)
+        results[f"{label} json.dumps(model_dump())"] = median_us(
+            lambda: json.dumps(model.model_dump(exclude_none=True), separators=(",", ":")).encode(), rounds)
+        results[f"{label} registry.dump_segment"] = median_us(lambda: dump_segment(model), rounds)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON backend benchmark")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    request, response = mcp_messages()
+    payloads = {f"doip[{size}]": doip_segment(n) for size, n in DOIP_SIZES.items()}
+    payloads.update({"mcp[request]": request, "mcp[response]": response, "pii[record]": pii_record()})
+    for label, value in payloads.items():
+        print(f"{label:14s} {len(fast_json.dumps(value)):8,d} bytes")
+    print(f"default backend: {fast_json.BACKEND.name}\n")
+
+    results = codec_results(payloads, args.rounds)
+    results.update(doip_results(args.rounds))
+    for name, us in results.items():
+        print(f"{name:48s} {us:10.2f} µs")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"backend": fast_json.BACKEND.name, "median_us": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,15 @@ import os
 import struct
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(os.path.join(script_dir, "mcp-server"))
+sys.path.append(os.path.join(script_dir, "..", "src"))
 
-from fdo_gate import FDOGate
+from fdo_gate import FDOGate, ReplayFilter
+from gate_clock import SimulatedClock
 
 def replay_attack_sim():
     print(">>> Starting Replay Attack Simulation...")
-    gate = FDOGate()
+    clock = SimulatedClock()
+    gate = FDOGate(clock=clock)
     
     # 1. Generate a valid packet at current time
     magic = 0xFD01
@@ -28,6 +30,21 @@ def replay_attack_sim():
         print("Error: Valid packet failed initial check!")
         return
 
+    # SCENARIO B: In-window Replay (exact same bits, inside the ±2000 ms drift window)
+    # Stage 2 drift validation alone accepts this; the replay filter must catch it.
+    print("Replaying original packet immediately (in-window replay)...")
+    guarded = FDOGate(replay_filter=ReplayFilter(), clock=clock)
+    guarded.process_packet(valid_packet)
+    res_inwindow = guarded.process_packet(valid_packet)
+    print(f"In-window Replay Result: {res_inwindow}")
+    inwindow_blocked = (
+        res_inwindow['status'] == 'dropped' and "Epoch Replay/Duplicate" in res_inwindow['reason']
+    )
+    if inwindow_blocked:
+        print("✅ SUCCESS: In-window replay blocked by replay filter.")
+    else:
+        print("❌ FAILURE: In-window replay was NOT blocked!")
+
     # 2. Wait for 2.5 seconds (simulated)
     # Since we can't easily wait 2.5s in unit test without sleep, and we want to control the time check logic,
     # let's modify the timestamp in the packet to be 2.5s OLDER than current time.
@@ -50,10 +67,10 @@ def replay_attack_sim():
     # BUT a replay attack implies re-sending the EXACT same captured packet at a later time.
     
     # SCENARIO A: Strict Replay (Exact same bits)
-    # If we wait 3 seconds real time, the gate's `time.time()` will advance.
-    # Let's try to actually sleep? 3s is short enough.
-    print("Sleeping for 3 seconds to simulate network delay/replay window expiry...")
-    time.sleep(3.0)
+    # The gate reads a simulated clock, so advancing it by 3 seconds is
+    # equivalent to waiting 3 seconds of real time before the replay.
+    print("Advancing the gate clock by 3 seconds to simulate network delay/replay window expiry...")
+    clock.advance(3000)
     
     print("Replaying original packet at T+3s...")
     # Process the ORIGINAL packet again
@@ -62,7 +79,7 @@ def replay_attack_sim():
     print(f"Replay Result: {res_replay}")
     
     success = False
-    if res_replay['status'] == 'dropped' and "Timestamp Replay/Expired" in res_replay['reason']:
+    if res_replay['status'] == 'dropped' and "Epoch Replay/Expired" in res_replay['reason']:
         print("✅ SUCCESS: Replay attack blocked by Sliding Window Timestamp.")
         success = True
     else:
@@ -73,6 +90,8 @@ def replay_attack_sim():
         f.write(f"Replay Attack Test\n")
         f.write(f"Status: {'BLOCKED' if success else 'FAILED'}\n")
         f.write(f"Reason: {res_replay.get('reason', 'N/A')}\n")
+        f.write(f"In-window Replay: {'BLOCKED' if inwindow_blocked else 'FAILED'}\n")
+        f.write(f"In-window Reason: {res_inwindow.get('reason', 'N/A')}\n")
 
 if __name__ == "__main__":
     replay_attack_sim()
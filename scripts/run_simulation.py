@@ -28,7 +28,8 @@ def send_request(proc, method, params=None, req_id=1):
 def run_simulation():
     print(">>> Starting Active FDO Defense Simulation (MCP Mode)...")
     
-    server_script = "mcp_server.py"
+    # -m loads the server from __pycache__ instead of compiling the script per spawn
+    server_module = "mcp_server"
     # Use path relative to this script file to ensure it works from any working directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     # The new location is FDO_Project/src
@@ -39,9 +40,15 @@ def run_simulation():
          print(f"Error: Server directory not found at {server_dir}")
          return
 
+    server_args = [sys.executable, "-m", server_module]
+    socket_path = os.environ.get("FDO_MCP_SOCKET")
+    if socket_path:
+        # Attach to a resident `mcp_server.py --listen` (shared gate, no per-run warm-up)
+        server_args += ["--connect", socket_path]
+
     # Start the MCP Server process
     proc = subprocess.Popen(
-        [sys.executable, server_script],
+        server_args,
         stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
         stderr=sys.stderr, # Pass stderr through to see logs
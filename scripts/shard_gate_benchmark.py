@@ -0,0 +1,95 @@
+"""
+Sharded gate benchmark: ShardedGate against a single-process FDOGate.
+
+Both gates read one SimulatedClock, so every packet is judged against the
+same instant however long the single-process pass takes, and the verdicts
+must match exactly. Then checks the Atomic Epoch Switch across shards and
+reports throughput for list input and for one buffer split by offsets.
+When the machine has at least as many cores as workers, the run fails
+(exit 1) if the sharded buffer path is not --min-speedup times faster.
+
+    python scripts/shard_gate_benchmark.py
+    python scripts/shard_gate_benchmark.py 1000000 8 --min-speedup 3
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "src"))
+
+from fdo_gate import FDOGate, VERDICT_FORWARDED, VERDICT_POLICY_REJECTED  # noqa: E402
+from gate_clock import SimulatedClock  # noqa: E402
+from gate_shard import ShardedGate  # noqa: E402
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(count=400000, workers=4, min_speedup=1.5):
+    print(f">>> Sharded Gate Benchmark ({count} packets, {workers} workers)...")
+    clock = SimulatedClock()
+    gate = FDOGate(clock=clock)
+    packets = [
+        gate.create_packet(0xFD01, i, random.choice([0x01, 0x02, 0x03, 0x04, 0xFF]), os.urandom(32))
+        for i in range(count)
+    ]
+    buffer = b"".join(packets)
+    offsets = list(range(0, len(buffer) + 1, len(packets[0])))
+
+    expected, single = _timed(gate.validate_batch, packets)
+    _, single_buffer = _timed(gate.validate_batch, buffer, offsets)
+    failed = False
+
+    with ShardedGate(workers=workers, shard_key="policy", clock=clock) as sharded:
+        sharded.validate_batch(packets[:1000])  # warm up workers
+        verdicts, parallel = _timed(sharded.validate_batch, packets)
+        buffer_verdicts, parallel_buffer = _timed(sharded.validate_batch, buffer, offsets)
+        if verdicts != expected or buffer_verdicts != expected:
+            print("❌ FAILURE: sharded verdicts diverge from FDOGate.validate_batch")
+            sys.exit(1)
+        print("Verdict parity with single-process gate: CONFIRMED")
+
+        # Atomic Epoch Switch: revoke policy 0x01 in every worker at once.
+        sharded.atomic_epoch_switch({0x02: 1, 0x03: 2, 0x04: 3})
+        probe = [gate.create_packet(0xFD01, i, 0x01, os.urandom(4)) for i in range(workers * 64)]
+        after = sharded.validate_batch(probe)
+        switched = all(v == VERDICT_POLICY_REJECTED for v in after)
+        print(f"Atomic Epoch Switch across shards: {'CONFIRMED' if switched else 'FAILED'}")
+        failed |= not switched
+
+    for label, base, sharded_time in (("list", single, parallel), ("buffer", single_buffer, parallel_buffer)):
+        print(f"{label:6s} single process  {count / base:12,.0f} packets/s")
+        print(f"{label:6s} {workers} shards        {count / sharded_time:12,.0f} packets/s"
+              f"  ({base / sharded_time:.2f}x)")
+    print(f"forwarded: {sum(1 for v in verdicts if v == VERDICT_FORWARDED)}")
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    speedup = single_buffer / parallel_buffer
+    if cores < workers:
+        print(f"speedup check skipped: {cores} core(s) for {workers} workers")
+    elif speedup < min_speedup:
+        print(f"❌ FAILURE: {speedup:.2f}x with {workers} shards < {min_speedup}x")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded gate benchmark")
+    parser.add_argument("count", nargs="?", type=int, default=400000)
+    parser.add_argument("workers", nargs="?", type=int, default=4)
+    parser.add_argument("--min-speedup", type=float, default=1.5,
+                        help="required buffer-path speedup when cores >= workers")
+    args = parser.parse_args(argv)
+    run_benchmark(args.count, args.workers, args.min_speedup)
+
+
+if __name__ == "__main__":
+    main()
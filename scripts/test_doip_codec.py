@@ -0,0 +1,229 @@
+"""
+DOIP multi-segment codec check.
+
+Round-trips Create requests and Retrieve responses with element data through
+src/doip_segments/codec.py over an in-memory buffer, a pipe and a file, and
+checks malformed framing and declared-length mismatches are rejected. Then it
+writes and reads back one --size-mb element in a fresh interpreter and fails
+(exit 1) if peak RSS grows by more than --rss-budget-mb while doing so: element
+data must stream, never be buffered whole. Under pytest the element is
+PYTEST_SIZE_MB, still four times the RSS budget.
+
+    python -m pytest scripts/test_doip_codec.py
+    python scripts/test_doip_codec.py
+    python scripts/test_doip_codec.py --size-mb 4096
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(script_dir, "..", "src"))
+sys.path.append(src_dir)
+
+from doip_segments.codec import (  # noqa: E402
+    FileSpan,
+    SegmentError,
+    read_do_message,
+    write_do_message,
+)
+
+CREATE = {
+    "operationId": "0.DOIP/Op.Create",
+    "targetId": "21.T/service",
+    "input": {
+        "id": "21.T/do-1",
+        "type": "0.TYPE/DO",
+        "attributes": {"title": "codec check"},
+        "elements": [
+            {"id": "small", "length": "11", "type": "text/plain"},
+            {"id": "blob", "length": str(3 * 65536 + 17), "type": "application/octet-stream"},
+        ],
+    },
+}
+RETRIEVE_RESPONSE = {"status": "0.DOIP/Status.001", "output": CREATE["input"]}
+
+SIZE_MB = 1024
+PYTEST_SIZE_MB = 64
+RSS_BUDGET_MB = 16.0
+
+LARGE_ELEMENT = r"""
+import hashlib, os, resource, sys
+sys.path.append({src_dir!r})
+from doip_segments.codec import read_do_message, write_do_message
+
+source, message_path, size = {source!r}, {message!r}, {size}
+header = {{"status": "0.DOIP/Status.001", "output": {{"id": "21.T/big", "type": "0.TYPE/DO",
+          "elements": [{{"id": "data", "length": str(size)}}]}}}}
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+start = peak_mb()
+with open(source, "rb") as data, open(message_path, "wb") as out:
+    write_do_message(out, header, {{"data": data}})
+written = peak_mb()
+
+digest = hashlib.sha256()
+with open(message_path, "rb") as stream:                      # memoryview chunks
+    for element in read_do_message(stream).elements():
+        for chunk in element.chunks:
+            digest.update(chunk)
+streamed = peak_mb()
+
+spans = 0
+with open(message_path, "rb") as stream:                      # file-backed spans
+    for element in read_do_message(stream, file_spans=True).elements():
+        spans = sum(span.length for span in element.chunks)
+print(start, written, streamed, digest.hexdigest(), spans)
+"""
+
+
+def _payload(size, seed):
+    block = hashlib.sha256(seed).digest() * 2048
+    return (block * (size // len(block) + 1))[:size]
+
+
+def _elements():
+    return {"small": b"hello world", "blob": _payload(3 * 65536 + 17, b"blob")}
+
+
+def _collect(message):
+    return {element.id: b"".join(bytes(chunk) for chunk in element.chunks) for element in message.elements()}
+
+
+def check_round_trips():
+    failures = []
+    elements = _elements()
+
+    buffer = io.BytesIO()
+    write_do_message(buffer, CREATE, elements, chunk_size=65536)
+    buffer.seek(0)
+    message = read_do_message(buffer, chunk_size=4096)
+    if message.header.input.id != "21.T/do-1" or _collect(message) != elements:
+        failures.append("in-memory Create round trip lost data")
+
+    read_fd, write_fd = os.pipe()
+    with open(read_fd, "rb") as reader, open(write_fd, "wb") as writer:
+        thread = threading.Thread(
+            target=lambda: (write_do_message(writer, RETRIEVE_RESPONSE, iter(elements.items())), writer.close())
+        )
+        thread.start()
+        received = _collect(read_do_message(reader, validate=lambda segment: segment))
+        thread.join()
+    if received != elements:
+        failures.append("pipe Retrieve round trip lost data")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        blob_path = os.path.join(tmp, "blob")
+        with open(blob_path, "wb") as f:
+            f.write(elements["blob"])
+        message_path = os.path.join(tmp, "message")
+        with open(blob_path, "rb") as blob, open(message_path, "wb") as out:
+            write_do_message(out, RETRIEVE_RESPONSE, {"small": [b"hello ", b"world"], "blob": blob})
+        with open(message_path, "rb") as stream:
+            received = _collect(read_do_message(stream))
+        if received != elements:
+            failures.append("file round trip (sendfile source) lost data")
+        with open(message_path, "rb") as stream:
+            message = read_do_message(stream, file_spans=True)
+            spans = {e.id: [span for span in e.chunks] for e in message.elements()}
+            if not all(isinstance(s, FileSpan) for chunks in spans.values() for s in chunks):
+                failures.append("file_spans mode yielded something other than FileSpan")
+            elif {k: b"".join(s.read() for s in v) for k, v in spans.items()} != elements:
+                failures.append("file spans do not cover the element data")
+
+    # Unread elements are skipped, not buffered, and the next message follows.
+    buffer = io.BytesIO()
+    write_do_message(buffer, RETRIEVE_RESPONSE, elements)
+    write_do_message(buffer, {"status": "0.DOIP/Status.001"})
+    buffer.seek(0)
+    ids = [element.id for element in read_do_message(buffer).elements()]
+    if ids != ["small", "blob"] or read_do_message(buffer).header != {"status": "0.DOIP/Status.001"}:
+        failures.append("skipping unread element data broke message boundaries")
+    return failures
+
+
+def check_rejections():
+    failures = []
+    cases = {
+        "declared length mismatch": (CREATE, {"small": b"hello", "blob": _elements()["blob"]}),
+        "element data without id segment": None,
+        "truncated chunk": None,
+    }
+    for name, case in cases.items():
+        buffer = io.BytesIO()
+        if case is not None:
+            write_do_message(buffer, *case)
+        elif name == "truncated chunk":
+            buffer.write(b'{"status":"0.DOIP/Status.001"}\n#\n{"id":"x"}\n#\n@\n100\nshort')
+        else:
+            buffer.write(b'{"status":"0.DOIP/Status.001"}\n#\n@\n3\nabc\n#\n#\n')
+        buffer.seek(0)
+        try:
+            _collect(read_do_message(buffer))
+        except SegmentError:
+            continue
+        failures.append(f"{name} was not rejected")
+    return failures
+
+
+def check_large_element(size_mb, rss_budget_mb):
+    size = size_mb << 20
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "element")
+        digest = hashlib.sha256()
+        block = _payload(1 << 20, b"large")
+        with open(source, "wb") as f:
+            for _ in range(size_mb):
+                f.write(block)
+                digest.update(block)
+        code = LARGE_ELEMENT.format(src_dir=src_dir, source=source, message=os.path.join(tmp, "message"), size=size)
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    start, written, streamed, hexdigest, spans = result.stdout.split()
+    start, written, streamed = float(start), float(written), float(streamed)
+    print(f"{size_mb} MiB element: peak RSS {start:.0f} MiB before, {written:.0f} after writing,"
+          f" {streamed:.0f} after streaming it back")
+    failures = []
+    if hexdigest != digest.hexdigest() or int(spans) != size:
+        failures.append("large element did not round-trip")
+    if streamed - start > rss_budget_mb:
+        failures.append(f"peak RSS grew {streamed - start:.0f} MiB > {rss_budget_mb} MiB")
+    return failures
+
+
+def test_round_trips():
+    assert check_round_trips() == []
+
+
+def test_rejections():
+    assert check_rejections() == []
+
+
+def test_large_element_streams():
+    assert check_large_element(PYTEST_SIZE_MB, RSS_BUDGET_MB) == []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DOIP multi-segment codec check")
+    parser.add_argument("--size-mb", type=int, default=SIZE_MB, help="size of the large element")
+    parser.add_argument("--rss-budget-mb", type=float, default=RSS_BUDGET_MB)
+    args = parser.parse_args(argv)
+
+    failures = check_round_trips() + check_rejections()
+    failures += check_large_element(args.size_mb, args.rss_budget_mb)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("codec ok")
+
+
+if __name__ == "__main__":
+    main()
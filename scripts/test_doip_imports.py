@@ -0,0 +1,77 @@
+"""
+DOIP segment package lazy-loading checks.
+
+Imports src/doip_segments in fresh interpreters and checks that the package
+import loads no model module and not pydantic; that touching one model
+(as an attribute, through `from ... import`, or through the registry)
+loads only that operation's modules; that a loaded attribute is cached in
+the package namespace; that unknown names raise AttributeError; and that
+the dispatch tables and __all__ name the classes their modules define.
+
+    python -m pytest scripts/test_doip_imports.py
+"""
+
+import ast
+import os
+import subprocess
+import sys
+
+import pytest
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(script_dir, "..", "src"))
+sys.path.append(src_dir)
+
+import doip_segments  # noqa: E402
+
+PROBE = (
+    "import sys\n"
+    "import doip_segments\n"
+    "before = sorted(m for m in sys.modules if m.startswith('doip_segments.'))\n"
+    "pydantic = 'pydantic' in sys.modules\n"
+    "{body}"
+    "after = sorted(m for m in sys.modules if m.startswith('doip_segments.'))\n"
+    "print({{'before': before, 'pydantic': pydantic, 'after': after}})\n"
+)
+
+
+def _loaded(body):
+    result = subprocess.run([sys.executable, "-c", PROBE.format(body=body)], cwd=src_dir,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return ast.literal_eval(result.stdout)
+
+
+def test_package_import_loads_no_models():
+    report = _loaded("")
+    assert report == {"before": [], "pydantic": False, "after": []}
+
+
+@pytest.mark.parametrize("body, modules", [
+    ("doip_segments.RetrieveRequest\n", ["doip_segments.Retrieve_request"]),
+    ("from doip_segments import SearchRequest, ERRORResponse\n",
+     ["doip_segments.ERROR_response", "doip_segments.Search_request"]),
+    ("from doip_segments.registry import validate_request\n"
+     "validate_request({'operationId': '0.DOIP/Op.Delete', 'targetId': '21.T/x'})\n",
+     ["doip_segments.Delete_request", "doip_segments.registry"]),
+])
+def test_touching_a_model_loads_only_its_module(body, modules):
+    assert _loaded(body)["after"] == modules
+
+
+def test_loaded_attributes_are_cached_in_the_namespace():
+    model = doip_segments.HelloRequest
+    assert vars(doip_segments)["HelloRequest"] is model
+    assert doip_segments.HelloRequest is sys.modules["doip_segments.Hello_request"].HelloRequest
+    with pytest.raises(AttributeError, match="has no attribute 'NoSuchRequest'"):
+        doip_segments.NoSuchRequest
+    assert "NoSuchRequest" not in vars(doip_segments)
+
+
+def test_tables_name_the_generated_classes():
+    for name, module in doip_segments.MODEL_MODULES.items():
+        with open(os.path.join(src_dir, "doip_segments", f"{module}.py"), encoding="utf-8") as f:
+            classes = {node.name for node in ast.parse(f.read()).body if isinstance(node, ast.ClassDef)}
+        assert name in classes, f"{module}.py defines no {name}"
+    assert doip_segments.__all__ == sorted(doip_segments.MODEL_MODULES)
+    assert set(doip_segments.__all__) < set(dir(doip_segments))
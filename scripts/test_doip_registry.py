@@ -0,0 +1,116 @@
+"""
+DOIP segment registry checks.
+
+Validates segments through src/doip_segments/registry.py and checks that
+requests are dispatched by operationId (and responses by operation and
+status) to the right generated model, with the ordered fallback where two
+schemas share an operationId; that an unknown or missing operationId raises
+UnknownSegmentError, a ValueError; that the Authentication choice is
+discriminated by key, so only the matching member is validated and
+reported; that adapters are built once and reused; and that accepted
+segments dump to the same bytes as the generated models.
+
+    python -m pytest scripts/test_doip_registry.py
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+from pydantic import ValidationError
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "src"))
+
+from doip_segments import registry  # noqa: E402
+from doip_segments.registry import (  # noqa: E402
+    UnknownSegmentError,
+    dump_segment,
+    request_adapter,
+    response_adapter,
+    validate_request,
+    validate_requests,
+    validate_response,
+)
+
+RETRIEVE = "0.DOIP/Op.Retrieve"
+
+
+def _generated(module, name):
+    return getattr(importlib.import_module(f"doip_segments.{module}"), name)
+
+
+@pytest.mark.parametrize("segment, module, name", [
+    ({"operationId": "0.DOIP/Op.Hello", "targetId": "21.T/service"}, "Hello_request", "HelloRequest"),
+    ({"operationId": RETRIEVE, "targetId": "21.T/x", "attributes": {"element": "e1"}},
+     "Retrieve_request", "RetrieveRequest"),
+    # Only the extended schema has `record`: the core model rejects it, so the fallback wins.
+    ({"operationId": RETRIEVE, "targetId": "21.T/x", "attributes": {"record": True}},
+     "extended_Retrieve_request", "ExtendedRetrieveRequest"),
+    ({"operationId": "0.DOIP/Op.Search", "targetId": "21.T/service", "attributes": {"query": "type:Document"}},
+     "Search_request", "SearchRequest"),
+    ({"operationId": "Op.QueryRef", "targetId": "21.T/service", "attributes": {"input": "21.T/x"}},
+     "extended_QueryRef_request", "ExtendedQueryRefRequest"),
+])
+def test_requests_are_dispatched_by_operation_id(segment, module, name):
+    generated = _generated(module, name)
+    model = validate_request(segment)
+    assert isinstance(model, generated)
+    assert dump_segment(model) == generated.model_validate(segment).model_dump_json(exclude_none=True).encode()
+    assert validate_request(dump_segment(model)) == model
+    assert validate_request(dump_segment(model).decode()) == model
+
+
+def test_responses_are_dispatched_by_operation_and_status():
+    ok = {"status": "0.DOIP/Status.001", "output": "deleted"}
+    assert isinstance(validate_response(ok, "0.DOIP/Op.Delete"), _generated("Delete_response", "DeleteResponse"))
+    failed = {"status": "0.DOIP/Status.104", "output": {"message": "no such object"}}
+    for operation_id in (RETRIEVE, "0.DOIP/Op.Delete", "0.DOIP/Op.Unknown"):
+        assert isinstance(validate_response(failed, operation_id), _generated("ERROR_response", "ERRORResponse"))
+
+
+@pytest.mark.parametrize("segment, message", [
+    ({"operationId": "0.DOIP/Op.Unknown", "targetId": "21.T/x"}, "no request model for operationId '0.DOIP/Op.Unknown'"),
+    ({"targetId": "21.T/x"}, "no request model for operationId None"),
+    (b"[1, 2]", "a DOIP segment is a JSON object, got list"),
+])
+def test_unknown_segments_raise(segment, message):
+    with pytest.raises(UnknownSegmentError, match=message) as raised:
+        validate_request(segment)
+    assert isinstance(raised.value, ValueError)
+    with pytest.raises(UnknownSegmentError, match="no response model for operationId 'Op.QueryRef'"):
+        validate_response({"status": "0.DOIP/Status.001", "output": {}}, "Op.QueryRef")
+
+
+def test_authentication_is_discriminated_by_key():
+    segment = {"operationId": "0.DOIP/Op.Delete", "targetId": "21.T/x"}
+    module = "Delete_request"
+    assert isinstance(validate_request({**segment, "authentication": {"token": "t"}}).authentication,
+                      _generated(module, "Authentication1"))
+    assert isinstance(validate_request({**segment, "authentication": {"key": "k"}}).authentication,
+                      _generated(module, "Authentication2"))
+
+    with pytest.raises(ValidationError) as raised:
+        validate_request({**segment, "authentication": {"username": "u"}})
+    # Only the username/password member is tried, so only its error is reported.
+    assert [(e["loc"], e["type"]) for e in raised.value.errors()] == [
+        (("authentication", "Authentication", "password"), "missing")
+    ]
+    with pytest.raises(ValidationError) as raised:
+        validate_request({**segment, "authentication": {"secret": "s"}})
+    assert [e["type"] for e in raised.value.errors()] == ["union_key_not_found"]
+
+
+def test_adapters_are_built_once():
+    assert request_adapter(RETRIEVE) is request_adapter(RETRIEVE)
+    assert response_adapter(RETRIEVE) is response_adapter(RETRIEVE)
+    # Every failure status shares the one ERROR adapter.
+    assert response_adapter(RETRIEVE, "0.DOIP/Status.104") is response_adapter("0.DOIP/Op.Hello", "0.DOIP/Status.500")
+    assert registry.load_model("Retrieve_request", "RetrieveRequest") is registry.load_model(
+        "Retrieve_request", "RetrieveRequest")
+
+    stream = [{"operationId": RETRIEVE, "targetId": f"21.T/{i}"} for i in range(50)]
+    built = len(registry._adapters)
+    assert [m.targetId for m in validate_requests(stream)] == [s["targetId"] for s in stream]
+    assert len(registry._adapters) == built
@@ -0,0 +1,283 @@
+"""
+DOIP repository behaviour check.
+
+Drives src/doip_segments/repository.py through the seven core operations and
+fails (exit 1) when a response differs from what the DOIP spec asks for:
+Create/Retrieve/Update/Delete round trips with element data, the error
+statuses (101 invalid, 104 unknown object, 105 id conflict, 200 declined),
+copy-on-write sharing across Update, stored attributes isolated from the
+caller's request, Search terms, sorting and paging, and a Create plus a
+Retrieve with element data over the multi-segment codec, including one
+whose object is deleted while the reply is written.
+
+    python -m pytest scripts/test_doip_repository.py
+    python scripts/test_doip_repository.py
+"""
+
+import io
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "src"))
+
+from doip_segments.codec import read_do_message, write_do_message  # noqa: E402
+from doip_segments.repository import (  # noqa: E402
+    OBJECT_OPERATIONS,
+    SERVICE_OPERATIONS,
+    STATUS_CONFLICT,
+    STATUS_DECLINED,
+    STATUS_INVALID,
+    STATUS_UNKNOWN_OBJECT,
+    DoipRepository,
+)
+
+SERVICE = "21.T/repo"
+OK = "0.DOIP/Status.001"
+
+
+def create(object_id, type_="Document", attributes=None, elements=None, **request):
+    do = {"id": object_id, "type": type_}
+    if attributes is not None:
+        do["attributes"] = attributes
+    if elements is not None:
+        do["elements"] = elements
+    return {"operationId": "0.DOIP/Op.Create", "targetId": SERVICE, "input": do, **request}
+
+
+def search(query, **attributes):
+    return {"operationId": "0.DOIP/Op.Search", "targetId": SERVICE,
+            "attributes": {"query": query, "type": "id", **attributes}}
+
+
+def check_operations():
+    failures = []
+
+    def expect(label, response, status=OK):
+        if response.status != status:
+            failures.append(f"{label}: status {response.status}, expected {status}")
+        return response
+
+    repo = DoipRepository(SERVICE)
+    hello = expect("Hello", repo.handle({"operationId": "0.DOIP/Op.Hello", "targetId": SERVICE}))
+    if hello.status == OK and hello.output.id != SERVICE:
+        failures.append("Hello did not describe the service")
+    listed = repo.handle({"operationId": "0.DOIP/Op.ListOperations", "targetId": SERVICE})
+    if listed.output != SERVICE_OPERATIONS:
+        failures.append("ListOperations on the service lists the wrong operations")
+
+    created = expect("Create", repo.handle(
+        create("21.T/1", attributes={"title": "Alpha report"},
+               elements=[{"id": "file", "type": "text/plain"}, {"id": "meta"}], requestId="r1"),
+        element_data={"file": b"hello"},
+    ))
+    if created.requestId != "r1" or created.output.elements[0].length != "5":
+        failures.append("Create did not echo requestId or record the element length")
+    if bytes(repo.element_data("21.T/1", "file")) != b"hello" or repo.element_data("21.T/1", "meta") is not None:
+        failures.append("Create stored the wrong element data")
+    expect("duplicate Create", repo.handle(create("21.T/1")), STATUS_CONFLICT)
+    expect("Create without input.id", repo.handle(
+        {"operationId": "0.DOIP/Op.Create", "targetId": SERVICE, "input": {"type": "Document"}}
+    ), STATUS_INVALID)
+    expect("Create on another service", repo.handle(
+        {**create("21.T/2"), "targetId": "21.T/elsewhere"}
+    ), STATUS_INVALID)
+    expect("Create with a wrong declared length", repo.handle(
+        create("21.T/2", elements=[{"id": "file", "length": "9"}]), element_data={"file": b"abc"}
+    ), STATUS_INVALID)
+    expect("Create with data for an undeclared element", repo.handle(
+        create("21.T/2"), element_data={"stray": b"x"}
+    ), STATUS_INVALID)
+    if "21.T/2" in repo:
+        failures.append("a rejected Create left an object behind")
+
+    retrieved = expect("Retrieve", repo.handle({"operationId": "0.DOIP/Op.Retrieve", "targetId": "21.T/1"}))
+    if retrieved.status == OK and retrieved.output.attributes != {"title": "Alpha report"}:
+        failures.append("Retrieve returned the wrong attributes")
+    expect("Retrieve unknown", repo.handle({"operationId": "0.DOIP/Op.Retrieve", "targetId": "21.T/none"}),
+           STATUS_UNKNOWN_OBJECT)
+    expect("Retrieve unknown element", repo.handle(
+        {"operationId": "0.DOIP/Op.Retrieve", "targetId": "21.T/1", "attributes": {"element": "nope"}}
+    ), STATUS_UNKNOWN_OBJECT)
+    listed = repo.handle({"operationId": "0.DOIP/Op.ListOperations", "targetId": "21.T/1"})
+    if listed.output != OBJECT_OPERATIONS:
+        failures.append("ListOperations on an object lists the wrong operations")
+    expect("unknown operationId", repo.handle({"operationId": "21.T/Op.Custom", "targetId": SERVICE}),
+           STATUS_INVALID)
+
+    # Update without attributes or resent data shares the previous version's.
+    before = repo.element_data("21.T/1", "file")
+    updated = expect("Update", repo.handle({
+        "operationId": "0.DOIP/Op.Update", "targetId": "21.T/1",
+        "input": {"id": "21.T/1", "type": "Report", "elements": [{"id": "file"}, {"id": "meta"}]},
+    }, element_data={"meta": b"{}"}))
+    if updated.status == OK and (updated.output.type != "Report" or updated.output.attributes != {"title": "Alpha report"}):
+        failures.append("Update did not keep the previous attributes")
+    after = repo.element_data("21.T/1", "file")
+    if bytes(after) != b"hello" or after.obj is not before.obj:
+        failures.append("Update copied element data it did not replace")
+    expect("Update with mismatched id", repo.handle({
+        "operationId": "0.DOIP/Op.Update", "targetId": "21.T/1", "input": {"id": "21.T/9", "type": "Report"},
+    }), STATUS_INVALID)
+    if repo.handle(search("type:Document")).results or repo.handle(search("type:Report")).results != ["21.T/1"]:
+        failures.append("Update did not move the object between type indexes")
+
+    expect("Delete", repo.handle({"operationId": "0.DOIP/Op.Delete", "targetId": "21.T/1"}))
+    expect("Delete again", repo.handle({"operationId": "0.DOIP/Op.Delete", "targetId": "21.T/1"}),
+           STATUS_UNKNOWN_OBJECT)
+    if len(repo) or repo.handle(search("*")).size != 0:
+        failures.append("Delete left the object searchable")
+    expect("malformed JSON", repo.handle(b"{not json"), STATUS_INVALID)
+    return failures
+
+
+def check_search():
+    failures = []
+    repo = DoipRepository(SERVICE)
+    for i in range(10):
+        repo.handle(create(f"21.T/{i}", "Paper" if i % 2 else "Dataset",
+                           {"title": f"Entry {i} on {'gates' if i < 5 else 'codecs'}", "rank": 10 - i,
+                            "meta": {"lang": "en" if i % 3 else "de"}, "tags": ["x", f"t{i}"]}))
+    cases = {
+        "*": [f"21.T/{i}" for i in range(10)],
+        "type:Paper": ["21.T/1", "21.T/3", "21.T/5", "21.T/7", "21.T/9"],
+        "id:21.T/4": ["21.T/4"],
+        "id:21.T/missing": [],
+        "type:Paper GATES": ["21.T/1", "21.T/3"],
+        "meta.lang:de": ["21.T/0", "21.T/3", "21.T/6", "21.T/9"],
+        "tags:t7": ["21.T/7"],
+        "title:Entry*  type:Dataset rank:6": ["21.T/4"],
+        "id:21.T/1*": ["21.T/1"],
+    }
+    for query, expected in cases.items():
+        results = repo.handle(search(query)).results
+        if results != expected:
+            failures.append(f"search {query!r}: {results}, expected {expected}")
+    page = repo.handle(search("*", sortFields="rank ASC", pageNum=1, pageSize=3))
+    if page.size != 10 or page.results != ["21.T/6", "21.T/5", "21.T/4"]:
+        failures.append(f"sorted second page: {page.size} {page.results}")
+    page = repo.handle(search("type:Paper", sortFields="meta.lang DESC,id DESC"))
+    if page.results != ["21.T/7", "21.T/5", "21.T/1", "21.T/9", "21.T/3"]:
+        failures.append(f"two-key sort: {page.results}")
+    full = repo.handle({"operationId": "0.DOIP/Op.Search", "targetId": SERVICE, "attributes": {"query": "id:21.T/2"}})
+    if [result["id"] for result in full.results] != ["21.T/2"] or full.results[0]["attributes"]["rank"] != 8:
+        failures.append("full search results lost the object serialization")
+    if repo.handle({"operationId": "0.DOIP/Op.Search", "targetId": "21.T/other",
+                    "attributes": {"query": "*"}}).status != STATUS_INVALID:
+        failures.append("Search on another service was not rejected")
+    if repo.handle({"operationId": "0.DOIP/Op.Hello", "targetId": "21.T/0"}).status != STATUS_INVALID:
+        failures.append("Hello on an object was not rejected")
+    return failures
+
+
+def check_messages():
+    failures = []
+    repo = DoipRepository(SERVICE)
+    stream_in = io.BytesIO()
+    write_do_message(stream_in, create("21.T/m", elements=[{"id": "blob"}]), {"blob": [b"ab" * 50000, b"c"]})
+    write_do_message(stream_in, {"operationId": "0.DOIP/Op.Retrieve", "targetId": "21.T/m",
+                                 "attributes": {"includeElementData": True}})
+    write_do_message(stream_in, {"operationId": "0.DOIP/Op.Retrieve", "targetId": "21.T/m",
+                                 "attributes": {"element": "blob"}})
+    stream_in.write(b"@\n3\nabc\n#\n")  # element data before any JSON segment
+    stream_in.seek(0)
+    stream_out = io.BytesIO()
+    statuses = []
+    while True:
+        response = repo.handle_message(stream_in, stream_out)
+        if response is None:
+            break
+        statuses.append(response.status)
+    # The stray element data is reported; what follows it is unframed, so the
+    # rest of the stream may produce further 101s but never a success.
+    if statuses[:3] != [OK, OK, OK] or not statuses[3:] or set(statuses[3:]) != {STATUS_INVALID}:
+        failures.append(f"message statuses {statuses}")
+    stream_out.seek(0)
+    replies = []
+    for _ in statuses:
+        reply = read_do_message(stream_out, validate=lambda segment: segment)
+        replies.append({e.id: b"".join(bytes(c) for c in e.chunks) for e in reply.elements()})
+    expected = {"blob": b"ab" * 50000 + b"c"}
+    if replies[:3] != [{}, expected, expected] or any(replies[3:]):
+        failures.append("Retrieve replies carried the wrong element data")
+    if read_do_message(stream_out) is not None:
+        failures.append("extra data after the last reply")
+    return failures
+
+
+def check_isolation():
+    failures = []
+    repo = DoipRepository(SERVICE)
+    attributes = {"title": "Alpha", "meta": {"tags": ["a"]}}
+    repo.handle(create("21.T/1", attributes=attributes))
+    attributes["meta"]["tags"].append("b")
+    attributes["meta"]["lang"] = "en"
+    retrieved = repo.handle({"operationId": "0.DOIP/Op.Retrieve", "targetId": "21.T/1"})
+    if retrieved.output.attributes != {"title": "Alpha", "meta": {"tags": ["a"]}}:
+        failures.append(f"the caller's Create input changed the stored object: {retrieved.output.attributes}")
+    if repo.handle(search("meta.tags:b")).results:
+        failures.append("Search matched a value the caller added after Create")
+
+    class RacingRepository(DoipRepository):
+        def _handle(self, request, element_data):
+            answered = super()._handle(request, element_data)
+            if request.get("operationId") == "0.DOIP/Op.Retrieve":
+                super()._handle({"operationId": "0.DOIP/Op.Delete", "targetId": "21.T/m"}, {})
+            return answered
+
+    racing = RacingRepository(SERVICE)
+    racing.handle(create("21.T/m", elements=[{"id": "blob"}]), element_data={"blob": b"xyz"})
+    stream_in = io.BytesIO()
+    write_do_message(stream_in, {"operationId": "0.DOIP/Op.Retrieve", "targetId": "21.T/m",
+                                 "attributes": {"includeElementData": True}})
+    stream_in.seek(0)
+    stream_out = io.BytesIO()
+    response = racing.handle_message(stream_in, stream_out)
+    stream_out.seek(0)
+    reply = read_do_message(stream_out, validate=lambda segment: segment)
+    data = {e.id: b"".join(bytes(c) for c in e.chunks) for e in reply.elements()}
+    if response.status != OK or "21.T/m" in racing or data != {"blob": b"xyz"}:
+        failures.append(f"Retrieve raced by a Delete sent {data}, expected the version it answered with")
+    return failures
+
+
+def check_declined():
+    repo = DoipRepository(SERVICE)
+    del repo._operations["0.DOIP/Op.Delete"]
+    response = repo.handle({"operationId": "0.DOIP/Op.Delete", "targetId": "21.T/1", "requestId": "d"})
+    if response.status != STATUS_DECLINED or response.requestId != "d":
+        return [f"unsupported operation answered {response.status}, expected {STATUS_DECLINED}"]
+    return []
+
+
+def test_operations():
+    assert check_operations() == []
+
+
+def test_search():
+    assert check_search() == []
+
+
+def test_messages():
+    assert check_messages() == []
+
+
+def test_isolation():
+    assert check_isolation() == []
+
+
+def test_declined():
+    assert check_declined() == []
+
+
+def main():
+    failures = check_operations() + check_search() + check_messages() + check_isolation() + check_declined()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("repository ok")
+
+
+if __name__ == "__main__":
+    main()
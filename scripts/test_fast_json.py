@@ -0,0 +1,106 @@
+"""
+JSON backend parity checks.
+
+Runs every backend src/fast_json.py can load here against the stdlib one
+and checks the contract in its docstring: ordinary data encodes to the same
+bytes and decodes from every buffer type; values a fast encoder refuses
+fall back to the stdlib bytes; floats keep their values even where their
+spelling differs; malformed input raises ValueError; and the documented
+edge cases (NaN written as null by the fast encoders, integers past 64 bits
+read as floats by orjson) are what the backends actually do. Backends that
+are not installed are skipped.
+
+    python -m pytest scripts/test_fast_json.py
+"""
+
+import math
+import os
+import subprocess
+import sys
+
+import pytest
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(script_dir, "..", "src"))
+sys.path.append(src_dir)
+
+import fast_json  # noqa: E402
+
+STDLIB = fast_json.get_backend("json")
+ORDINARY = [
+    {"jsonrpc": "2.0", "id": 7, "method": "tools/call", "params": {"name": "validate_segments"}},
+    {"id": "é→ ", "nested": [[], {}, [None, True, False]], "escapes": "\"\\\n\t\x00\x7f</script>"},
+    [0, -1, 2 ** 63 - 1, -(2 ** 63), "", "plain"],
+]
+FALLBACK = [2 ** 70, -(2 ** 64), {1: "int key"}, {"deep": [2 ** 100]}]
+FLOATS = [1.0, -0.0, 0.1, 1e300, 1e-7, 1e16, 123456789.123, 5e-324]
+MALFORMED = [b"", b"{", b"[1,]", b'{"a" 1}', b"nul", b'"unterminated', b'{"a":1}x']
+
+
+def _backend(name):
+    try:
+        return fast_json.get_backend(name)
+    except ImportError:
+        pytest.skip(f"{name} is not installed")
+
+
+@pytest.fixture(params=fast_json.BACKENDS)
+def backend(request):
+    return _backend(request.param)
+
+
+def test_ordinary_data_is_encoded_alike(backend):
+    for value in ORDINARY:
+        data = backend.dumps(value)
+        assert data == STDLIB.dumps(value)
+        for buffer in (data, bytearray(data), memoryview(data), data.decode()):
+            assert backend.loads(buffer) == value
+
+
+def test_refused_values_fall_back_to_the_stdlib_encoder(backend):
+    for value in FALLBACK:
+        assert backend.dumps(value) == STDLIB.dumps(value)
+
+
+def test_floats_keep_their_values(backend):
+    assert backend.loads(backend.dumps(FLOATS)) == FLOATS
+    assert STDLIB.loads(backend.dumps(FLOATS)) == FLOATS
+    assert math.copysign(1, backend.loads(backend.dumps(-0.0))) == -1
+
+
+def test_malformed_input_raises_value_error(backend):
+    for data in MALFORMED:
+        with pytest.raises(ValueError):
+            backend.loads(data)
+
+
+def test_non_finite_floats_are_written_as_null_by_the_fast_encoders(backend):
+    written = [backend.dumps(value) for value in (math.nan, math.inf, -math.inf)]
+    if backend.name == "json":
+        assert written == [b"NaN", b"Infinity", b"-Infinity"]
+        assert math.isnan(backend.loads(b"NaN"))
+    else:
+        assert written == [b"null"] * 3
+        with pytest.raises(ValueError):
+            backend.loads(b"NaN")
+
+
+def test_orjson_edge_cases():
+    orjson = _backend("orjson")
+    assert orjson.dumps([1e300, 1e-7]) == b"[1e300,1e-7]"
+    assert STDLIB.dumps([1e300, 1e-7]) == b"[1e+300,1e-07]"
+    big = b"123456789012345678901234567890"
+    assert orjson.loads(big) == float(big) and STDLIB.loads(big) == int(big)
+    with pytest.raises(ValueError):
+        orjson.loads(b'"\\ud800"')
+    assert STDLIB.loads(b'"\\ud800"') == "\ud800"
+
+
+def test_backend_selection():
+    with pytest.raises(ValueError, match="unknown JSON backend 'yaml'"):
+        fast_json.get_backend("yaml")
+    env = dict(os.environ, FDO_JSON_BACKEND="json")
+    result = subprocess.run([sys.executable, "-c", "import fast_json; print(fast_json.BACKEND.name)"],
+                            cwd=src_dir, env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "json"
+    assert fast_json.BACKEND.name in fast_json.BACKENDS
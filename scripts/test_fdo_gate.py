@@ -0,0 +1,153 @@
+"""
+FDOGate single-packet path checks.
+
+Runs src/fdo_gate.py's process_packet over every buffer type it accepts
+(bytes, bytearray, memoryview, mmap, and a packet at an offset inside a
+larger buffer) and checks that the results agree, that the header is
+decoded exactly once per packet, and that a multi-megabyte payload is never
+copied. arbitrate() and arbitrate_detail() must give the same verdicts as
+process_packet, render drop reasons only on request, and judge a storm of
+rejected packets without allocating.
+
+    python -m pytest scripts/test_fdo_gate.py
+"""
+
+import mmap
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import pytest
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "src"))
+
+import fdo_gate  # noqa: E402
+from fdo_gate import VERDICT_FORWARDED, VERDICT_NAMES, FDOGate, GateVerdict  # noqa: E402
+from gate_clock import SimulatedClock  # noqa: E402
+
+START_MS = 1_000_000
+LARGE_PAYLOAD = 16 << 20
+
+
+def _gate():
+    return FDOGate(clock=SimulatedClock(START_MS))
+
+
+def _packets(gate):
+    """(label, packet) pairs covering every verdict process_packet can give without a replay filter."""
+    valid = gate.create_packet(0xFD01, 1, 0x01, b"payload")
+    corrupt = bytearray(valid)
+    corrupt[3] ^= 0x01  # an epoch bit: the checksum no longer matches
+    stale = FDOGate(clock=SimulatedClock(START_MS - 5000)).create_packet(0xFD01, 2, 0x01, b"x")
+    return [
+        ("valid", valid),
+        ("header only", gate.create_packet(0xFD01, 3, 0x02)),
+        ("corrupt", bytes(corrupt)),
+        ("stale", stale),
+        ("unregistered", gate.create_packet(0xFD01, 4, 0xFF, b"ab")),
+        ("short", valid[:10]),
+    ]
+
+
+@pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview], ids=["bytes", "bytearray", "memoryview"])
+def test_process_packet_agrees_across_buffer_types(wrap):
+    gate = _gate()
+    for label, packet in _packets(gate):
+        assert gate.process_packet(wrap(packet)) == gate.process_packet(packet), label
+
+
+def test_process_packet_reads_in_place_at_an_offset():
+    gate = _gate()
+    packets = _packets(gate)
+    buffer = bytearray(b"\xee" * 7)
+    spans = []
+    for _, packet in packets:
+        spans.append((len(buffer), len(packet)))
+        buffer += packet + b"\xee" * 5
+    with tempfile.TemporaryFile() as f:
+        f.write(buffer)
+        f.flush()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for (label, packet), (offset, length) in zip(packets, spans):
+                expected = gate.process_packet(packet)
+                assert gate.process_packet(buffer, offset, length) == expected, label
+                assert gate.process_packet(mapped, offset, length) == expected, label
+
+
+def test_process_packet_decodes_the_header_once(monkeypatch):
+    calls = []
+    header = fdo_gate._HEADER
+
+    class CountingStruct:
+        size = header.size
+
+        def unpack_from(self, *args):
+            calls.append(args)
+            return header.unpack_from(*args)
+
+    gate = _gate()
+    packet = gate.create_packet(0xFD01, 1, 0x01, b"payload")
+    monkeypatch.setattr(fdo_gate, "_HEADER", CountingStruct())
+    assert gate.process_packet(packet)["status"] == "forwarded"
+    assert len(calls) == 1
+
+
+def test_large_payload_is_not_copied():
+    gate = _gate()
+    packet = bytearray(gate.create_packet(0xFD01, 1, 0x01, b"\x5a" * LARGE_PAYLOAD))
+    view = memoryview(packet)
+    tracemalloc.start()
+    try:
+        forwarded = gate.process_packet(view)
+        at_offset = gate.process_packet(packet, 0, len(packet))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert forwarded["status"] == at_offset["status"] == "forwarded"
+    assert peak < 64 * 1024
+
+
+def test_arbitrate_codes_match_process_packet():
+    gate = _gate()
+    names = []
+    for label, packet in _packets(gate):
+        code = gate.arbitrate(packet)
+        detail = gate.arbitrate_detail(packet)
+        result = gate.process_packet(packet)
+        assert isinstance(code, int) and int(detail) == code, label
+        assert detail.as_dict() == result, label
+        assert (code == VERDICT_FORWARDED) == (result["status"] == "forwarded") == bool(detail), label
+        names.append(VERDICT_NAMES[code])
+    assert names == ["forwarded", "forwarded", "checksum_mismatch", "epoch_expired", "policy_rejected", "too_short"]
+
+
+def test_drop_reasons_are_rendered_on_request_only(monkeypatch):
+    rendered = []
+    drop_reason = fdo_gate._drop_reason
+    monkeypatch.setattr(fdo_gate, "_drop_reason", lambda *args: rendered.append(args) or drop_reason(*args))
+    gate = _gate()
+    packet = gate.create_packet(0xFD01, 1, 0xFF, b"ab")
+    detail = gate.arbitrate_detail(packet)
+    assert isinstance(detail, GateVerdict) and detail.name == "policy_rejected"
+    assert rendered == []
+    assert detail.reason == detail.reason == gate.process_packet(packet)["reason"]
+    assert len(rendered) == 2  # once for the verdict, once for process_packet
+
+
+def test_drop_storm_does_not_allocate():
+    gate = _gate()
+    storm = [packet for label, packet in _packets(gate) if label != "valid"] * 2000
+    arbitrate = gate.arbitrate
+    for packet in storm[:100]:
+        arbitrate(packet)
+    tracemalloc.start()
+    try:
+        for packet in storm:
+            arbitrate(packet)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert current == 0
+    assert peak < 1024
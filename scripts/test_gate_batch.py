@@ -0,0 +1,270 @@
+"""
+Batch validation equivalence check.
+
+Builds one packet mix with known verdicts (valid, short, header-only, one
+payload byte, corrupted checksums, stale and future epochs, unregistered
+policies, in-window replays) against a SimulatedClock, and fails (exit 1)
+unless every batch path agrees with FDOGate.process_packet on it:
+validate_batch / process_batch / explain_batch over a list of packets and
+over one buffer split by offsets, gate_vector.validate_buffer (skipped
+without numpy), and all of them again with a ReplayFilter attached.
+
+    python -m pytest scripts/test_gate_batch.py
+    python scripts/test_gate_batch.py
+    python scripts/test_gate_batch.py --packets 5000 --seed 7
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+
+import pytest
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "src"))
+
+from fdo_gate import (  # noqa: E402
+    HEADER_SIZE,
+    VERDICT_CHECKSUM_MISMATCH,
+    VERDICT_EPOCH_EXPIRED,
+    VERDICT_FORWARDED,
+    VERDICT_NAMES,
+    VERDICT_POLICY_REJECTED,
+    VERDICT_REPLAYED,
+    VERDICT_TOO_SHORT,
+    FDOGate,
+    ReplayFilter,
+)
+from gate_clock import SimulatedClock  # noqa: E402
+
+START_MS = 1_000_000
+
+
+def packet_mix(count, seed):
+    """(packets, expected verdicts without a replay filter, with one)."""
+    rng = random.Random(seed)
+    clock = SimulatedClock(START_MS)
+    gate = FDOGate(clock=clock)
+    policies = sorted(gate.msbv_table)
+    packets, plain, replay = [], [], []
+    sent = []
+
+    def add(packet, verdict, replay_verdict=None):
+        packets.append(packet)
+        plain.append(verdict)
+        replay.append(verdict if replay_verdict is None else replay_verdict)
+
+    for seq in range(count):
+        kind = rng.randrange(10)
+        # Header-only and one-byte payloads exercise the payload-head edge cases.
+        payload = rng.randbytes(rng.choice((0, 1, 2, 40)))
+        if kind == 0:
+            add(rng.randbytes(rng.randrange(HEADER_SIZE)), VERDICT_TOO_SHORT)
+        elif kind == 1:
+            packet = bytearray(gate.create_packet(0xFD01, seq, rng.choice(policies), payload))
+            # The header and first two payload bytes fold as 16-bit words into a
+            # 12-bit checksum: the top nibble of each word's high byte is not covered.
+            index = rng.randrange(min(len(packet), HEADER_SIZE + 2))
+            packet[index] ^= 1 << rng.randrange(4 if index % 2 == 0 else 8)
+            add(bytes(packet), VERDICT_CHECKSUM_MISMATCH)
+        elif kind == 2:
+            clock.advance(rng.choice((-1, 1)) * rng.randrange(2001, 10_000))
+            add(gate.create_packet(0xFD01, seq, rng.choice(policies), payload), VERDICT_EPOCH_EXPIRED)
+            clock.set(START_MS)
+        elif kind == 3:
+            add(gate.create_packet(0xFD01, seq, 0xFFFF_FF00 | rng.randrange(256), payload),
+                VERDICT_POLICY_REJECTED)
+        elif kind == 4 and sent:
+            add(rng.choice(sent), VERDICT_FORWARDED, VERDICT_REPLAYED)
+        else:
+            # Valid, epoch anywhere inside the drift window.
+            clock.advance(rng.randrange(-2000, 2001))
+            packet = gate.create_packet(0xFD01, seq, rng.choice(policies), payload)
+            clock.set(START_MS)
+            sent.append(packet)
+            add(packet, VERDICT_FORWARDED)
+    return packets, plain, replay
+
+
+def _code(result):
+    """VERDICT_* code of a process_packet result dict."""
+    if result["status"] == "forwarded":
+        return VERDICT_FORWARDED
+    reason = result["reason"]
+    for prefix, code in (("Packet too short", VERDICT_TOO_SHORT), ("Checksum", VERDICT_CHECKSUM_MISMATCH),
+                         ("Epoch Replay/Expired", VERDICT_EPOCH_EXPIRED),
+                         ("Epoch Replay/Duplicate", VERDICT_REPLAYED), ("Policy ID", VERDICT_POLICY_REJECTED)):
+        if reason.startswith(prefix):
+            return code
+    raise ValueError(f"unrecognised drop reason {reason!r}")
+
+
+def _mismatch(label, got, expected):
+    got, expected = list(got), list(expected)
+    if got == expected:
+        return []
+    index = next(i for i, (a, b) in enumerate(zip(got, expected)) if a != b) if len(got) == len(expected) else -1
+    if index < 0:
+        return [f"{label}: {len(got)} verdicts for {len(expected)} packets"]
+    return [f"{label}: packet {index} got {VERDICT_NAMES[got[index]]}, expected {VERDICT_NAMES[expected[index]]}"]
+
+
+def check_paths(packets, expected, with_replay, vector):
+    suffix = " [replay filter]" if with_replay else ""
+    clock = SimulatedClock(START_MS)
+
+    def gate():
+        return FDOGate(replay_filter=ReplayFilter() if with_replay else None, clock=clock)
+
+    buffer = b"".join(packets)
+    offsets = [0]
+    for packet in packets:
+        offsets.append(offsets[-1] + len(packet))
+
+    reference_gate = gate()
+    reference = [reference_gate.process_packet(packet) for packet in packets]
+    failures = _mismatch("process_packet" + suffix, [_code(r) for r in reference], expected)
+    located_gate = gate()
+    located = [located_gate.process_packet(buffer, offsets[i], offsets[i + 1] - offsets[i])
+               for i in range(len(packets))]
+    if located != reference:
+        failures.append("process_packet(buffer, offset, length) differs from per-packet bytes" + suffix)
+
+    reasons = {i: r["reason"] for i, r in enumerate(reference) if r["status"] == "dropped"}
+    for label, args in (("list", (packets,)), ("buffer+offsets", (buffer, offsets)),
+                        ("memoryview+offsets", (memoryview(bytearray(buffer)), offsets))):
+        failures += _mismatch(f"validate_batch({label}){suffix}", gate().validate_batch(*args), expected)
+        if gate().process_batch(*args) != reference:
+            failures.append(f"process_batch({label}) differs from process_packet{suffix}")
+        verdicts, explained = gate().explain_batch(*args)
+        failures += _mismatch(f"explain_batch({label}){suffix}", verdicts, expected)
+        if explained != reasons:
+            failures.append(f"explain_batch({label}) reasons differ from process_packet{suffix}")
+    if vector is not None:
+        failures += _mismatch(f"gate_vector.validate_buffer{suffix}",
+                              vector.validate_buffer(gate(), buffer, offsets).tolist(), expected)
+    return failures
+
+
+def _gate_vector():
+    try:
+        import gate_vector
+    except ImportError as exc:
+        print(f"gate_vector skipped: {exc}")
+        return None
+    return gate_vector
+
+
+def test_batch_paths_agree():
+    packets, plain, _ = packet_mix(2000, seed=1)
+    assert check_paths(packets, plain, False, _gate_vector()) == []
+
+
+def test_batch_paths_agree_with_replay_filter():
+    packets, _, replay = packet_mix(2000, seed=1)
+    assert VERDICT_REPLAYED in replay
+    assert check_paths(packets, replay, True, _gate_vector()) == []
+
+
+@pytest.mark.parametrize("offsets", [[-1, 16], [0, 100], [16, 0, 32], [0, 20, 16, 32]])
+def test_bad_offsets_are_rejected_before_any_verdict(offsets):
+    clock = SimulatedClock(START_MS)
+    buffer = FDOGate(clock=clock).create_packet(0xFD01, 1, 0x01) * 2
+    gate = FDOGate(replay_filter=ReplayFilter(), clock=clock)
+    for batch in (gate.validate_batch, gate.process_batch, gate.explain_batch):
+        with pytest.raises(ValueError):
+            batch(buffer, offsets)
+    vector = _gate_vector()
+    if vector is not None:
+        with pytest.raises(ValueError):
+            vector.validate_buffer(gate, buffer, offsets)
+    # Nothing reached the replay filter: the first packet is still fresh.
+    assert gate.validate_batch(buffer, [0, 16]) == bytearray([VERDICT_FORWARDED])
+
+
+def test_create_packets_matches_create_packet():
+    clock = SimulatedClock(START_MS)
+    gate = FDOGate(clock=clock)
+    payloads = [b"", b"a", b"ab", b"payload"]
+    buffer, offsets = gate.create_packets(0xFD01, [1, 2, 3, 0xFF], payloads)
+    expected = [gate.create_packet(0xFD01, seq, pid, body)
+                for seq, (pid, body) in enumerate(zip([1, 2, 3, 0xFF], payloads))]
+    assert [bytes(buffer[offsets[i]:offsets[i + 1]]) for i in range(4)] == expected
+
+
+def test_create_packets_broadcasts_numpy_scalars():
+    np = pytest.importorskip("numpy")
+    gate = FDOGate(clock=SimulatedClock(START_MS))
+    plain, _ = gate.create_packets(0xFD01, [1, 2], rlcp_flags=3, fingerprints=0xABCD)
+    numpy, _ = gate.create_packets(np.uint16(0xFD01), np.array([1, 2], dtype=np.uint32),
+                                   rlcp_flags=np.uint8(3), fingerprints=np.uint32(0xABCD))
+    arrays, _ = gate.create_packets(0xFD01, [1, 2], rlcp_flags=np.array([3, 3], dtype=np.uint8),
+                                    sequences=np.arange(2, dtype=np.uint8))
+    assert numpy == plain
+    assert arrays == gate.create_packets(0xFD01, [1, 2], rlcp_flags=3)[0]
+
+
+def test_create_packets_rejects_a_short_out_buffer():
+    gate = FDOGate(clock=SimulatedClock(START_MS))
+    with pytest.raises(ValueError):
+        gate.create_packets(0xFD01, [1, 2], b"xy", out=bytearray(2 * HEADER_SIZE + 3))
+    out = bytearray(2 * HEADER_SIZE + 8)
+    buffer, offsets = gate.create_packets(0xFD01, [1, 2], b"xy", out=out)
+    assert buffer is out and offsets[-1] == 2 * HEADER_SIZE + 4
+
+
+def test_locked_replay_filter_admits_each_header_once():
+    replay = ReplayFilter(lock=threading.Lock())
+    headers = [(START_MS, fingerprint, 1, 0) for fingerprint in range(2000)]
+    fresh = []
+
+    def feed():
+        fresh.append(sum(not replay.seen(*header) for header in headers))
+
+    threads = [threading.Thread(target=feed) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(fresh) == len(headers)
+
+
+def test_shard_routing_gathers_the_same_bytes_from_lists_and_buffers():
+    np = pytest.importorskip("numpy")
+    gate_shard = pytest.importorskip("gate_shard")
+    packets, _, _ = packet_mix(500, seed=2)
+    buffer = b"".join(packets)
+    offsets = [0]
+    for packet in packets:
+        offsets.append(offsets[-1] + len(packet))
+    heads, lengths = gate_shard._significant_bytes(packets, None)
+    buffer_heads, buffer_lengths = gate_shard._significant_bytes(buffer, offsets)
+    assert lengths.tolist() == buffer_lengths.tolist() == [len(packet) for packet in packets]
+    keep = np.arange(gate_shard.SIGNIFICANT_BYTES) < np.minimum(lengths, gate_shard.SIGNIFICANT_BYTES)[:, None]
+    assert (heads[keep] == buffer_heads[keep]).all()
+    assert bytes(heads[keep]) == b"".join(packet[:gate_shard.SIGNIFICANT_BYTES] for packet in packets)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="batch validation equivalence check")
+    parser.add_argument("--packets", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    gate_vector = _gate_vector()
+    packets, plain, replay = packet_mix(args.packets, args.seed)
+    failures = check_paths(packets, plain, False, gate_vector) + check_paths(packets, replay, True, gate_vector)
+    counts = {name: plain.count(code) for code, name in enumerate(VERDICT_NAMES)}
+    counts["replayed"] = replay.count(VERDICT_REPLAYED)
+    print(", ".join(f"{name} {count}" for name, count in counts.items()))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("batch paths agree")
+
+
+if __name__ == "__main__":
+    main()
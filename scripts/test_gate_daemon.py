@@ -0,0 +1,169 @@
+"""
+Gate daemon checks.
+
+Starts src/gate_daemon.py's GateDaemon on loopback with an upstream
+listener and checks that valid segments sent as length-prefixed TCP frames
+(split across writes) and as UDP datagrams reach the upstream intact and in
+order, that rejected segments are counted under their verdict names, and
+that oversize frames, backpressure and a lost upstream are counted as drops.
+
+    python -m pytest scripts/test_gate_daemon.py
+"""
+
+import asyncio
+import os
+import socket
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "src"))
+
+from fdo_gate import FDOGate  # noqa: E402
+from gate_clock import SimulatedClock  # noqa: E402
+from gate_daemon import FRAME, GateDaemon  # noqa: E402
+
+START_MS = 1_000_000
+LOOPBACK = ("127.0.0.1", 0)
+
+
+def _gate():
+    return FDOGate(clock=SimulatedClock(START_MS))
+
+
+def _segments(gate):
+    """Three forwardable segments and one of each gate rejection."""
+    valid = [gate.create_packet(0xFD01, seq, 0x01, b"segment-%d" % seq) for seq in range(3)]
+    corrupt = bytearray(valid[0])
+    corrupt[3] ^= 0x01
+    rejected = [bytes(corrupt), gate.create_packet(0xFD01, 9, 0xFF), valid[0][:10]]
+    return valid, rejected
+
+
+def _frame(segment):
+    return FRAME.pack(len(segment)) + segment
+
+
+def _port(server):
+    return server.sockets[0].getsockname()[1]
+
+
+class _Upstream:
+    """Collects the frames the daemon forwards."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.server = None
+
+    async def start(self):
+        async def accept(reader, writer):
+            while data := await reader.read(65536):
+                self.buffer += data
+        self.server = await asyncio.start_server(accept, *LOOPBACK)
+        return ("127.0.0.1", _port(self.server))
+
+    def frames(self):
+        frames, pos = [], 0
+        while pos < len(self.buffer):
+            (length,) = FRAME.unpack_from(self.buffer, pos)
+            frames.append(bytes(self.buffer[pos + FRAME.size:pos + FRAME.size + length]))
+            pos += FRAME.size + length
+        return frames
+
+    async def wait_for(self, count):
+        for _ in range(200):
+            if len(self.frames()) >= count:
+                return self.frames()
+            await asyncio.sleep(0.01)
+        return self.frames()
+
+
+def test_tcp_frames_are_forwarded_and_drops_counted():
+    async def scenario():
+        gate = _gate()
+        valid, rejected = _segments(gate)
+        upstream = _Upstream()
+        daemon = GateDaemon(gate=gate, upstream=await upstream.start(), batch_size=2)
+        await daemon.start(tcp=LOOPBACK)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", _port(daemon._servers[0]))
+            stream = b"".join(_frame(s) for s in [valid[0], rejected[0], valid[1], rejected[1], rejected[2], valid[2]])
+            for cut in (3, 20, len(stream) // 2, len(stream)):  # split inside prefixes and bodies
+                writer.write(stream[:cut])
+                stream = stream[cut:]
+                await writer.drain()
+                await asyncio.sleep(0.01)
+            forwarded = await upstream.wait_for(3)
+            writer.close()
+        finally:
+            daemon.close()
+            upstream.server.close()
+        return forwarded, daemon.stats()
+
+    forwarded, stats = asyncio.run(scenario())
+    assert forwarded == _segments(_gate())[0]
+    assert stats["received"] == 6
+    assert stats["forwarded"] == 3
+    assert stats["dropped"] == {"checksum_mismatch": 1, "policy_rejected": 1, "too_short": 1}
+
+
+def test_udp_datagrams_are_forwarded_and_drops_counted():
+    async def scenario():
+        gate = _gate()
+        valid, rejected = _segments(gate)
+        upstream = _Upstream()
+        daemon = GateDaemon(gate=gate, upstream=await upstream.start(), udp_flush_delay=0.001)
+        await daemon.start(udp=LOOPBACK)
+        address = daemon._servers[0].get_extra_info("sockname")
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for segment in valid + rejected:
+                sender.sendto(segment, address)
+            forwarded = await upstream.wait_for(3)
+            for _ in range(200):
+                if daemon.received == 6:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            sender.close()
+            daemon.close()
+            upstream.server.close()
+        return forwarded, daemon.stats()
+
+    forwarded, stats = asyncio.run(scenario())
+    assert forwarded == _segments(_gate())[0]
+    assert stats["forwarded"] == 3
+    assert stats["dropped"] == {"checksum_mismatch": 1, "policy_rejected": 1, "too_short": 1}
+
+
+def test_oversize_frame_closes_the_connection():
+    async def scenario():
+        daemon = GateDaemon(gate=_gate(), max_frame=64)
+        await daemon.start(tcp=LOOPBACK)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", _port(daemon._servers[0]))
+            writer.write(FRAME.pack(65) + b"x" * 65)
+            await writer.drain()
+            closed = await asyncio.wait_for(reader.read(), 2) == b""
+            writer.close()
+        finally:
+            daemon.close()
+        return closed, daemon.stats()
+
+    closed, stats = asyncio.run(scenario())
+    assert closed
+    assert stats["received"] == 0
+    assert stats["dropped"] == {"oversize": 1}
+
+
+def test_backpressure_and_lost_upstream_are_counted():
+    gate = _gate()
+    valid, _ = _segments(gate)
+    daemon = GateDaemon(gate=gate, upstream=("127.0.0.1", 9))  # never connected: upstream lost
+    daemon.arbitrate(valid)
+    daemon._set_backpressure(True)
+    daemon.arbitrate(valid[:2], datagram=True)
+    stats = daemon.stats()
+    assert stats["received"] == 5
+    assert stats["forwarded"] == 0
+    assert stats["dropped"] == {"upstream_unavailable": 3, "backpressure": 2}
+    assert stats["backpressure"] is True
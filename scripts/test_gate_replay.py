@@ -0,0 +1,87 @@
+"""
+Capture replay parser checks.
+
+Writes small pcapng captures with src/gate_replay.py's generator and by hand,
+and checks that Capture.records() reads the segments back, raises the
+malformed-capture ValueError for packet blocks that name an undescribed
+interface (or come before any) or are too short for their fields, and never
+reads a segment past the end of its block.
+
+    python -m pytest scripts/test_gate_replay.py
+"""
+
+import os
+import struct
+import sys
+
+import pytest
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "src"))
+
+from gate_replay import (  # noqa: E402
+    LINKTYPE_USER0,
+    PCAPNG_BYTE_ORDER,
+    PCAPNG_SHB,
+    Capture,
+    synthesize_traffic,
+    write_capture,
+)
+
+SHB = struct.pack("<IIIHHqI", PCAPNG_SHB, 28, PCAPNG_BYTE_ORDER, 1, 0, -1, 28)
+IDB = struct.pack("<IIHHII", 1, 20, LINKTYPE_USER0, 0, 65535, 20)
+
+
+def _block(block_type, body):
+    body += bytes(-len(body) % 4)
+    length = 12 + len(body)
+    return struct.pack("<II", block_type, length) + body + struct.pack("<I", length)
+
+
+def _epb(segment, interface=0, captured=None):
+    captured = len(segment) if captured is None else captured
+    return _block(6, struct.pack("<IIIII", interface, 0, 1000, captured, len(segment)) + segment)
+
+
+def _spb(segment):
+    return _block(3, struct.pack("<I", len(segment)) + segment)
+
+
+def _records(tmp_path, data):
+    path = tmp_path / "capture.pcapng"
+    path.write_bytes(data)
+    with Capture(str(path)) as capture:
+        return [bytes(capture.buffer[start:end]) for _, start, end in capture.records()]
+
+
+def test_generated_pcapng_round_trips(tmp_path):
+    records = list(synthesize_traffic(50, seed=3, start_ns=1_767_225_600 * 10**9))
+    path = str(tmp_path / "gate.pcapng")
+    write_capture(path, records, "pcapng")
+    with Capture(path) as capture:
+        read = [(timestamp, bytes(capture.buffer[start:end])) for timestamp, start, end in capture.records()]
+    assert read == records
+
+
+def test_user_dlt_blocks_are_read_in_place(tmp_path):
+    assert _records(tmp_path, SHB + IDB + _epb(b"segment-one") + _spb(b"segment-two")) == [
+        b"segment-one", b"segment-two"
+    ]
+
+
+def test_captured_length_is_clamped_to_the_block(tmp_path):
+    # An EPB claiming 4 KiB captured must not run into the SPB after it.
+    segments = _records(tmp_path, SHB + IDB + _epb(b"short", captured=4096) + _spb(b"next"))
+    assert segments == [b"short\0\0\0", b"next"]
+
+
+@pytest.mark.parametrize("blocks, problem", [
+    (_spb(b"early"), "before any interface"),
+    (_epb(b"early"), "interface 0, 0 described"),
+    (IDB + _epb(b"elsewhere", interface=2), "interface 2, 1 described"),
+    (IDB + _block(6, b"\0" * 8), "too short"),
+    (_block(1, b""), "too short"),
+])
+def test_malformed_blocks_raise(tmp_path, blocks, problem):
+    with pytest.raises(ValueError, match=problem):
+        _records(tmp_path, SHB + blocks)
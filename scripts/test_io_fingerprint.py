@@ -41,8 +41,10 @@ def test_io_fingerprint_convergence():
         
         # Create a packet with this fingerprint
         # Using Magic=0xFDO1 (simulated), Policy=0x01 (Public)
-        # Note: create_packet uses dummy_fingerprint inside, we might need to modify it or just verify the concept here.
-        # Ideally, we should pass the fingerprint to create_packet, but the helper uses a fixed one.
+        packet = gate.create_packet(0xFD01, i, 0x01, b"", fingerprint=fingerprint_val)
+        stamped = struct.unpack('!HIIIH', packet[:16])[2]
+        assert stamped == fingerprint_val, f"fingerprint not stamped: {stamped} != {fingerprint_val}"
+        assert gate.process_packet(packet)["status"] == "forwarded"
         # For this test, we are testing the logic of convergence, so we will track the 'measured_latency' convergence.
         
         history.append(measured_latency)
@@ -0,0 +1,497 @@
+"""
+MCP server behaviour checks.
+
+Drives src/mcp_server.py in-process: the handshake's JSON codec against the
+json module, the argv pre-scan against argparse, and the synchronous
+handshake on raw file descriptors (pre-serialized answers, hand-off to the
+full server without buffering a large first call, the frame size cap on
+both transports), and MCPServer's pipelining (a slow call answered after a
+later one, every call answered once within the in-flight cap, a failed
+job still answering its calls), the binary transport's raw attachments
+(packets built and verdicts returned as bytes, matching the JSON path),
+and its queued logging (file rotation,
+verdict sampling, the level checked before any formatting, everything
+written by the time the listener stops); then spawns the server for a whole session, and a
+resident --listen server for concurrent socket and --connect sessions
+sharing one replay cache.
+
+    python -m pytest scripts/test_mcp_server.py
+"""
+
+import asyncio
+import io
+import json
+import math
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(script_dir, "..", "src"))
+sys.path.append(src_dir)
+
+import mcp_server  # noqa: E402
+
+
+def _message(transport, msg, attachment=b""):
+    if transport == "binary":
+        return mcp_server.encode_frame({**msg, mcp_server.ATTACHMENT: attachment})
+    return mcp_server.encode_message(msg)
+
+
+def _handshake(transport, data):
+    """answer_handshake over `data`: (bytes it wrote, bytes it left for the server)."""
+    with tempfile.TemporaryFile() as stdin, tempfile.TemporaryFile() as stdout:
+        stdin.write(data)
+        stdin.seek(0)
+        rest, loader = mcp_server.answer_handshake(transport, stdin.fileno(), stdout.fileno())
+        assert loader is None
+        stdout.seek(0)
+        return stdout.read(), rest
+
+
+@pytest.mark.parametrize("transport", ["lines", "binary"])
+def test_handshake_answers_then_hands_off_a_large_call(transport):
+    wrap = mcp_server.TRANSPORTS[transport][2]
+    call = _message(transport, {
+        "jsonrpc": "2.0", "id": 3, "method": "tools/call",
+        "params": {"name": "validate_segments", "arguments": {"blob": "00" * (4 << 20), "offsets": [0]}},
+    }, attachment=b"\0" * (4 << 20))
+    data = (_message(transport, {"jsonrpc": "2.0", "id": 1, "method": "initialize"})
+            + _message(transport, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+            + _message(transport, {"jsonrpc": "2.0", "id": "two", "method": "tools/list"})
+            + call)
+    written, rest = _handshake(transport, data)
+    assert written == (mcp_server.precomputed_response({"method": "initialize", "id": 1}, wrap)
+                       + mcp_server.precomputed_response({"method": "tools/list", "id": "two"}, wrap))
+    # The call is left for the server after at most one read past the limit.
+    assert call.startswith(rest)
+    assert len(rest) <= mcp_server.HANDSHAKE_MESSAGE_LIMIT + 65536
+
+
+def test_handshake_skips_blank_lines_and_stops_at_malformed_input():
+    data = b"\n  \n" + _message("lines", {"jsonrpc": "2.0", "id": 1, "method": "initialize"}) + b"{oops\n"
+    written, rest = _handshake("lines", data)
+    assert written == mcp_server.precomputed_response({"method": "initialize", "id": 1}, mcp_server.frame_line)
+    assert rest == b"{oops\n"
+
+
+def test_handshake_leaves_an_oversized_frame_to_the_server(monkeypatch):
+    monkeypatch.setattr(mcp_server, "max_frame_size", 1024)
+    oversized = mcp_server.FRAME.pack(10, 4096) + b"x" * 100
+    written, rest = _handshake("binary", _message("binary", {"id": 1, "method": "initialize"}) + oversized)
+    assert written.endswith(mcp_server.PRECOMPUTED_RESULTS["initialize"] + b"}")
+    assert rest == oversized
+
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(rest)
+        return await mcp_server.read_frame_message(reader)
+
+    with pytest.raises(mcp_server.FrameTooLarge):
+        asyncio.run(read())
+
+
+def test_overlong_line_closes_the_lines_transport(monkeypatch):
+    monkeypatch.setattr(mcp_server, "max_frame_size", 1024)
+
+    async def read(data):
+        reader = asyncio.StreamReader(limit=mcp_server.max_frame_size)
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await mcp_server.read_line_message(reader)
+
+    assert asyncio.run(read(b'{"id":1}\n')) == {"id": 1}
+    with pytest.raises(mcp_server.FrameTooLarge):
+        asyncio.run(read(b'{"id":"' + b"x" * 2048 + b'"}\n'))
+
+
+def test_synchronous_message_helpers(monkeypatch):
+    monkeypatch.setattr(mcp_server, "max_frame_size", 64)
+    out = io.BytesIO()
+    mcp_server.send_message({"jsonrpc": "2.0", "id": 1, "result": {}}, out)
+    assert out.getvalue() == mcp_server.encode_message({"jsonrpc": "2.0", "id": 1, "result": {}})
+
+    stream = io.BytesIO(b"\n" + out.getvalue() + b'{"id":"' + b"x" * 64 + b'"}\n')
+    assert mcp_server.read_message(stream) == {"jsonrpc": "2.0", "id": 1, "result": {}}
+    assert mcp_server.read_message(stream) is None  # over the line cap
+    assert mcp_server.read_message(io.BytesIO(b"{oops\n")) is None
+    assert mcp_server.read_message(io.BytesIO(b"")) is None
+
+
+JSON_VALUES = [
+    {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {"clientInfo": {"name": "agent"}}},
+    {"id": "é→\u2028", "nested": [[], {}, [None, True, False]], "escapes": "\"\\\n\t\x00"},
+    [0, -1, 2 ** 70, 1.5, -0.0, 1e300, float("inf"), float("-inf")],
+    "plain string",
+    7,
+    None,
+]
+
+
+@pytest.mark.parametrize("value", JSON_VALUES)
+def test_handshake_codec_matches_the_json_module(value):
+    dumps, loads = mcp_server._stdlib_codec()
+    expected = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+    assert dumps(value) == expected
+    assert loads(expected) == json.loads(expected)
+    assert loads(bytearray(b" \n" + expected + b"\r\n")) == json.loads(expected)
+
+
+def test_handshake_codec_errors():
+    dumps, loads = mcp_server._stdlib_codec()
+    assert math.isnan(loads(b"NaN"))
+    assert dumps(float("nan")) == b"NaN"
+    for malformed in (b"", b"{", b'{"a":1} x', b"[1,]", b"\xff"):
+        with pytest.raises(ValueError):
+            loads(malformed)
+    with pytest.raises(TypeError):
+        dumps({"packet": b"bytes"})
+
+
+def test_stdio_option_table_matches_argparse():
+    parser = mcp_server.build_parser()
+    options = {option: action.nargs != 0 for action in parser._actions for option in action.option_strings}
+    for other_mode in ("-h", "--help", "--listen", "--connect"):
+        del options[other_mode]
+    assert options == mcp_server._STDIO_OPTIONS
+
+
+@pytest.mark.parametrize("argv, expected", [
+    ([], ("lines", mcp_server.DEFAULT_MAX_FRAME_SIZE)),
+    (["--transport", "binary", "--max-frame-size=4096", "--replay-filter", "--log-file", "x.log"], ("binary", 4096)),
+    (["--workers=3", "--transport=lines"], ("lines", mcp_server.DEFAULT_MAX_FRAME_SIZE)),
+    (["--trans", "binary"], None),          # abbreviation: argparse's to resolve
+    (["--listen", "/tmp/gate.sock"], None),
+    (["--connect=/tmp/gate.sock"], None),
+    (["-h"], None),
+    (["--replay-filter=yes"], None),
+    (["--log-file"], None),
+    (["--transport", "carrier-pigeon"], None),
+    (["--max-frame-size", "-1"], None),
+    (["stray"], None),
+])
+def test_stdio_options_read_off_argv(argv, expected):
+    assert mcp_server._stdio_options(argv) == expected
+    if expected is not None:
+        args = mcp_server.parse_args(argv)
+        assert (args.transport, args.max_frame_size) == expected
+
+
+@pytest.mark.parametrize("offsets", [[-16, 0, 32], [0, 16, 64], [16, 0, 32]])
+def test_validate_segments_rejects_bad_offsets(offsets):
+    request = {"params": {"name": "validate_segments", "arguments": {"blob": "00" * 32, "offsets": offsets}}}
+    response = mcp_server.handle_call_tool(request, 4)
+    assert response["error"]["code"] == -32603
+    assert "offsets" in response["error"]["message"]
+
+
+def test_modules_import_as_the_src_package():
+    probe = (
+        "import sys\n"
+        "import src.gate_metrics, src.gate_vector, src.gate_shard, src.mcp_server as server\n"
+        "server.use_fast_json()\n"
+        "assert server._import_fdo_gate() is sys.modules['src.fdo_gate']\n"
+        "assert server.get_gate().validate_batch([b'short']) == bytearray([1])\n"
+        "assert not {'fdo_gate', 'gate_clock', 'fast_json'} & set(sys.modules), 'loaded from src/ as top-level'\n"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], cwd=os.path.dirname(src_dir), capture_output=True)
+    assert result.returncode == 0, result.stderr.decode()
+
+
+class _Writer:
+    """StreamWriter stand-in that keeps every write."""
+
+    def __init__(self, on_write=None):
+        self.writes = []
+        self.on_write = on_write
+
+    def write(self, data):
+        self.writes.append(data)
+        if self.on_write is not None:
+            self.on_write(data)
+
+    async def drain(self):
+        pass
+
+
+def _pipeline(messages, writer, **options):
+    """Serve `messages` through an in-process MCPServer; the ids in answer order."""
+    async def serve():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"".join(mcp_server.encode_message(m) for m in messages))
+        reader.feed_eof()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            await mcp_server.MCPServer(executor, **options).serve(reader, writer)
+
+    asyncio.run(serve())
+    return [json.loads(line)["id"] for line in b"".join(writer.writes).splitlines()]
+
+
+def test_a_slow_call_does_not_hold_back_later_answers(monkeypatch):
+    answered = threading.Event()
+
+    def handle_call_tool(request, request_id):
+        if request_id == 1:
+            assert answered.wait(10), "call 2 was not answered while call 1 ran"
+        return {"jsonrpc": "2.0", "id": request_id, "result": {}}
+
+    monkeypatch.setattr(mcp_server, "handle_call_tool", handle_call_tool)
+    writer = _Writer(lambda data: b'"id":2' in data and answered.set())
+    messages = [{"jsonrpc": "2.0", "id": 1, "method": "initialize"}, _call(1, "slow"), _call(2, "fast")]
+    assert _pipeline(messages, writer, batch_size=1) == [1, 2, 1]
+
+
+def test_every_call_is_answered_once_within_the_inflight_cap(monkeypatch):
+    lock = threading.Lock()
+    running = [0, 0]  # now, most at once
+
+    def handle_call_tool(request, request_id):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.001)
+        with lock:
+            running[0] -= 1
+        return {"jsonrpc": "2.0", "id": request_id, "result": {}}
+
+    monkeypatch.setattr(mcp_server, "handle_call_tool", handle_call_tool)
+    ids = _pipeline([_call(i, "any") for i in range(200)], _Writer(), batch_size=1, max_inflight=3)
+    assert sorted(ids) == list(range(200))
+    assert 1 < running[1] <= 3
+
+
+def test_a_failed_job_still_answers_its_calls(monkeypatch):
+    def handle_call_tool(request, request_id):
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(mcp_server, "handle_call_tool", handle_call_tool)
+    writer = _Writer()
+    assert sorted(_pipeline([_call(i, "any") for i in range(5)], writer, batch_size=2)) == list(range(5))
+    errors = [json.loads(line)["error"] for line in b"".join(writer.writes).splitlines()]
+    assert errors == [{"code": -32603, "message": "worker died"}] * 5
+
+
+def _binary_session(messages):
+    """Serve `messages` over the binary transport in-process: responses by id, attachments kept."""
+    async def serve():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"".join(_message("binary", m, m.pop(mcp_server.ATTACHMENT, b"")) for m in messages))
+        reader.feed_eof()
+        writer = _Writer()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            await mcp_server.MCPServer(executor, transport="binary").serve(reader, writer)
+        out = asyncio.StreamReader()
+        out.feed_data(b"".join(writer.writes))
+        out.feed_eof()
+        responses = {}
+        while (response := await mcp_server.read_frame_message(out)) is not None:
+            responses[response["id"]] = response
+        return responses
+
+    return asyncio.run(serve())
+
+
+def test_binary_transport_ships_packets_and_verdicts_raw():
+    built = _binary_session([_call(1, "create_packets", policy_ids=[1, 2, 0xFF], payload_hex="abcd",
+                                   encoding="binary")])[1]
+    buffer, offsets = built[mcp_server.ATTACHMENT], _text(built)["offsets"]
+    assert _text(built) == {"offsets": offsets} and offsets[-1] == len(buffer)
+    as_json = _text(mcp_server.handle_call_tool(
+        _call(2, "create_packets", policy_ids=[1, 2, 0xFF], payload_hex="abcd"), 2))
+    assert as_json["offsets"] == offsets and len(as_json["blob"]) == 2 * len(buffer)
+
+    checked = _binary_session([{**_call(2, "validate_segments", offsets=offsets), mcp_server.ATTACHMENT: buffer}])[2]
+    assert _text(checked) == {"count": 3, "forwarded": 2}
+    assert checked[mcp_server.ATTACHMENT] == bytes([0, 0, 4])
+    as_json = _text(mcp_server.handle_call_tool(_call(3, "validate_segments", blob=buffer.hex(), offsets=offsets), 3))
+    assert as_json == {"count": 3, "forwarded": 2, "verdicts": [0, 0, 4]}
+
+
+def test_binary_encoding_needs_the_binary_transport():
+    response = mcp_server.handle_call_tool(_call(1, "create_packets", policy_ids=[1], encoding="binary"), 1)
+    assert response["error"]["message"] == 'encoding "binary" requires the binary transport'
+    response = _binary_session([_call(2, "validate_segments")])[2]
+    assert response["error"]["message"] == "an attachment requires `offsets`"
+
+
+@pytest.fixture
+def log_setup(tmp_path):
+    """setup_logging into tmp_path; undone (listener stopped, fdo_gate logger reset) afterwards."""
+    import logging
+
+    listeners = []
+
+    def setup(**options):
+        listener = mcp_server.setup_logging(str(tmp_path / "mcp.log"), **options)
+        listeners.append(listener)
+        return listener
+
+    yield setup
+    for listener in listeners:
+        if listener._thread is not None:
+            listener.stop()
+    root = logging.getLogger("fdo_gate")
+    root.handlers[:] = []
+    root.setLevel(logging.NOTSET)
+    root.propagate = True
+    mcp_server._verdict_sampler.__init__()
+
+
+def _log_lines(tmp_path, name="mcp.log"):
+    return (tmp_path / name).read_text(encoding="utf-8").splitlines()
+
+
+def test_log_file_rotates_and_is_complete_once_stopped(log_setup, tmp_path):
+    listener = log_setup(max_bytes=1024, backup_count=2)
+    for i in range(200):
+        mcp_server.log_verdict(True, f"packet {i:03d}")
+    listener.stop()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["mcp.log", "mcp.log.1", "mcp.log.2"]
+    assert all(p.stat().st_size <= 1024 for p in tmp_path.iterdir())
+    assert _log_lines(tmp_path)[-1].endswith("Layer 5 Allowed: Packet accepted. Msg: packet 199")
+
+
+@pytest.mark.parametrize("rate, kept", [(1.0, 40), (0.25, 10), (0, 0)])
+def test_verdict_lines_are_sampled(log_setup, tmp_path, rate, kept):
+    listener = log_setup(sample_rate=rate)
+    for i in range(40):
+        mcp_server.log_verdict(i % 2 == 0, "sampled")
+    mcp_server.logger.error("not a verdict line")
+    listener.stop()
+    lines = _log_lines(tmp_path)
+    assert len(lines) == kept + 1
+    assert lines[-1].endswith("ERROR fdo_gate.mcp: not a verdict line")
+
+
+def test_log_level_is_checked_before_formatting(log_setup, tmp_path):
+    formatted = []
+
+    class Reason:
+        def __str__(self):
+            formatted.append(self)
+            return "reason"
+
+    listener = log_setup(level=mcp_server._WARNING, sample_rate=0.5)
+    for _ in range(10):
+        mcp_server.log_verdict(True, Reason())
+    assert mcp_server._verdict_sampler._count == 0  # below the level: not even sampled
+    dropped, kept = Reason(), Reason()
+    mcp_server.log_verdict(False, dropped)
+    mcp_server.log_verdict(False, kept)
+    listener.stop()
+    assert formatted and all(reason is kept for reason in formatted)  # the rotating handler formats twice
+    assert _log_lines(tmp_path) == [_log_lines(tmp_path)[0]]
+    assert _log_lines(tmp_path)[0].endswith("Layer 5 BLOCK: Packet rejected. Reason: reason")
+
+
+def _spawn(args, data, timeout=60):
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+    with tempfile.TemporaryDirectory() as tmp:
+        return subprocess.run(
+            [sys.executable, "mcp_server.py", "--log-file", os.path.join(tmp, "mcp.log"), *args],
+            cwd=src_dir, input=data, capture_output=True, timeout=timeout, env=env,
+        )
+
+
+def _responses(transport, stdout):
+    if transport == "lines":
+        return [json.loads(line) for line in stdout.splitlines()]
+    responses = []
+    while stdout:
+        json_length, attachment_length = mcp_server.FRAME.unpack_from(stdout)
+        end = mcp_server.FRAME.size + json_length
+        responses.append(json.loads(stdout[mcp_server.FRAME.size:end]))
+        stdout = stdout[end + attachment_length:]
+    return responses
+
+
+@pytest.mark.parametrize("transport", ["lines", "binary"])
+def test_spawned_session_serves_calls_after_the_handshake(transport):
+    messages = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize"},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": 3, "method": "tools/call",
+         "params": {"name": "create_packet", "arguments": {"magic": 0xFD01, "sequence": 1, "policy_id": 1}}},
+    ]
+    result = _spawn(["--transport", transport], b"".join(_message(transport, m) for m in messages))
+    assert result.returncode == 0, result.stderr
+    responses = {r["id"]: r for r in _responses(transport, result.stdout)}
+    assert responses[1]["result"]["serverInfo"]["name"] == "fdo-gate-mcp"
+    assert [t["name"] for t in responses[2]["result"]["tools"]][:2] == ["validate_segment", "create_packet"]
+    assert len(bytes.fromhex(responses[3]["result"]["content"][0]["text"])) == 16
+
+
+def test_spawned_session_reports_a_bad_option_after_the_handshake():
+    result = _spawn(["--workers", "many"], _message("lines", {"jsonrpc": "2.0", "id": 1, "method": "initialize"}))
+    assert json.loads(result.stdout)["id"] == 1
+    assert result.returncode == 2
+    assert b"--workers: invalid int value" in result.stderr
+
+
+def _call(request_id, name, **arguments):
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": name, "arguments": arguments}}
+
+
+def _text(response):
+    return json.loads(response["result"]["content"][0]["text"])
+
+
+def test_listen_sessions_share_one_replay_cache():
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+    with tempfile.TemporaryDirectory(prefix="mcp-") as tmp:
+        path = os.path.join(tmp, "gate.sock")
+        server = subprocess.Popen(
+            [sys.executable, "mcp_server.py", "--listen", path, "--replay-filter", "--workers", "4",
+             "--log-file", os.path.join(tmp, "mcp.log")],
+            cwd=src_dir, env=env, stderr=subprocess.PIPE,
+        )
+        try:
+            deadline = time.monotonic() + 30
+            while not os.path.exists(path):
+                assert server.poll() is None, server.stderr.read().decode()
+                assert time.monotonic() < deadline, "server never listened"
+                time.sleep(0.05)
+
+            first = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            first.connect(path)
+            lines = first.makefile("rb")
+
+            def ask(msg):
+                first.sendall(mcp_server.encode_message(msg))
+                return json.loads(lines.readline())
+
+            packet = ask(_call(1, "create_packet", magic=0xFD01, sequence=7, policy_id=1))
+            packet = packet["result"]["content"][0]["text"]
+            assert _text(ask(_call(2, "validate_segments", packets=[packet])))["verdicts"] == [0]
+
+            # A second session, through the stdio relay, while the first stays open.
+            relayed = subprocess.run(
+                [sys.executable, "mcp_server.py", "--connect", path], cwd=src_dir, env=env, timeout=60,
+                input=mcp_server.encode_message({"jsonrpc": "2.0", "id": 1, "method": "initialize"})
+                + mcp_server.encode_message(_call(2, "validate_segments", packets=[packet]))
+                + mcp_server.encode_message(_call(3, "create_packet", magic=0xFD01, sequence=8, policy_id=2)),
+                capture_output=True,
+            )
+            responses = {r["id"]: r for r in _responses("lines", relayed.stdout)}
+            assert relayed.returncode == 0, relayed.stderr
+            assert responses[1]["result"]["serverInfo"]["name"] == "fdo-gate-mcp"
+            assert _text(responses[2])["verdicts"] == [5]  # replayed: seen by the first session
+            other = responses[3]["result"]["content"][0]["text"]
+
+            assert _text(ask(_call(3, "validate_segments", packets=[other, packet])))["verdicts"] == [0, 5]
+            first.close()
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+        assert not os.path.exists(path)
@@ -0,0 +1,240 @@
+"""
+MCP server startup regression check.
+
+Agents spawn src/mcp_server.py once per session, so its import cost and the
+time until it answers `initialize` are part of every session. The checks
+fail when:
+
+- importing mcp_server pulls in the gate, the serving runtime or the stdlib
+  modules the handshake avoids (fdo_gate, json, re, threading, asyncio,
+  worker pools, logging, base64, argparse, the fast JSON backend), builds
+  the gate, or touches sys.path;
+- the precomputed initialize / tools/list bytes drift from the handlers, or
+  the verdict codes in the tool list from fdo_gate.VERDICT_NAMES;
+- `python -X importtime` puts the repo's own modules over --own-budget-ms,
+  or the whole import over --import-budget-ms (medians over --runs);
+- a cold spawn answers `initialize` more than --initialize-budget-ms after
+  a bare interpreter would have exited (median over --runs), for
+  `python mcp_server.py` and for `python -m mcp_server`.
+
+`-m` loads mcp_server from __pycache__; the script spawn also compiles
+mcp_server.py, which is never cached as bytecode when run as __main__, and
+that is most of what it spends past bare interpreter startup.
+
+    python -m pytest scripts/test_mcp_startup.py
+    python scripts/test_mcp_startup.py --runs 21 --initialize-budget-ms 10
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(script_dir, "..", "src"))
+
+OWN_MODULES = ("mcp_server",)
+DEFERRED_MODULES = (
+    "fdo_gate",
+    "json",
+    "re",
+    "threading",
+    "logging",
+    "base64",
+    "asyncio",
+    "concurrent.futures",
+    "multiprocessing",
+    "logging.handlers",
+    "argparse",
+    "random",
+    "fast_json",
+    "orjson",
+)
+INITIALIZE = b'{"jsonrpc":"2.0","id":1,"method":"initialize"}\n'
+
+RUNS = 11
+OWN_BUDGET_MS = 3.0
+IMPORT_BUDGET_MS = 5.0
+# Past bare interpreter startup. The script spawn also compiles
+# mcp_server.py (about 10 ms here); `-m` loads it from __pycache__.
+INITIALIZE_BUDGET_MS = {"script": 20.0, "module": 10.0}
+SPAWNS = {"script": ["mcp_server.py"], "module": ["-m", "mcp_server"]}
+
+
+def _python(*args, **kwargs):
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # measure with bytecode caches, as deployed
+    return subprocess.run([sys.executable, *args], cwd=src_dir, env=env, capture_output=True, **kwargs)
+
+
+def check_import_side_effects():
+    probe = (
+        "import sys\n"
+        "before = set(sys.modules)\n"
+        "path = list(sys.path)\n"
+        "import mcp_server\n"
+        f"loaded = [m for m in {DEFERRED_MODULES!r} if m in sys.modules and m not in before]\n"
+        "print({'loaded': loaded, 'gate_built': mcp_server._gate is not None,"
+        " 'path_changed': sys.path != path})\n"
+    )
+    # The probe prints a repr: importing json there would hide mcp_server importing it.
+    result = _python("-c", probe, check=True)
+    report = ast.literal_eval(result.stdout.decode())
+    failures = []
+    if report["loaded"]:
+        failures.append(f"import mcp_server loaded deferred modules: {', '.join(report['loaded'])}")
+    if report["gate_built"]:
+        failures.append("import mcp_server built the FDOGate")
+    if report["path_changed"]:
+        failures.append("import mcp_server modified sys.path")
+    return failures
+
+
+def check_precomputed_responses():
+    sys.path.insert(0, src_dir)
+    import mcp_server
+
+    failures = []
+    for method, handler in (("initialize", mcp_server.handle_initialize),
+                            ("tools/list", mcp_server.handle_list_tools)):
+        for transport in mcp_server.TRANSPORTS:
+            _, encode, wrap, _ = mcp_server.TRANSPORTS[transport]
+            cached = mcp_server.precomputed_response({"method": method, "id": 7}, wrap)
+            if cached != encode(handler(7)):
+                failures.append(f"precomputed {method} response differs from the handler ({transport})")
+    import fdo_gate
+
+    expected = ", ".join(f"{code}={name}" for code, name in enumerate(fdo_gate.VERDICT_NAMES))
+    if mcp_server.VERDICT_CODES != expected:
+        failures.append("mcp_server.VERDICT_CODES differs from fdo_gate.VERDICT_NAMES")
+    return failures
+
+
+def import_times(runs):
+    """Median microseconds: (own modules' self time, mcp_server cumulative)."""
+    own, total = [], []
+    for _ in range(runs):
+        result = _python("-X", "importtime", "-c", "import mcp_server", check=True)
+        self_us = {}
+        cumulative_us = {}
+        for line in result.stderr.decode().splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            fields = line[len("import time:"):].split("|")
+            try:
+                self_time, cumulative = int(fields[0]), int(fields[1])
+            except ValueError:
+                continue  # column header
+            name = fields[2].strip()
+            self_us[name] = self_time
+            cumulative_us[name] = cumulative
+        own.append(sum(self_us.get(m, 0) for m in OWN_MODULES))
+        total.append(cumulative_us["mcp_server"])
+    return statistics.median(own), statistics.median(total)
+
+
+def _spawn_ms(args, send=None):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, *args], cwd=src_dir, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, env={k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"},
+    )
+    if send is None:
+        proc.wait()
+        return (time.perf_counter() - start) * 1e3
+    proc.stdin.write(send)
+    proc.stdin.flush()
+    line = proc.stdout.readline()
+    elapsed = (time.perf_counter() - start) * 1e3
+    proc.stdin.close()
+    proc.wait()
+    if json.loads(line)["result"]["serverInfo"]["name"] != "fdo-gate-mcp":
+        raise RuntimeError(f"unexpected initialize response: {line!r}")
+    return elapsed
+
+
+def initialize_latency(spawn, runs, log_file):
+    """
+    Median ms (bare interpreter, spawn-to-initialize, difference) over `runs`
+    cold spawns. Bare and server spawns alternate, and the budget applies to
+    the median of the per-pair differences, so both sides of each pair see
+    the same machine load.
+    """
+    server = [*SPAWNS[spawn], "--log-file", log_file]
+    pairs = [(_spawn_ms(["-c", "pass"]), _spawn_ms(server, INITIALIZE)) for _ in range(runs)]
+    return (statistics.median(p[0] for p in pairs), statistics.median(p[1] for p in pairs),
+            statistics.median(p[1] - p[0] for p in pairs))
+
+
+def check_import_budget(runs, own_budget_ms, import_budget_ms):
+    own_us, total_us = import_times(runs)
+    print(f"import mcp_server: {total_us / 1e3:6.1f} ms total, {own_us / 1e3:5.1f} ms in repo modules")
+    failures = []
+    if own_us / 1e3 > own_budget_ms:
+        failures.append(f"repo module import time {own_us / 1e3:.1f} ms > {own_budget_ms} ms")
+    if total_us / 1e3 > import_budget_ms:
+        failures.append(f"import time {total_us / 1e3:.1f} ms > {import_budget_ms} ms")
+    return failures
+
+
+def check_initialize_budget(spawn, runs, budget_ms):
+    log_file = os.path.join(os.environ.get("TMPDIR", "/tmp"), "mcp_startup_check.log")
+    baseline, answered, server = initialize_latency(spawn, runs, log_file)
+    print(f"cold spawn ({' '.join(SPAWNS[spawn])}) -> initialize: {answered:6.1f} ms"
+          f" (bare interpreter {baseline:.1f} ms, server {server:.1f} ms)")
+    if server > budget_ms:
+        return [f"{' '.join(SPAWNS[spawn])} answered initialize {server:.1f} ms after interpreter startup"
+                f" > {budget_ms} ms"]
+    return []
+
+
+def test_import_has_no_side_effects():
+    assert check_import_side_effects() == []
+
+
+def test_precomputed_responses_match_the_handlers():
+    assert check_precomputed_responses() == []
+
+
+def test_import_time_within_budget():
+    assert check_import_budget(RUNS, OWN_BUDGET_MS, IMPORT_BUDGET_MS) == []
+
+
+def test_script_spawn_answers_initialize_within_budget():
+    assert check_initialize_budget("script", RUNS, INITIALIZE_BUDGET_MS["script"]) == []
+
+
+def test_module_spawn_answers_initialize_within_budget():
+    assert check_initialize_budget("module", RUNS, INITIALIZE_BUDGET_MS["module"]) == []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MCP server startup budget check")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--own-budget-ms", type=float, default=OWN_BUDGET_MS,
+                        help="importtime self time of mcp_server")
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS,
+                        help="importtime cumulative time of `import mcp_server`")
+    parser.add_argument("--initialize-budget-ms", type=float, default=INITIALIZE_BUDGET_MS["module"],
+                        help="`python -m mcp_server` spawn-to-initialize time beyond bare interpreter startup")
+    parser.add_argument("--script-budget-ms", type=float, default=INITIALIZE_BUDGET_MS["script"],
+                        help="the same for `python mcp_server.py`, which also compiles the script")
+    args = parser.parse_args(argv)
+
+    failures = check_import_side_effects() + check_precomputed_responses()
+    failures += check_import_budget(args.runs, args.own_budget_ms, args.import_budget_ms)
+    failures += check_initialize_budget("script", args.runs, args.script_budget_ms)
+    failures += check_initialize_budget("module", args.runs, args.initialize_budget_ms)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("startup within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+PE-MsBV policy table check.
+
+Compiles src/Policy_Dictionary.json and a synthetic dictionary of
+--policies entries (dense IDs plus IDs past DENSE_POLICY_LIMIT) and fails
+(exit 1) when the compiled table disagrees with the dictionary: membership,
+sensitivity levels, enforcement actions, Stage 3 verdicts of a gate using
+it, the per-file compile cache and reload_policies, the built-in
+fallback versus FileNotFoundError for a missing policy file, and that a
+cached table cannot be modified through one gate under another. The same
+tables are written as MsBV snapshots and mapped back: contents, CRC and
+header rejection, atomic replacement under an open mapping, pickling by
+path, and a ShardedGate switched onto a snapshot.
+
+    python -m pytest scripts/test_policy_table.py
+    python scripts/test_policy_table.py
+    python scripts/test_policy_table.py --policies 100000
+"""
+
+import argparse
+import json
+import operator
+import os
+import pickle
+import random
+import sys
+import tempfile
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(script_dir, "..", "src"))
+sys.path.append(src_dir)
+
+from fdo_gate import (  # noqa: E402
+    DENSE_POLICY_LIMIT,
+    ENFORCEMENT_ACTIONS,
+    VERDICT_FORWARDED,
+    VERDICT_POLICY_REJECTED,
+    FDOGate,
+    MappedMsBVTable,
+    MsBVTable,
+    load_policy_table,
+    write_snapshot,
+)
+from gate_clock import SimulatedClock  # noqa: E402
+
+
+def synthetic_dictionary(count, seed):
+    """A Policy_Dictionary.json document; about 1 in 50 IDs lands past the dense range."""
+    rng = random.Random(seed)
+    ids = set()
+    while len(ids) < count:
+        if rng.randrange(50):
+            ids.add(rng.randrange(1, 4 * count))
+        else:
+            ids.add(rng.randrange(DENSE_POLICY_LIMIT, 1 << 32))
+    return {
+        "policy_mappings": [
+            {"policy_id": hex(pid) if pid % 2 else pid, "sensitivity_level": rng.randrange(256),
+             "enforcement_action": rng.choice(ENFORCEMENT_ACTIONS)}
+            for pid in sorted(ids)
+        ]
+    }
+
+
+def _int(value):
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+def check_table(label, table, document):
+    """Compare a loaded table against the dictionary it was compiled from."""
+    failures = []
+    expected = {_int(m["policy_id"]): (_int(m.get("sensitivity_level", 0)), m.get("enforcement_action", "FORWARD"))
+                for m in document["policy_mappings"]}
+    if len(table) != len(expected) or set(table) != set(expected):
+        failures.append(f"{label}: {len(table)} policies, expected {len(expected)}")
+    for policy_id, (level, action) in expected.items():
+        if policy_id not in table or table[policy_id] != level or table.action(policy_id) != action:
+            failures.append(f"{label}: policy {policy_id:#x} -> {table.get(policy_id)}, {table.action(policy_id)};"
+                            f" expected {level}, {action}")
+            break
+    rng = random.Random(len(expected))
+    absent = [pid for pid in (rng.randrange(1 << 32) for _ in range(2000)) if pid not in expected]
+    absent += [0, max(expected) + 1, DENSE_POLICY_LIMIT - 1, DENSE_POLICY_LIMIT, (1 << 32) - 1]
+    for policy_id in absent:
+        if policy_id in expected:
+            continue
+        if policy_id in table or table.action(policy_id) is not None:
+            failures.append(f"{label}: unregistered policy {policy_id:#x} found in the table")
+            break
+
+    clock = SimulatedClock(5_000)
+    gate = FDOGate(clock=clock)
+    gate.atomic_epoch_switch(table)
+    ids = rng.sample(sorted(expected), min(500, len(expected))) + absent[:500]
+    verdicts = gate.validate_batch([gate.create_packet(0xFD01, i, pid) for i, pid in enumerate(ids)])
+    want = [VERDICT_FORWARDED if pid in expected else VERDICT_POLICY_REJECTED for pid in ids]
+    if list(verdicts) != want:
+        failures.append(f"{label}: Stage 3 verdicts disagree with the dictionary")
+    return failures
+
+
+def check_dictionaries(count):
+    failures = []
+    with open(os.path.join(src_dir, "Policy_Dictionary.json"), encoding="utf-8") as f:
+        shipped = json.load(f)
+    failures += check_table("Policy_Dictionary.json", load_policy_table(), shipped)
+    document = synthetic_dictionary(count, seed=count)
+    failures += check_table("synthetic", MsBVTable.from_policy_dictionary(document), document)
+    try:
+        MsBVTable.from_policy_dictionary({"policy_mappings": [{"policy_id": 1, "enforcement_action": "ALLOW"}]})
+        failures.append("an unknown enforcement_action was accepted")
+    except ValueError:
+        pass
+    plain = MsBVTable.from_mapping({5: 1, 6: 2})
+    if plain.action(5) != "FORWARD" or MsBVTable.from_mapping(plain) is not plain:
+        failures.append("from_mapping did not compile a plain mapping, or recompiled a compiled table")
+    return failures
+
+
+def check_loading(count):
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "policies.json")
+        first = synthetic_dictionary(count, seed=1)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(first, f)
+        table = load_policy_table(path)
+        failures += check_table("loaded file", table, first)
+        if load_policy_table(path) is not table:
+            failures.append("loading an unchanged file compiled it again")
+        gate = FDOGate(policy_file=path)
+        if gate.msbv_table is not table:
+            failures.append("a gate over an unchanged file did not reuse the compiled table")
+
+        second = synthetic_dictionary(count // 2, seed=2)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(second, f)
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+        gate.reload_policies()
+        if gate.msbv_table is table:
+            failures.append("reload_policies kept the table of a rewritten file")
+        else:
+            failures += check_table("reloaded file", gate.msbv_table, second)
+
+        try:
+            load_policy_table(os.path.join(tmp, "missing.json"))
+            failures.append("a missing explicit policy file fell back to the built-in table")
+        except FileNotFoundError:
+            pass
+    if sorted(load_policy_table(None)) != [0x01, 0x02, 0x03, 0x04]:
+        failures.append("policy_file=None did not give the built-in 0x01-0x04 table")
+    return failures
+
+
+def check_immutable(count):
+    failures = []
+    document = synthetic_dictionary(count, seed=4)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "policies.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(document, f)
+        first, second = FDOGate(policy_file=path), FDOGate(policy_file=path)
+        table = first.msbv_table
+        policy_id = next(iter(table))
+        overflow_id = next(iter(table.overflow_actions), None)
+        for label, mutate in (
+            ("item assignment", lambda: table.__setitem__(0xFFFF_FF00, 1)),
+            ("deletion", lambda: table.__delitem__(policy_id)),
+            ("update", lambda: table.update({0xFFFF_FF00: 1})),
+            ("in-place union", lambda: table.__ior__({0xFFFF_FF00: 1})),
+            ("pop", lambda: table.pop(policy_id)),
+            ("setdefault", lambda: table.setdefault(0xFFFF_FF00, 1)),
+            ("clear", table.clear),
+            ("dense action write", lambda: operator.setitem(table.actions, policy_id, 0)),
+            ("overflow action write", lambda: operator.setitem(table.overflow_actions, overflow_id, 0)),
+        ):
+            try:
+                mutate()
+                failures.append(f"{label} modified a cached MsBVTable")
+            except TypeError:
+                pass
+        failures += check_table("table shared with another gate", second.msbv_table, document)
+    restored = pickle.loads(pickle.dumps(table))
+    if type(restored) is not MsBVTable or dict(restored) != dict(table) or restored.source != table.source:
+        failures.append("an MsBVTable did not survive pickling")
+    else:
+        failures += check_table("unpickled table", restored, document)
+    return failures
+
+
+def _rejected(path, **options):
+    try:
+        MappedMsBVTable(path, **options)
+    except ValueError:
+        return True
+    return False
+
+
+def check_snapshots(count):
+    failures = []
+    first = synthetic_dictionary(count, seed=3)
+    # Same IDs, new levels: the replacement snapshot has exactly the same size.
+    second = {"policy_mappings": [{**m, "sensitivity_level": (m["sensitivity_level"] + 1) % 256}
+                                  for m in first["policy_mappings"]]}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "policies.msbv")
+        write_snapshot(MsBVTable.from_policy_dictionary(first), path)
+        mapped = load_policy_table(path)
+        if not isinstance(mapped, MappedMsBVTable):
+            failures.append("load_policy_table did not map a snapshot file")
+        failures += check_table("snapshot", mapped, first)
+        if os.listdir(tmp) != ["policies.msbv"]:
+            failures.append(f"write_snapshot left files behind: {sorted(os.listdir(tmp))}")
+
+        restored = pickle.loads(pickle.dumps(mapped))
+        if not isinstance(restored, MappedMsBVTable) or restored.source != mapped.source:
+            failures.append("a mapped table did not pickle as its path")
+        elif len(pickle.dumps(mapped)) > 1024:
+            failures.append("a mapped table pickled its contents instead of its path")
+
+        # Replacing the snapshot never disturbs an open mapping, and the next
+        # load sees the new table even at the same size and mtime.
+        stat = os.stat(path)
+        write_snapshot(MsBVTable.from_policy_dictionary(second), path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        failures += check_table("mapping open across a replace", mapped, first)
+        if os.stat(path).st_size != stat.st_size:
+            failures.append("the replacement snapshot changed size")
+        reloaded = load_policy_table(path)
+        if reloaded is mapped:
+            failures.append("a replaced snapshot of the same size and mtime was served from the cache")
+        else:
+            failures += check_table("replaced snapshot", reloaded, second)
+        gate = FDOGate(policy_file=path)
+        failures += check_table("gate over a snapshot", gate.msbv_table, second)
+
+        with open(path, "rb") as f:
+            data = bytearray(f.read())
+        bad = os.path.join(tmp, "bad.msbv")
+        for label, blob in (
+            ("corrupted body", data[:-1] + bytes([data[-1] ^ 0x01])),
+            ("truncated body", data[:-3]),
+            ("truncated header", data[:10]),
+            ("bad magic", b"XXXX" + data[4:]),
+            ("unknown version", data[:4] + b"\xff\x00" + data[6:]),
+        ):
+            with open(bad, "wb") as f:
+                f.write(blob)
+            if not _rejected(bad):
+                failures.append(f"a snapshot with a {label} was mapped")
+        with open(bad, "wb") as f:
+            f.write(data[:-1] + bytes([data[-1] ^ 0x01]))
+        if _rejected(bad, verify=False):
+            failures.append("verify=False still checked the CRC")
+        try:
+            write_snapshot({1: 0x100}, os.path.join(tmp, "wide.msbv"))
+            failures.append("a sensitivity level above 8 bits was written")
+        except ValueError:
+            pass
+
+        failures += check_sharded_switch(path)
+    return failures
+
+
+def check_sharded_switch(path):
+    from gate_shard import ShardedGate
+
+    clock = SimulatedClock(5_000)
+    gate = FDOGate(clock=clock)
+    mapped = MappedMsBVTable(path)
+    ids = random.Random(5).sample(sorted(mapped), 300) + [0xFFFF_FFF0 + i for i in range(8)]
+    packets = [gate.create_packet(0xFD01, i, pid) for i, pid in enumerate(ids)]
+    gate.atomic_epoch_switch(mapped)
+    expected = gate.validate_batch(packets)
+    with ShardedGate(workers=2, shard_key="policy", clock=clock) as sharded:
+        sharded.atomic_epoch_switch(mapped)
+        if sharded.validate_batch(packets) != expected:
+            return ["ShardedGate switched onto a snapshot disagrees with the single gate"]
+    return []
+
+
+PYTEST_POLICIES = 2000
+
+
+def test_dictionaries():
+    assert check_dictionaries(PYTEST_POLICIES) == []
+
+
+def test_loading():
+    assert check_loading(PYTEST_POLICIES) == []
+
+
+def test_immutable():
+    assert check_immutable(PYTEST_POLICIES) == []
+
+
+def test_snapshots():
+    assert check_snapshots(PYTEST_POLICIES) == []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PE-MsBV policy table check")
+    parser.add_argument("--policies", type=int, default=20000, help="size of the synthetic dictionary")
+    args = parser.parse_args(argv)
+
+    failures = check_dictionaries(args.policies) + check_loading(args.policies) + check_immutable(args.policies)
+    failures += check_snapshots(args.policies)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("policy table ok")
+
+
+if __name__ == "__main__":
+    main()
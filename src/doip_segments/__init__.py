@@ -0,0 +1,87 @@
+"""
+Generated DOIP segment models (see Readme.md), loaded lazily.
+
+Importing this package imports no model module and builds no pydantic
+schema. A segment model is imported the first time it is touched, either
+as a package attribute (`doip_segments.RetrieveRequest`, `from
+doip_segments import SearchRequest`) or through `registry`, which dispatches
+segments by operationId using the tables below. A process that only
+handles Retrieve and Search never pays for the other operations' schemas.
+"""
+
+import importlib
+
+# operationId -> (module, class) candidates, tried in order when there are
+# several (the extended Retrieve schema accepts a superset of the core one).
+REQUEST_MODELS = {
+    "0.DOIP/Op.Hello": (("Hello_request", "HelloRequest"),),
+    "0.DOIP/Op.Create": (("Create_request", "CreateRequest"),),
+    "0.DOIP/Op.Retrieve": (
+        ("Retrieve_request", "RetrieveRequest"),
+        ("extended_Retrieve_request", "ExtendedRetrieveRequest"),
+    ),
+    "0.DOIP/Op.Update": (("Update_request", "UpdateRequest"),),
+    "0.DOIP/Op.Delete": (("Delete_request", "DeleteRequest"),),
+    "0.DOIP/Op.Search": (("Search_request", "SearchRequest"),),
+    "0.DOIP/Op.ListOperations": (("ListOperations_request", "ListOperationsRequest"),),
+    "0.DOIP/Op.Extended-Create": (("extended_Create_request", "ExtendedCreateRequest"),),
+    "0.DOIP/Op.Extended-Update": (("extended_Update_request", "ExtendedUpdateRequest"),),
+    "0.DOIP/Op.Extended-QueryFreeText": (("extended_QueryFreeText_request", "ExtendedQueryFreeTextRequest"),),
+    "0.DOIP/Op.Nanopub2Handle": (("extended_Nanopub2Handle_request", "ExtendedNanopub2HandleRequest"),),
+    "0.DOIP/Op.Tombstone": (("extended_Tombstone_request", "ExtendedTombstoneRequest"),),
+    "0.DOIP/Op.Validate": (("extended_Validate_request", "ExtendedValidateRequest"),),
+    "Op.QueryFeed": (("extended_QueryFeed_request", "ExtendedQueryFeedRequest"),),
+    "Op.QueryRef": (("extended_QueryRef_request", "ExtendedQueryRefRequest"),),
+}
+
+# operationId -> success (0.DOIP/Status.001) response candidates.
+RESPONSE_MODELS = {
+    "0.DOIP/Op.Hello": (("Hello_response", "HelloResponse"),),
+    "0.DOIP/Op.Create": (("Create_response", "CreateResponse"),),
+    "0.DOIP/Op.Retrieve": (
+        ("Retrieve_response", "RetrieveResponse"),
+        ("extended_Retrieve_response", "ExtendedRetrieveResponse"),
+    ),
+    "0.DOIP/Op.Update": (("Update_response", "UpdateResponse"),),
+    "0.DOIP/Op.Delete": (("Delete_response", "DeleteResponse"),),
+    "0.DOIP/Op.Search": (("Search_response", "SearchResponse"),),
+    "0.DOIP/Op.ListOperations": (("ListOperations_response", "ListOperationsResponse"),),
+    "0.DOIP/Op.Extended-Create": (("extended_Create_response", "ExtendedCreateResponse"),),
+    "0.DOIP/Op.Extended-Update": (("extended_Update_response", "ExtendedUpdateResponse"),),
+    "0.DOIP/Op.Extended-QueryFreeText": (("extended_QueryFreeText_response", "ExtendedQueryFreeTextResponse"),),
+    "0.DOIP/Op.Nanopub2Handle": (("extended_Nanopub2Handle_response", "ExtendedNanopub2HandleResponse"),),
+    "0.DOIP/Op.Tombstone": (("extended_Tombstone_response", "ExtendedTombstoneResponse"),),
+    "0.DOIP/Op.Validate": (("extended_Validate_response", "ExtendedValidateResponse"),),
+}
+
+# Every non-success status, whatever the operation.
+ERROR_MODEL = ("ERROR_response", "ERRORResponse")
+
+# Top-level segment model name -> defining module, for the lazy loader.
+MODEL_MODULES = {
+    name: module
+    for table in (REQUEST_MODELS, RESPONSE_MODELS)
+    for candidates in table.values()
+    for module, name in candidates
+}
+MODEL_MODULES[ERROR_MODEL[1]] = ERROR_MODEL[0]
+
+_SUBMODULES = frozenset(MODEL_MODULES.values()) | {"codec", "registry", "repository"}
+
+__all__ = sorted(MODEL_MODULES)
+
+
+def __getattr__(name):
+    module = MODEL_MODULES.get(name)
+    if module is not None:
+        value = getattr(importlib.import_module(f".{module}", __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value  # later lookups bypass __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(MODEL_MODULES) | _SUBMODULES)
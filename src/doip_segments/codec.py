@@ -0,0 +1,385 @@
+"""
+Streaming codec for multi-segment DOIP messages.
+
+A DOIP message is a sequence of segments. Each segment ends with a line
+holding only `#`, and an empty segment (a second `#` line) ends the message.
+A JSON segment is UTF-8 JSON text. A bytes segment starts with an `@` line
+and carries its data as chunks of `<decimal size>\\n<size bytes>\\n`:
+
+    {"operationId": "0.DOIP/Op.Create", "targetId": "21.T/svc", "input": {...}}
+    #
+    {"id": "file"}
+    #
+    @
+    1048576
+    <1 MiB of data>
+    ...
+    #
+    #
+
+A multi-segment DO serialization (Create/Update input, Retrieve output with
+`includeElementData`) puts the request or response JSON first, then one
+`{"id": ...}` JSON segment plus one bytes segment per element that carries
+data. The framing follows the DOIP v2.0 transport; the spec folder only
+defines the JSON schemas.
+
+Element data is never materialized. MessageReader yields a bytes segment as
+`memoryview` slices of one reusable buffer (each slice is valid until the
+next one is requested). With `file_spans=True` over a seekable file, it
+yields FileSpan (fd, offset, length) records instead and reads no data at all.
+MessageWriter sends file-backed data with os.sendfile where the output has a
+file descriptor, and with a bounded buffer otherwise. Either way a gigabyte
+element costs one chunk of memory.
+
+    from doip_segments.codec import read_do_message, write_do_message
+    from doip_segments.registry import validate_request
+
+    write_do_message(sock_file, create_request, {"file": open(path, "rb")})
+
+    message = read_do_message(sock_file, validate=validate_request)
+    for element in message.elements():
+        for chunk in element.chunks:      # memoryview, valid until the next chunk
+            out.write(chunk)
+"""
+
+import os
+from typing import NamedTuple
+
+try:
+    import fast_json
+except ImportError:  # imported as src.doip_segments
+    from .. import fast_json
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+MAX_JSON_SEGMENT = 64 << 20
+
+_SIZE_LINE_LIMIT = 32
+_TERMINATORS = (b"#\n", b"#\r\n")
+_BYTES_MARKERS = (b"@\n", b"@\r\n")
+
+
+class SegmentError(ValueError):
+    """The input is not a well-formed DOIP message (or breaks a declared element length)."""
+
+
+class FileSpan(NamedTuple):
+    """`length` bytes at `offset` in the open file `fileno`, not yet read."""
+
+    fileno: int
+    offset: int
+    length: int
+
+    def read(self):
+        """The span's bytes. Only for spans known to be small."""
+        return os.pread(self.fileno, self.length, self.offset)
+
+    def copy_to(self, out, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Write the span to `out`, via os.sendfile when `out` has a file descriptor."""
+        out_fd = _fileno(out)
+        if out_fd is not None:
+            out.flush()
+            if _sendfile(out_fd, self.fileno, self.offset, self.length):
+                return
+        buffer = bytearray(min(chunk_size, self.length) or 1)
+        view = memoryview(buffer)
+        offset, end = self.offset, self.offset + self.length
+        while offset < end:
+            n = os.preadv(self.fileno, [view[:min(len(view), end - offset)]], offset)
+            if not n:
+                raise SegmentError(f"file ended {end - offset} bytes before the span did")
+            out.write(view[:n])
+            offset += n
+
+
+class BytesSegment:
+    """
+    One bytes segment, iterated once as chunks: memoryviews, or FileSpans in
+    file_spans mode. `size` counts the bytes seen so far. Leaving a segment
+    unread is fine; the reader skips what is left when it moves on.
+    """
+
+    def __init__(self, reader, expected_size=None):
+        self.size = 0
+        self.expected_size = expected_size
+        self.done = False
+        self._chunks = reader._read_chunks(self)
+
+    def __iter__(self):
+        return self._chunks
+
+    def drain(self):
+        """Skip the rest of the segment (seeks over it where the stream allows)."""
+        for _ in self._chunks:
+            pass
+
+
+class ElementData(NamedTuple):
+    """Data of one DO element: its id and its bytes segment."""
+
+    id: str
+    chunks: BytesSegment
+
+
+class MessageReader:
+    """
+    Iterate the segments of one DOIP message read from binary `stream`:
+    a parsed JSON value per JSON segment, a BytesSegment per bytes segment.
+    Iteration stops at the end-of-message marker (or a clean EOF), so the
+    next message on the same stream takes a new reader.
+    """
+
+    def __init__(self, stream, chunk_size=DEFAULT_CHUNK_SIZE, max_json_size=MAX_JSON_SEGMENT, file_spans=False):
+        self.stream = stream
+        self.max_json_size = max_json_size
+        self._buffer = memoryview(bytearray(chunk_size))
+        self._fileno = _fileno(stream) if file_spans and stream.seekable() else None
+        self._pending = None
+        self._expected_size = None
+        self._segments = self._read_segments()
+
+    def __iter__(self):
+        return self._segments
+
+    def next_segment(self, expected_size=None):
+        """The next segment, or None at the end of the message."""
+        self._expected_size = expected_size
+        return next(self._segments, None)
+
+    def _read_segments(self):
+        stream = self.stream
+        while True:
+            if self._pending is not None:
+                self._pending.drain()
+                self._pending = None
+            line = stream.readline(self.max_json_size + 1)
+            if not line or line in _TERMINATORS:
+                return
+            if line in _BYTES_MARKERS:
+                segment = self._pending = BytesSegment(self, self._expected_size)
+                self._expected_size = None
+                yield segment
+                continue
+            parts = [line]
+            size = len(line)
+            while True:
+                if size > self.max_json_size:
+                    raise SegmentError(f"JSON segment larger than {self.max_json_size} bytes")
+                line = stream.readline(self.max_json_size + 1 - size)
+                if not line:
+                    raise SegmentError("message ended inside a JSON segment")
+                if line in _TERMINATORS:
+                    break
+                parts.append(line)
+                size += len(line)
+            yield fast_json.loads(b"".join(parts))
+
+    def _read_chunks(self, segment):
+        stream = self.stream
+        buffer = self._buffer
+        while True:
+            line = stream.readline(_SIZE_LINE_LIMIT)
+            if line in _TERMINATORS:
+                break
+            try:
+                remaining = int(line)
+            except ValueError:
+                raise SegmentError(f"expected a chunk size or '#', got {line[:_SIZE_LINE_LIMIT]!r}") from None
+            if remaining < 0:
+                raise SegmentError(f"negative chunk size {remaining}")
+            if self._fileno is not None:
+                offset = stream.tell()
+                if offset + remaining > os.fstat(self._fileno).st_size:
+                    raise SegmentError("message ended inside a bytes segment")
+                stream.seek(remaining, os.SEEK_CUR)
+                segment.size += remaining
+                if remaining:
+                    yield FileSpan(self._fileno, offset, remaining)
+            else:
+                while remaining:
+                    n = stream.readinto(buffer[:min(len(buffer), remaining)])
+                    if not n:
+                        raise SegmentError("message ended inside a bytes segment")
+                    remaining -= n
+                    segment.size += n
+                    yield buffer[:n]
+            if stream.read(1) != b"\n":
+                raise SegmentError("chunk not followed by a newline")
+        segment.done = True
+        if segment.expected_size is not None and segment.size != segment.expected_size:
+            raise SegmentError(f"bytes segment has {segment.size} bytes, its element declares {segment.expected_size}")
+
+
+class MessageWriter:
+    """Write one DOIP message to binary `stream`, segment by segment."""
+
+    def __init__(self, stream, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+
+    def write_json(self, value):
+        """A JSON segment from a pydantic model, a JSON-able value, or raw JSON bytes."""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            data = bytes(value)
+        elif hasattr(value, "__pydantic_serializer__"):
+            data = value.__pydantic_serializer__.to_json(value, exclude_none=True)
+        else:
+            data = fast_json.dumps(value)
+        self.stream.write(data + b"\n#\n")
+
+    def write_bytes(self, source):
+        """
+        A bytes segment from bytes-like data, a FileSpan, a binary file (sent
+        from its current position to EOF) or an iterable of bytes-like chunks.
+        Returns the number of data bytes written.
+        """
+        write = self.stream.write
+        write(b"@\n")
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            size = self._write_chunk(source)
+        elif isinstance(source, FileSpan):
+            size = self._write_span(source)
+        elif hasattr(source, "readinto"):
+            size = self._write_file(source)
+        else:
+            size = sum(self._write_chunk(chunk) for chunk in source)
+        write(b"#\n")
+        return size
+
+    def close(self):
+        """End the message and flush the stream."""
+        self.stream.write(b"#\n")
+        self.stream.flush()
+
+    def _write_chunk(self, chunk):
+        size = len(chunk) if not isinstance(chunk, memoryview) else chunk.nbytes
+        if size:
+            self.stream.write(b"%d\n" % size)
+            self.stream.write(chunk)
+            self.stream.write(b"\n")
+        return size
+
+    def _write_span(self, span):
+        if span.length:
+            self.stream.write(b"%d\n" % span.length)
+            span.copy_to(self.stream, self.chunk_size)
+            self.stream.write(b"\n")
+        return span.length
+
+    def _write_file(self, source):
+        fileno = _fileno(source)
+        if fileno is not None and source.seekable():
+            offset = source.tell()
+            span = FileSpan(fileno, offset, os.fstat(fileno).st_size - offset)
+            size = self._write_span(span)
+            source.seek(offset + size)
+            return size
+        view = memoryview(bytearray(self.chunk_size))
+        size = 0
+        while True:
+            n = source.readinto(view)
+            if not n:
+                return size
+            size += self._write_chunk(view[:n])
+
+
+class DoMessage:
+    """
+    A multi-segment DO message as read: `header` is the validated first
+    segment, `elements()` streams the element data in wire order.
+    """
+
+    def __init__(self, reader, header, declared_lengths):
+        self.header = header
+        self._reader = reader
+        self._declared = declared_lengths
+
+    def elements(self):
+        """Yield ElementData per element; each must be read (or dropped) before the next."""
+        reader = self._reader
+        while True:
+            segment = reader.next_segment()
+            if segment is None:
+                return
+            if not isinstance(segment, dict) or not isinstance(segment.get("id"), str):
+                raise SegmentError('expected an element {"id": ...} segment before element data')
+            element_id = segment["id"]
+            data = reader.next_segment(self._declared.get(element_id))
+            if not isinstance(data, BytesSegment):
+                raise SegmentError(f"element {element_id!r} has no bytes segment")
+            yield ElementData(element_id, data)
+
+
+def read_do_message(stream, validate=None, **options):
+    """
+    Read a multi-segment DO message from `stream` up to its element data.
+    `validate` turns the first segment into a model: a callable such as
+    registry.validate_request (the default when the segment has an
+    operationId) or a pydantic model class such as DoipDoSerialization.
+    Other keyword arguments go to MessageReader. Returns None when the
+    stream ends before another message starts.
+    """
+    reader = MessageReader(stream, **options)
+    first = reader.next_segment()
+    if first is None:
+        return None
+    if not isinstance(first, dict):
+        raise SegmentError("a DO message starts with a JSON object segment")
+    if validate is None and "operationId" in first:
+        from .registry import validate_request as validate
+    if hasattr(validate, "model_validate"):
+        header = validate.model_validate(first)
+    else:
+        header = validate(first) if validate is not None else first
+    return DoMessage(reader, header, _declared_lengths(first))
+
+
+def write_do_message(stream, header, elements=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write `header` (request/response model or dict) followed by each
+    element's data; `elements` maps element ids to write_bytes sources (or is
+    an iterable of (id, source) pairs). Returns the data bytes written.
+    """
+    writer = MessageWriter(stream, chunk_size)
+    writer.write_json(header)
+    items = elements.items() if hasattr(elements, "items") else elements
+    size = 0
+    for element_id, source in items:
+        writer.write_json({"id": element_id})
+        size += writer.write_bytes(source)
+    writer.close()
+    return size
+
+
+def _declared_lengths(segment):
+    """{element id: int length} from a DO serialization in the segment (bare, input or output)."""
+    lengths = {}
+    for do in (segment, segment.get("input"), segment.get("output")):
+        if not isinstance(do, dict) or not isinstance(do.get("elements"), list):
+            continue
+        for element in do["elements"]:
+            if isinstance(element, dict) and str(element.get("length", "")).isdigit():
+                lengths[element.get("id")] = int(element["length"])
+    return lengths
+
+
+def _fileno(stream):
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _sendfile(out_fd, in_fd, offset, count):
+    """Copy via os.sendfile; False (nothing written) when the fds do not support it."""
+    sent = 0
+    while sent < count:
+        try:
+            n = os.sendfile(out_fd, in_fd, offset + sent, count - sent)
+        except OSError:
+            if sent:
+                raise
+            return False
+        if not n:
+            raise SegmentError(f"file ended {count - sent} bytes before the span did")
+        sent += n
+    return True
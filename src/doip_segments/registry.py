@@ -0,0 +1,218 @@
+"""
+DOIP segment registry — one dispatch table over the generated models.
+
+A request segment is routed by its `operationId`, a response segment by the
+operation it answers plus its `status`: one dict lookup picks the model (or
+the ordered candidates, where two schemas share an operationId), and the
+segment is validated by a TypeAdapter built once per operation and cached.
+Mixed request streams therefore never fall back to trial-and-error matching
+across the 30+ models.
+
+The dispatch tables live in the package __init__ (shared with its lazy
+attribute loader); models are imported and compiled on first use of their
+operation. Unions whose members can be told apart by a required key the
+other members lack (the Authentication/Authentication1/Authentication2
+choice repeated in every request schema) are rebuilt as
+callable-discriminated unions, so only the matching member is validated
+and only its errors are reported. Unions of all-optional members keep
+pydantic's smart mode, which is the only correct choice for them. The
+rebuilt models subclass the generated ones.
+
+    from doip_segments.registry import validate_request, validate_response
+
+    request = validate_request(b'{"operationId": "0.DOIP/Op.Retrieve", "targetId": "21.T/x"}')
+    response = validate_response(raw_reply, request.operationId)
+
+Raw segments are parsed with the fast_json backend (orjson where installed)
+and then validated as Python data. For these schemas, that is faster than
+pydantic's validate_json on the same bytes, because their free-form
+`attributes` objects make validate_json the slower path. dump_segment()
+writes models back through their pydantic serializer, straight to bytes.
+"""
+
+import importlib
+import threading
+import types
+import typing
+from typing import Annotated, Optional, Union
+
+from pydantic import BaseModel, Discriminator, Field, Tag, TypeAdapter, create_model
+
+from . import ERROR_MODEL, REQUEST_MODELS, RESPONSE_MODELS
+
+try:
+    import fast_json
+except ImportError:  # imported as src.doip_segments
+    from .. import fast_json
+
+SUCCESS_STATUS = "0.DOIP/Status.001"
+
+_adapters = {}
+_models = {}
+_lock = threading.Lock()
+
+
+class UnknownSegmentError(ValueError):
+    """The segment names no operation (or status) this registry has a model for."""
+
+
+def load_model(module, name):
+    """Generated model class `name` from sibling `module`, with discriminated unions where possible."""
+    key = (module, name)
+    model = _models.get(key)
+    if model is None:
+        generated = getattr(importlib.import_module(f".{module}", __package__), name)
+        model = _models[key] = _discriminate(generated)
+    return model
+
+
+def request_adapter(operation_id):
+    """Cached TypeAdapter for request segments of `operation_id`."""
+    adapter = _adapters.get(("request", operation_id))
+    if adapter is None:
+        candidates = REQUEST_MODELS.get(operation_id)
+        if candidates is None:
+            raise UnknownSegmentError(f"no request model for operationId {operation_id!r}")
+        adapter = _build_adapter(("request", operation_id), candidates)
+    return adapter
+
+
+def response_adapter(operation_id, status=SUCCESS_STATUS):
+    """Cached TypeAdapter for responses to `operation_id` carrying `status`."""
+    if status != SUCCESS_STATUS:
+        key = ("error",)
+        candidates = (ERROR_MODEL,)
+    else:
+        key = ("response", operation_id)
+        candidates = RESPONSE_MODELS.get(operation_id)
+        if candidates is None:
+            raise UnknownSegmentError(f"no response model for operationId {operation_id!r}")
+    adapter = _adapters.get(key)
+    if adapter is None:
+        adapter = _build_adapter(key, candidates)
+    return adapter
+
+
+def validate_request(segment):
+    """Validate one request segment (dict, or JSON str/bytes) into its operation's model."""
+    if not isinstance(segment, dict):
+        segment = _parse(segment)
+    return request_adapter(segment.get("operationId")).validate_python(segment)
+
+
+def validate_response(segment, operation_id):
+    """Validate one response segment to a request of `operation_id` (errors by status)."""
+    if not isinstance(segment, dict):
+        segment = _parse(segment)
+    return response_adapter(operation_id, segment.get("status")).validate_python(segment)
+
+
+def validate_requests(segments):
+    """Validate a mixed stream of request segments, yielding one model each."""
+    adapters = {}
+    for segment in segments:
+        if not isinstance(segment, dict):
+            segment = _parse(segment)
+        operation_id = segment.get("operationId")
+        adapter = adapters.get(operation_id)
+        if adapter is None:
+            adapter = adapters[operation_id] = request_adapter(operation_id)
+        yield adapter.validate_python(segment)
+
+
+def dump_segment(segment):
+    """Compact JSON bytes for a validated segment model (None fields omitted) or a plain dict."""
+    serializer = getattr(segment, "__pydantic_serializer__", None)
+    if serializer is not None:
+        return serializer.to_json(segment, exclude_none=True)
+    return fast_json.dumps(segment)
+
+
+def _parse(segment):
+    value = fast_json.loads(segment)
+    if not isinstance(value, dict):
+        raise UnknownSegmentError(f"a DOIP segment is a JSON object, got {type(value).__name__}")
+    return value
+
+
+def _build_adapter(key, candidates):
+    with _lock:
+        adapter = _adapters.get(key)
+        if adapter is None:
+            models = tuple(load_model(module, name) for module, name in candidates)
+            if len(models) == 1:
+                adapter = TypeAdapter(models[0])
+            else:
+                # Ordered fallback in one validator: the first schema that accepts wins.
+                adapter = TypeAdapter(Annotated[Union[models], Field(union_mode="left_to_right")])
+            _adapters[key] = adapter
+    return adapter
+
+
+def _union_members(annotation):
+    """Member types of Union[...] / Optional[Union[...]], or () for anything else."""
+    if typing.get_origin(annotation) not in (Union, types.UnionType):
+        return ()
+    return tuple(arg for arg in typing.get_args(annotation) if arg is not type(None))
+
+
+def _distinguishing_keys(members):
+    """
+    {member: key} when every member is a BaseModel forbidding extra keys and
+    has a required field no other member declares (so the key's presence
+    rules every other member out); None otherwise.
+    """
+    if len(members) < 2 or not all(isinstance(m, type) and issubclass(m, BaseModel) for m in members):
+        return None
+    keys = {}
+    for member in members:
+        if member.model_config.get("extra") != "forbid":
+            return None
+        others = set()
+        for other in members:
+            if other is not member:
+                others.update(f.alias or n for n, f in other.model_fields.items())
+        unique = [f.alias or n for n, f in member.model_fields.items()
+                  if f.is_required() and (f.alias or n) not in others]
+        if not unique:
+            return None
+        keys[member] = unique[0]
+    return keys
+
+
+def _key_discriminator(keys):
+    by_key = tuple((key, member.__name__) for member, key in keys.items())
+    by_type = {member: member.__name__ for member in keys}
+
+    def tag(value):
+        if isinstance(value, dict):
+            for key, name in by_key:
+                if key in value:
+                    return name
+            return None
+        return by_type.get(type(value))
+
+    return tag
+
+
+def _discriminate(model):
+    """`model`, or a subclass whose key-distinguishable unions are discriminated."""
+    overrides = {}
+    for name, field in model.model_fields.items():
+        members = _union_members(field.annotation)
+        keys = _distinguishing_keys(members)
+        if keys is None:
+            continue
+        union = Annotated[
+            Union[tuple(Annotated[m, Tag(m.__name__)] for m in members)],
+            Discriminator(
+                _key_discriminator(keys),
+                custom_error_type="union_key_not_found",
+                custom_error_message="expected one of the keys: " + ", ".join(keys.values()),
+            ),
+        ]
+        optional = type(None) in typing.get_args(field.annotation)
+        overrides[name] = (Optional[union] if optional else union, field)
+    if not overrides:
+        return model
+    return create_model(model.__name__, __base__=model, __module__=model.__module__, **overrides)
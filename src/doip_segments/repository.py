@@ -0,0 +1,456 @@
+"""
+In-memory DOIP repository: a reference engine for the seven core operations.
+
+DoipRepository executes 0.DOIP/Op.Hello, Create, Retrieve, Update, Delete,
+Search and ListOperations against a process-local object store, so DOIP
+workloads can be exercised and benchmarked without a live service. Requests
+are validated and responses built through the registry's cached adapters,
+so both sides are the generated segment models. Failures come back as
+ERRORResponse segments with the DOIP status codes (101 invalid request,
+104 unknown object, 105 id conflict, 200 declined, 500 other), never as
+exceptions. Authentication is accepted and not checked.
+
+Storage is copy-on-write. Each object is one immutable record (type,
+attributes, element metadata, element data) indexed by id and by type.
+Create and Update install a new record and never modify a stored one, so a
+reader holding a record sees a consistent version. A record's attributes are
+copied from the request, so a caller reusing its input cannot change a
+stored object. Update shares what it does not replace with the previous
+version: the attributes when the input has none, and the bytes of every
+element it keeps without resending data. Retrieve and Search hand out the
+stored attribute values rather than copies; treat response contents as
+read-only. Writes are serialized by a lock; reads take none, and a Retrieve
+over handle_message sends the element data of the version it answered
+with.
+
+Search queries are whitespace-separated terms that must all match:
+
+- `*` matches every object;
+- `id:VALUE` and `type:VALUE` are answered from the indexes;
+- `NAME:VALUE` compares attribute NAME (a dotted path for nested objects);
+- a bare word matches any top-level string attribute containing it
+  (case-insensitive).
+
+A value ending in `*` matches by prefix. `sortFields` takes `field [ASC|DESC]`
+entries over the same names, and pageNum/pageSize/type follow the Search
+schema.
+
+    from doip_segments.repository import DoipRepository
+
+    repo = DoipRepository("21.T/repo")
+    repo.handle({"operationId": "0.DOIP/Op.Create", "targetId": "21.T/repo",
+                 "input": {"id": "21.T/1", "type": "Document", "attributes": {"title": "a"}}},
+                element_data={"file": b"..."})
+    response = repo.handle(raw_request_bytes)
+    data = repo.element_data("21.T/1", "file")
+"""
+
+import threading
+from typing import Any, NamedTuple, Optional
+
+from .codec import read_do_message, write_do_message
+from .registry import response_adapter, validate_request
+
+OP_HELLO = "0.DOIP/Op.Hello"
+OP_CREATE = "0.DOIP/Op.Create"
+OP_RETRIEVE = "0.DOIP/Op.Retrieve"
+OP_UPDATE = "0.DOIP/Op.Update"
+OP_DELETE = "0.DOIP/Op.Delete"
+OP_SEARCH = "0.DOIP/Op.Search"
+OP_LIST_OPERATIONS = "0.DOIP/Op.ListOperations"
+
+SERVICE_OPERATIONS = [OP_HELLO, OP_CREATE, OP_SEARCH, OP_LIST_OPERATIONS]
+OBJECT_OPERATIONS = [OP_RETRIEVE, OP_UPDATE, OP_DELETE, OP_LIST_OPERATIONS]
+
+STATUS_INVALID = "0.DOIP/Status.101"
+STATUS_UNKNOWN_OBJECT = "0.DOIP/Status.104"
+STATUS_CONFLICT = "0.DOIP/Status.105"
+STATUS_DECLINED = "0.DOIP/Status.200"
+STATUS_OTHER = "0.DOIP/Status.500"
+
+
+class DoipError(Exception):
+    """An operation failure that becomes an ERRORResponse with `status`."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class _Record(NamedTuple):
+    type: str
+    attributes: Optional[dict]
+    elements: tuple  # element metadata dicts, in serialization order
+    data: dict  # element id -> bytes, for elements that carry data
+    signatures: Optional[str]
+
+
+class DoipRepository:
+    """A DOIP service backed by an in-memory, copy-on-write object store."""
+
+    def __init__(self, service_id="20.500.123/repository", ip_address="127.0.0.1",
+                 port=9000, service_name="In-memory DOIP repository", public_key=None):
+        self.service_id = service_id
+        self.service_info = {
+            "id": service_id,
+            "type": "0.TYPE/DOIPServiceInfo",
+            "attributes": {
+                "serviceName": service_name,
+                "ipAddress": ip_address,
+                "port": port,
+                "protocol": "TCP",
+                "protocolVersion": "2.0",
+                "publicKey": public_key if public_key is not None else {},
+            },
+        }
+        self._objects = {}
+        self._by_type = {}
+        self._lock = threading.Lock()
+        self._operations = {
+            OP_HELLO: self._hello,
+            OP_CREATE: self._create,
+            OP_RETRIEVE: self._retrieve,
+            OP_UPDATE: self._update,
+            OP_DELETE: self._delete,
+            OP_SEARCH: self._search,
+            OP_LIST_OPERATIONS: self._list_operations,
+        }
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, object_id):
+        return object_id in self._objects
+
+    def handle(self, request, element_data=None):
+        """
+        Execute one request (a request model, dict, or JSON str/bytes) and
+        return its response model. `element_data` maps element ids to the
+        bytes sent with a Create or Update.
+        """
+        return self._handle(request, element_data)[0]
+
+    def _handle(self, request, element_data):
+        """handle(), also returning the record the operation read or wrote (or None)."""
+        request_id = None
+        operation_id = None
+        try:
+            if isinstance(request, (dict, str, bytes, bytearray, memoryview)):
+                request = validate_request(request)
+            request_id = request.requestId
+            operation_id = request.operationId
+            operation = self._operations.get(operation_id)
+            if operation is None:
+                raise DoipError(STATUS_DECLINED, f"operation {operation_id} is not supported")
+            payload, record = operation(request, element_data or {})
+        except DoipError as exc:
+            return self._error(exc.status, str(exc), request_id), None
+        except ValueError as exc:  # malformed JSON, schema violations, unknown operationId
+            return self._error(STATUS_INVALID, str(exc), request_id), None
+        except Exception as exc:
+            return self._error(STATUS_OTHER, f"{type(exc).__name__}: {exc}", request_id), None
+        payload["status"] = "0.DOIP/Status.001"
+        if request_id is not None:
+            payload["requestId"] = request_id
+        return response_adapter(operation_id).validate_python(payload), record
+
+    def handle_message(self, stream_in, stream_out):
+        """
+        Serve one multi-segment DOIP message from `stream_in` (binary) and
+        write the response to `stream_out`, element data included for
+        Retrieve with includeElementData or a single `element`. Returns the
+        response model, or None at end of stream.
+        """
+        try:
+            message = read_do_message(stream_in, validate=lambda segment: segment)
+            if message is None:
+                return None
+            element_data = {}
+            for element in message.elements():
+                data = bytearray()
+                for chunk in element.chunks:
+                    data += chunk
+                element_data[element.id] = bytes(data)
+        except ValueError as exc:  # SegmentError, or a JSON segment that does not parse
+            response = self._error(STATUS_INVALID, str(exc))
+            write_do_message(stream_out, response)
+            return response
+        response, record = self._handle(message.header, element_data)
+        write_do_message(stream_out, response, self._reply_elements(message.header, response, record))
+        return response
+
+    def element_data(self, object_id, element_id):
+        """The stored bytes of one element (a memoryview, not a copy), or None."""
+        record = self._objects.get(object_id)
+        data = record.data.get(element_id) if record is not None else None
+        return memoryview(data) if data is not None else None
+
+    # -- operations ------------------------------------------------------
+    # Each returns (response payload, the record it read or wrote or None).
+
+    def _hello(self, request, element_data):
+        self._require_service(request.targetId)
+        return {"output": self.service_info}, None
+
+    def _list_operations(self, request, element_data):
+        if request.targetId == self.service_id:
+            return {"output": list(SERVICE_OPERATIONS)}, None
+        return {"output": list(OBJECT_OPERATIONS)}, self._get(request.targetId)
+
+    def _create(self, request, element_data):
+        self._require_service(request.targetId)
+        do = request.input
+        if do is None:
+            raise DoipError(STATUS_INVALID, "Create needs an input object")
+        record = self._build(do, element_data)
+        # The Create schema requires input.id: clients name their objects.
+        object_id = do.id
+        with self._lock:
+            if object_id in self._objects:
+                raise DoipError(STATUS_CONFLICT, f"object {object_id} already exists")
+            self._install(object_id, record, None)
+        return {"output": self._serialize(object_id, record)}, record
+
+    def _retrieve(self, request, element_data):
+        record = self._get(request.targetId)
+        element_id = getattr(request.attributes, "element", None)
+        if element_id is not None:
+            if element_id not in record.data:
+                raise DoipError(STATUS_UNKNOWN_OBJECT, f"{request.targetId} has no data for element {element_id}")
+            return {}, record
+        return {"output": self._serialize(request.targetId, record)}, record
+
+    def _update(self, request, element_data):
+        do = request.input
+        if do is None:
+            raise DoipError(STATUS_INVALID, "Update needs an input object")
+        if do.id != request.targetId:
+            raise DoipError(STATUS_INVALID, f"input id {do.id} does not match targetId {request.targetId}")
+        with self._lock:
+            previous = self._get(request.targetId)
+            record = self._build(do, element_data, previous)
+            self._install(request.targetId, record, previous)
+        return {"output": self._serialize(request.targetId, record)}, record
+
+    def _delete(self, request, element_data):
+        with self._lock:
+            record = self._get(request.targetId)
+            del self._objects[request.targetId]
+            ids = self._by_type[record.type]
+            del ids[request.targetId]
+            if not ids:
+                del self._by_type[record.type]
+        return {}, record
+
+    def _search(self, request, element_data):
+        self._require_service(request.targetId)
+        attributes = request.attributes
+        ids = self._query(attributes.query)
+        if attributes.sortFields:
+            ids = self._sort(ids, attributes.sortFields)
+        size = len(ids)
+        page_size = attributes.pageSize
+        if page_size is not None and page_size >= 0:
+            start = (attributes.pageNum or 0) * page_size
+            ids = ids[start:start + page_size]
+        if attributes.type == "id":
+            results = ids
+        else:
+            objects = self._objects
+            results = [self._serialize(object_id, objects[object_id]) for object_id in ids if object_id in objects]
+        return {"size": size, "results": results}, None
+
+    # -- storage ---------------------------------------------------------
+
+    def _require_service(self, target_id):
+        if target_id != self.service_id:
+            raise DoipError(STATUS_INVALID, f"this operation targets the service {self.service_id}, not {target_id}")
+
+    def _get(self, object_id):
+        record = self._objects.get(object_id)
+        if record is None:
+            raise DoipError(STATUS_UNKNOWN_OBJECT, f"object {object_id} not found")
+        return record
+
+    def _build(self, do, element_data, previous=None):
+        """A new record for serialization `do`, sharing what it does not replace with `previous`."""
+        elements = []
+        data = {}
+        for element in do.elements or ():
+            metadata = element.model_dump(exclude_none=True)
+            element_id = metadata.get("id")
+            if element_id is None:
+                raise DoipError(STATUS_INVALID, "every element needs an id")
+            payload = element_data.get(element_id)
+            if payload is None and previous is not None:
+                payload = previous.data.get(element_id)
+            if payload is not None:
+                payload = bytes(payload)  # no-op for bytes: stored data is shared, never copied
+                declared = metadata.get("length")
+                if declared is not None and declared != str(len(payload)):
+                    raise DoipError(STATUS_INVALID, f"element {element_id} declares length {declared},"
+                                                    f" got {len(payload)} bytes")
+                metadata["length"] = str(len(payload))
+                data[element_id] = payload
+            elements.append(metadata)
+        unknown = set(element_data) - {e["id"] for e in elements}
+        if unknown:
+            raise DoipError(STATUS_INVALID, f"data sent for undeclared elements: {', '.join(sorted(unknown))}")
+        attributes = _copy_tree(do.attributes)
+        if attributes is None and previous is not None:
+            attributes = previous.attributes
+        return _Record(do.type, attributes, tuple(elements), data, do.signatures)
+
+    def _install(self, object_id, record, previous):
+        """Publish `record` under `object_id` (caller holds the lock)."""
+        if previous is not None and previous.type != record.type:
+            ids = self._by_type[previous.type]
+            del ids[object_id]
+            if not ids:
+                del self._by_type[previous.type]
+        self._objects[object_id] = record
+        self._by_type.setdefault(record.type, {})[object_id] = None
+
+    @staticmethod
+    def _serialize(object_id, record):
+        """Default serialization of a record (element data omitted)."""
+        do = {"id": object_id, "type": record.type}
+        if record.attributes is not None:
+            do["attributes"] = record.attributes
+        if record.elements:
+            do["elements"] = list(record.elements)
+        if record.signatures is not None:
+            do["signatures"] = record.signatures
+        return do
+
+    # -- search ----------------------------------------------------------
+
+    def _query(self, query):
+        """Ids matching every term of `query`, in insertion order."""
+        objects = self._objects
+        candidates = None
+        filters = []
+        for term in query.split():
+            if term == "*":
+                continue
+            field, _, value = term.partition(":")
+            if not value:
+                filters.append(_word_filter(term))
+            elif field == "id" and not value.endswith("*"):
+                candidates = _narrow(candidates, [value] if value in objects else [])
+            elif field == "type" and not value.endswith("*"):
+                candidates = _narrow(candidates, list(self._by_type.get(value, ())))
+            else:
+                filters.append(_field_filter(field, value))
+        ids = list(objects) if candidates is None else candidates
+        if not filters:
+            return ids
+        matched = []
+        for object_id in ids:
+            record = objects.get(object_id)
+            if record is not None and all(match(object_id, record) for match in filters):
+                matched.append(object_id)
+        return matched
+
+    def _sort(self, ids, sort_fields):
+        objects = self._objects
+        for spec in reversed(sort_fields.split(",")):
+            parts = spec.split()
+            if not parts:
+                continue
+            field = parts[0]
+            descending = len(parts) > 1 and parts[1].upper() == "DESC"
+            ids = sorted(ids, key=lambda i: _sort_key(_field_value(i, objects[i], field)), reverse=descending)
+        return ids
+
+    @staticmethod
+    def _error(status, message, request_id=None):
+        payload = {"status": status, "output": {"message": message}}
+        if request_id is not None:
+            payload["requestId"] = request_id
+        return response_adapter(None, status).validate_python(payload)
+
+    @staticmethod
+    def _reply_elements(request, response, record):
+        """Element data of `record` to send after `response` to a Retrieve `request`, as {id: memoryview}."""
+        if request.get("operationId") != OP_RETRIEVE or response.status != "0.DOIP/Status.001":
+            return {}
+        attributes = request.get("attributes") or {}
+        element_id = attributes.get("element")
+        if element_id is not None:
+            return {element_id: memoryview(record.data[element_id])}
+        if attributes.get("includeElementData") is True:
+            return {element_id: memoryview(data) for element_id, data in record.data.items()}
+        return {}
+
+
+def _copy_tree(value):
+    """Copy the dicts and lists of a JSON value; strings, numbers and None are immutable."""
+    if isinstance(value, dict):
+        return {key: _copy_tree(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_tree(item) for item in value]
+    return value
+
+
+def _narrow(candidates, ids):
+    if candidates is None:
+        return ids
+    keep = set(ids)
+    return [object_id for object_id in candidates if object_id in keep]
+
+
+def _field_value(object_id, record, field):
+    if field == "id":
+        return object_id
+    if field == "type":
+        return record.type
+    value: Any = record.attributes
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _field_filter(field, value):
+    if value.endswith("*"):
+        prefix = value[:-1]
+
+        def match(object_id, record):
+            actual = _field_value(object_id, record, field)
+            return actual is not None and str(actual).startswith(prefix)
+
+        return match
+    return lambda object_id, record: _matches(_field_value(object_id, record, field), value)
+
+
+def _matches(actual, expected):
+    if actual is None:
+        return False
+    if isinstance(actual, bool):
+        return str(actual).lower() == expected.lower()
+    if isinstance(actual, list):
+        return any(_matches(item, expected) for item in actual)
+    return str(actual) == expected
+
+
+def _word_filter(word):
+    word = word.lower()
+
+    def match(object_id, record):
+        attributes = record.attributes or {}
+        return any(isinstance(v, str) and word in v.lower() for v in attributes.values())
+
+    return match
+
+
+def _sort_key(value):
+    """Orders numbers before strings before anything else; missing values last."""
+    if value is None:
+        return (3, 0)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    return (2, str(value))
@@ -0,0 +1,109 @@
+"""
+A-FDO Gate — pluggable JSON backend.
+
+One pair of functions for every JSON hot path (MCP framing, DOIP segment
+parsing and dumping): `dumps(obj) -> bytes` writes compact UTF-8 JSON and
+`loads(data)` accepts bytes, bytearray, memoryview or str. The backend is
+picked once at import:
+
+- orjson, when installed (the fastest encoder and decoder here);
+- msgspec, when installed and orjson is not;
+- the stdlib json module otherwise.
+
+FDO_JSON_BACKEND=orjson|msgspec|json forces one. Strings, ints, bools,
+None, lists and dicts encode to the same bytes on every backend (compact
+separators, non-ASCII kept as UTF-8), and all raise ValueError on malformed
+input. The backends differ at the edges:
+
+- floats round-trip to the same values but are not always spelled alike
+  (orjson writes 1e300 and 1e-7 where json writes 1e+300 and 1e-07);
+- NaN and +/-Infinity are written as null by orjson and msgspec, and as the
+  non-standard NaN / Infinity by json, the only backend that reads those;
+- orjson reads integers past 64 bits as floats, and rejects lone surrogate
+  escapes.
+
+Values a fast encoder refuses (ints past 64 bits, non-str dict keys) fall
+back to the stdlib encoder rather than failing. get_backend(name) returns a specific backend, which is
+what scripts/json_benchmark.py compares.
+"""
+
+import json
+import os
+from typing import Callable, NamedTuple
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+
+class Backend(NamedTuple):
+    name: str
+    dumps: Callable
+    loads: Callable
+
+
+def _json_dumps(obj, _encode=json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode):
+    return _encode(obj).encode()
+
+
+def _json_loads(data):
+    if isinstance(data, (bytearray, memoryview)):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def _orjson():
+    import orjson
+
+    def dumps(obj, _dumps=orjson.dumps):
+        try:
+            return _dumps(obj)
+        except TypeError:
+            return _json_dumps(obj)
+
+    return Backend("orjson", dumps, orjson.loads)
+
+
+def _msgspec():
+    import msgspec
+
+    encode = msgspec.json.Encoder().encode
+    decode = msgspec.json.Decoder().decode
+
+    def dumps(obj):
+        try:
+            return encode(obj)
+        except (TypeError, OverflowError):
+            return _json_dumps(obj)
+
+    def loads(data):
+        try:
+            return decode(data)
+        except msgspec.DecodeError as exc:
+            raise ValueError(str(exc)) from exc
+
+    return Backend("msgspec", dumps, loads)
+
+
+_FACTORIES = {
+    "orjson": _orjson,
+    "msgspec": _msgspec,
+    "json": lambda: Backend("json", _json_dumps, _json_loads),
+}
+
+
+def get_backend(name=None):
+    """Backend `name`; with None, the first of BACKENDS that imports."""
+    if name is not None:
+        if name not in _FACTORIES:
+            raise ValueError(f"unknown JSON backend {name!r}; expected one of {', '.join(BACKENDS)}")
+        return _FACTORIES[name]()
+    for candidate in BACKENDS[:-1]:
+        try:
+            return _FACTORIES[candidate]()
+        except ImportError:
+            continue
+    return _FACTORIES["json"]()
+
+
+BACKEND = get_backend(os.environ.get("FDO_JSON_BACKEND") or None)
+dumps = BACKEND.dumps
+loads = BACKEND.loads
@@ -8,8 +8,447 @@ the 12-bit folded checksum and 4b RLCP field over the logical skeleton
 sub-manifold. Arbitration is O(1) and deterministic at the physical layer.
 """
 
+import json
+import mmap
+import numbers
+import operator
+import os
 import struct
 import time
+import zlib
+from array import array
+from types import MappingProxyType
+from itertools import islice
+
+try:
+    from gate_clock import system_clock
+except ImportError:  # imported as src.fdo_gate
+    from .gate_clock import system_clock
+
+HEADER_SIZE = 16
+EPOCH_DRIFT_MS = 2000
+DEFAULT_POLICY_FILE = "Policy_Dictionary.json"
+DEFAULT_FINGERPRINT = 0xDEADBEEF
+_HEADER = struct.Struct("!HIIIH")
+_PAYLOAD_HEAD = struct.Struct("!H")
+
+# Compact per-packet verdict codes returned by the batch API (one byte each).
+VERDICT_FORWARDED = 0
+VERDICT_TOO_SHORT = 1
+VERDICT_CHECKSUM_MISMATCH = 2
+VERDICT_EPOCH_EXPIRED = 3
+VERDICT_POLICY_REJECTED = 4
+VERDICT_REPLAYED = 5
+VERDICT_NAMES = (
+    "forwarded",
+    "too_short",
+    "checksum_mismatch",
+    "epoch_expired",
+    "policy_rejected",
+    "replayed",
+)
+
+# Arbitration stages timed by an attached metrics sink (see gate_metrics).
+STAGE_CHECKSUM = 0
+STAGE_EPOCH = 1
+STAGE_MSBV = 2
+STAGE_NAMES = ("checksum", "epoch", "msbv")
+
+# PE-MsBV enforcement actions; the dense action code is index + 1 and 0 marks
+# an unregistered policy ID.
+ENFORCEMENT_ACTIONS = ("DROP", "INSPECT_AND_LOG", "FORWARD", "ENCRYPT_OR_DROP")
+ACTION_CODES = {name: code for code, name in enumerate(ENFORCEMENT_ACTIONS, 1)}
+DENSE_POLICY_LIMIT = 1 << 22
+_DEFAULT_MSBV = {0x01: 0, 0x02: 1, 0x03: 2, 0x04: 3}
+_COMPILED_TABLES = {}
+
+# Binary MsBV snapshot: header, then actions[dense] and levels[dense] bytes,
+# then overflow entries for policy IDs at or above the dense range.
+SNAPSHOT_MAGIC = b"MSBV"
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct("<4sHHIIII")  # magic, version, header size, dense, overflow, policies, crc32
+_SNAPSHOT_OVERFLOW = struct.Struct("<IBB2x")
+
+
+class MsBVTable(dict):
+    """
+    Compiled PE-MsBV table. As a mapping it is policy_id -> sensitivity level,
+    so Stage 3 membership stays a single O(1) hash probe. `actions` is a dense
+    bytes object indexed by policy ID holding the enforcement action code
+    (0 = unregistered) for IDs below DENSE_POLICY_LIMIT; larger IDs fall back
+    to the read-only `overflow_actions` mapping. Compiled tables are cached
+    and shared by every gate loading the same file, so they are immutable:
+    the dict mutators raise TypeError.
+    """
+
+    def __init__(self, entries=(), source=None):
+        entries = list(entries)
+        dense_ids = [pid for pid, _, _ in entries if pid < DENSE_POLICY_LIMIT]
+        actions = bytearray(max(dense_ids) + 1 if dense_ids else 0)
+        overflow_actions = {}
+        levels = {}
+        for policy_id, level, action in entries:
+            levels[policy_id] = level
+            if policy_id < DENSE_POLICY_LIMIT:
+                actions[policy_id] = action
+            else:
+                overflow_actions[policy_id] = action
+        super().__init__(levels)
+        self.actions = bytes(actions)
+        self.overflow_actions = MappingProxyType(overflow_actions)
+        self.source = source
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("MsBVTable is immutable; compile a new table and swap it in")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        # Rebuild through __init__: unpickling a dict subclass would set items one by one.
+        codes = self.overflow_actions
+        entries = [
+            (policy_id, level, self.actions[policy_id] if policy_id < DENSE_POLICY_LIMIT else codes[policy_id])
+            for policy_id, level in self.items()
+        ]
+        return type(self), (entries, self.source)
+
+    @classmethod
+    def from_mapping(cls, mapping, action="FORWARD"):
+        """
+        Compile a plain {policy_id: security_level} mapping. Already compiled
+        tables (MsBVTable, MappedMsBVTable) are returned as-is.
+        """
+        if isinstance(mapping, (cls, MappedMsBVTable)):
+            return mapping
+        code = ACTION_CODES[action]
+        return cls((int(pid), int(level), code) for pid, level in dict(mapping).items())
+
+    @classmethod
+    def from_policy_dictionary(cls, data, source=None):
+        """Compile a parsed Policy_Dictionary.json document."""
+        entries = []
+        for mapping in data.get("policy_mappings", []):
+            action = mapping.get("enforcement_action", "FORWARD")
+            if action not in ACTION_CODES:
+                raise ValueError(
+                    f"Unknown enforcement_action {action!r} for policy {mapping.get('policy_id')}"
+                )
+            entries.append(
+                (
+                    _parse_int(mapping["policy_id"]),
+                    _parse_int(mapping.get("sensitivity_level", 0)),
+                    ACTION_CODES[action],
+                )
+            )
+        return cls(entries, source=source)
+
+    def action(self, policy_id):
+        """Enforcement action name for policy_id, or None if unregistered."""
+        if policy_id < len(self.actions):
+            code = self.actions[policy_id]
+        else:
+            code = self.overflow_actions.get(policy_id, 0)
+        return ENFORCEMENT_ACTIONS[code - 1] if code else None
+
+
+class MappedMsBVTable:
+    """
+    Read-only PE-MsBV table served straight from an mmap'd snapshot file.
+    Opening costs a header parse and one CRC pass regardless of policy count;
+    lookups index the dense action/level arrays in place. Pickles as its path,
+    so worker processes re-map the same file instead of copying the table.
+    """
+
+    def __init__(self, path, verify=True):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _SNAPSHOT_HEADER.size:
+            raise ValueError(f"MsBV snapshot {path} is truncated")
+        magic, version, header_size, dense, overflow, count, crc = _SNAPSHOT_HEADER.unpack_from(
+            self._mmap
+        )
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not an MsBV snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported MsBV snapshot version {version} in {path}")
+        body_size = 2 * dense + overflow * _SNAPSHOT_OVERFLOW.size
+        if len(self._mmap) != header_size + body_size:
+            raise ValueError(f"MsBV snapshot {path} is truncated")
+        view = memoryview(self._mmap)
+        if verify and zlib.crc32(view[header_size:]) != crc:
+            view.release()
+            raise ValueError(f"MsBV snapshot {path} failed checksum verification")
+        self.source = path
+        self.actions = view[header_size:header_size + dense]
+        self.levels = view[header_size + dense:header_size + 2 * dense]
+        self.overflow_actions = {}
+        self._overflow_levels = {}
+        for i in range(overflow):
+            policy_id, level, action = _SNAPSHOT_OVERFLOW.unpack_from(
+                view, header_size + 2 * dense + i * _SNAPSHOT_OVERFLOW.size
+            )
+            self.overflow_actions[policy_id] = action
+            self._overflow_levels[policy_id] = level
+        self._count = count
+
+    def __reduce__(self):
+        return (MappedMsBVTable, (self.source,))
+
+    def __contains__(self, policy_id):
+        if policy_id < len(self.actions):
+            return self.actions[policy_id] != 0
+        return policy_id in self.overflow_actions
+
+    def __getitem__(self, policy_id):
+        if policy_id < len(self.actions) and self.actions[policy_id]:
+            return self.levels[policy_id]
+        return self._overflow_levels[policy_id]
+
+    def get(self, policy_id, default=None):
+        return self[policy_id] if policy_id in self else default
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        actions = self.actions
+        for policy_id in range(len(actions)):
+            if actions[policy_id]:
+                yield policy_id
+        yield from self.overflow_actions
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        return ((policy_id, self[policy_id]) for policy_id in self)
+
+    action = MsBVTable.action
+
+
+def write_snapshot(table, path):
+    """
+    Serialize a compiled table (or plain mapping) to an MsBV snapshot. The
+    file is written beside `path` and moved into place with os.replace, so
+    readers opening `path` see either the old or the new snapshot, never a
+    partial one.
+    """
+    table = MsBVTable.from_mapping(table)
+    dense = len(table.actions)
+    levels = bytearray(dense)
+    overflow = bytearray()
+    for policy_id, level in table.items():
+        if not 0 <= level <= 0xFF:
+            raise ValueError(f"Sensitivity level {level:#x} of policy {policy_id:#x} exceeds 8 bits")
+        if policy_id < dense:
+            levels[policy_id] = level
+        else:
+            overflow += _SNAPSHOT_OVERFLOW.pack(policy_id, level, table.overflow_actions[policy_id])
+    body = bytes(table.actions) + bytes(levels) + bytes(overflow)
+    header = _SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        _SNAPSHOT_HEADER.size,
+        dense,
+        len(overflow) // _SNAPSHOT_OVERFLOW.size,
+        len(table),
+        zlib.crc32(body),
+    )
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+def _parse_int(value):
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+def resolve_policy_file(policy_file):
+    """Locate policy_file relative to the working directory, then this module."""
+    if policy_file is None or os.path.isabs(policy_file) or os.path.exists(policy_file):
+        return policy_file
+    candidate = os.path.join(os.path.dirname(os.path.abspath(__file__)), policy_file)
+    return candidate if os.path.exists(candidate) else None
+
+
+def load_policy_table(policy_file=DEFAULT_POLICY_FILE):
+    """
+    Compile policy_file into an MsBVTable, or map it read-only when it is an
+    MsBV snapshot (see write_snapshot). Tables are cached per (path, inode,
+    mtime, size), so gates and reloads over an unchanged file share one
+    artifact, and a snapshot replaced by write_snapshot is always reloaded.
+    Only the default name (or None) falls back to the built-in 0x01–0x04
+    table when no file is found; a missing explicit path raises
+    FileNotFoundError rather than gating on the wrong policy set.
+    """
+    path = resolve_policy_file(policy_file)
+    if path is None or not os.path.exists(path):
+        if policy_file is None or policy_file == DEFAULT_POLICY_FILE:
+            return MsBVTable.from_mapping(_DEFAULT_MSBV)
+        raise FileNotFoundError(f"policy file not found: {policy_file}")
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    table = _COMPILED_TABLES.get(key)
+    if table is None:
+        with open(path, "rb") as f:
+            is_snapshot = f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+        if is_snapshot:
+            table = MappedMsBVTable(path)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                table = MsBVTable.from_policy_dictionary(json.load(f), source=path)
+        for stale in [k for k in _COMPILED_TABLES if k[0] == path]:
+            del _COMPILED_TABLES[stale]
+        _COMPILED_TABLES[key] = table
+    return table
+
+
+def _bloom_masks(count=4096, bits=4, seed=0x5EED):
+    """Fixed table of 64-bit masks with `bits` distinct bits set each."""
+    import random
+
+    rng = random.Random(seed)
+    return [sum(1 << b for b in rng.sample(range(64), bits)) for _ in range(count)]
+
+
+# Filled by the first ReplayFilter: building it costs more than the rest of
+# importing this module, and gates without a replay filter never need it.
+_BLOOM_MASKS = []
+
+
+class ReplayFilter:
+    """
+    In-window duplicate detector for Stage 2. Headers are keyed on (epoch,
+    fingerprint, masked policy ID, RLCP+checksum) and recorded in a blocked
+    Bloom filter belonging to the packet's epoch slot (2**slot_shift ms).
+    Slots live in a power-of-two ring just wider than the ±drift window; a
+    ring position whose tag no longer matches its slot is zeroed on reuse,
+    so eviction follows the drift window and memory never grows with rate.
+    Each test-and-set touches one 64-bit word. Size `capacity` to peak
+    packets/s × slot duration: false positives stay below ~3e-4 up to that
+    load and degrade gracefully beyond it; there are no false negatives.
+    A filter shared by threads takes a `lock` (threading.Lock or
+    _thread.allocate_lock), held around each test-and-set and nothing else.
+    """
+
+    def __init__(self, capacity=65536, bits_per_entry=32, slot_shift=8, drift_ms=EPOCH_DRIFT_MS,
+                 lock=None):
+        span = ((2 * drift_ms) >> slot_shift) + 2
+        slots = 1
+        while slots < span:
+            slots <<= 1
+        words = 1
+        while words * 64 < capacity * bits_per_entry:
+            words <<= 1
+        if not _BLOOM_MASKS:
+            _BLOOM_MASKS.extend(_bloom_masks())
+        self.capacity = capacity
+        self.slot_shift = slot_shift
+        self._slot_mask = slots - 1
+        self._word_mask = words - 1
+        self._zero = array("Q", bytes(8 * words))
+        self._buckets = [None] * slots
+        self._tags = [-1] * slots
+        self._lock = lock
+        if lock is not None:
+            self.seen = self._seen_locked
+
+    def seen(self, epoch, fingerprint, masked_policy_id, rlcp_checksum):
+        """Record the header; return True if it was already recorded in its slot."""
+        slot = epoch >> self.slot_shift
+        index = slot & self._slot_mask
+        bucket = self._buckets[index]
+        if self._tags[index] != slot:
+            if bucket is None:
+                bucket = self._buckets[index] = array("Q", self._zero)
+            else:
+                bucket[:] = self._zero
+            self._tags[index] = slot
+        h = hash((epoch, fingerprint, masked_policy_id, rlcp_checksum))
+        mask = _BLOOM_MASKS[(h >> 40) & 0xFFF]
+        word = h & self._word_mask
+        current = bucket[word]
+        if current & mask == mask:
+            return True
+        bucket[word] = current | mask
+        return False
+
+    def _seen_locked(self, epoch, fingerprint, masked_policy_id, rlcp_checksum):
+        with self._lock:
+            return ReplayFilter.seen(self, epoch, fingerprint, masked_policy_id, rlcp_checksum)
+
+    def clear(self):
+        self._buckets = [None] * len(self._buckets)
+        self._tags = [-1] * len(self._tags)
+
+
+class GateVerdict:
+    """
+    One arbitration outcome with its human-readable detail rendered lazily.
+    `code` is the VERDICT_* int; `reason` formats the drop message on first
+    access only, so callers that branch on `ok` or `code` never pay for
+    string formatting.
+    """
+
+    __slots__ = ("code", "fields", "payload_val", "current_epoch", "_reason")
+
+    def __init__(self, code, fields=None, payload_val=0, current_epoch=0):
+        self.code = code
+        self.fields = fields
+        self.payload_val = payload_val
+        self.current_epoch = current_epoch
+        self._reason = None
+
+    @property
+    def ok(self):
+        return self.code == VERDICT_FORWARDED
+
+    @property
+    def name(self):
+        return VERDICT_NAMES[self.code]
+
+    @property
+    def epoch(self):
+        return None if self.fields is None else self.fields[1]
+
+    @property
+    def policy_id(self):
+        return None if self.fields is None else self.fields[3] ^ self.fields[1]
+
+    @property
+    def reason(self):
+        if self._reason is None:
+            if self.code == VERDICT_FORWARDED:
+                self._reason = "Header Valid"
+            elif self.fields is None:
+                self._reason = "Packet too short"
+            else:
+                self._reason = _drop_reason(self.code, self.fields, self.payload_val, self.current_epoch)
+        return self._reason
+
+    def __int__(self):
+        return self.code
+
+    __index__ = __int__
+
+    def __bool__(self):
+        return self.code == VERDICT_FORWARDED
+
+    def __repr__(self):
+        return f"GateVerdict({self.name})"
+
+    def as_dict(self):
+        """The result dict process_packet returns for this verdict."""
+        if self.code == VERDICT_FORWARDED:
+            return {"status": "forwarded", "policy_id": self.policy_id, "epoch": self.epoch}
+        return {"status": "dropped", "reason": self.reason}
 
 
 class FDOGate:
@@ -18,17 +457,34 @@ class FDOGate:
     Checksum (12-bit RLCP integrity). Stage 2 — Epoch Sync (±2000 ms drift
     validation). Stage 3 — PE-MsBV Lookup (branch-entropy-free O(1) arbitration).
     Supports Atomic Epoch Switch via shadow table and atomic pointer swap.
+    With a ReplayFilter attached, Stage 2 also rejects headers already seen
+    inside the drift window. With a metrics sink attached (gate_metrics.
+    GateMetrics), every stage is timed and every verdict counted. `clock`
+    supplies the epoch in milliseconds (see gate_clock); it defaults to the
+    wall clock.
     """
 
-    def __init__(self, policy_file="Policy_Dictionary.json"):
-        self._active_msbv = {
-            0x01: 0,
-            0x02: 1,
-            0x03: 2,
-            0x04: 3,
-        }
+    def __init__(self, policy_file=DEFAULT_POLICY_FILE, replay_filter=None, metrics=None,
+                 clock=None):
+        self.policy_file = policy_file
+        self.replay_filter = replay_filter
+        self.clock = clock or system_clock
+        self._active_msbv = load_policy_table(policy_file)
         self.msbv_table = self._active_msbv
         self.default_security_level = 0
+        self.set_metrics(metrics)
+
+    def set_metrics(self, metrics):
+        """
+        Attach (or, with None, detach) a metrics sink. The arbitration path is
+        bound here, so a gate without metrics runs the uninstrumented stages
+        with no per-packet check at all.
+        """
+        self.metrics = metrics
+        if metrics is None:
+            self._arbitrate = self._arbitrate_fields
+        else:
+            self._arbitrate = self._arbitrate_timed
 
     def parse_header(self, header_bytes):
         """
@@ -64,19 +520,15 @@ class FDOGate:
         rlcp_flags) and first 2 bytes of payload. Returns xor_sum & 0xFFF.
         Branch-entropy-free; aligns with logical skeleton sub-manifold (FIM/RLCP).
         """
-        magic, epoch, fingerprint, masked_policy_id, rlcp_flags = header_parts
-        epoch_fold = (epoch >> 16) ^ (epoch & 0xFFFF)
-        fp_fold = (fingerprint >> 16) ^ (fingerprint & 0xFFFF)
-        pid_fold = (masked_policy_id >> 16) ^ (masked_policy_id & 0xFFFF)
-        xor_sum = magic ^ epoch_fold ^ fp_fold ^ pid_fold ^ (rlcp_flags << 12)
         if payload_head:
             payload_val = (
                 struct.unpack("!H", payload_head[:2])[0]
                 if len(payload_head) >= 2
                 else payload_head[0] << 8
             )
-            xor_sum ^= payload_val
-        return xor_sum & 0xFFF
+        else:
+            payload_val = 0
+        return _fold_checksum(*header_parts, payload_val)
 
     def validate_segment(self, header_bytes, payload_bytes=b""):
         """
@@ -87,45 +539,98 @@ class FDOGate:
         (±2000 ms drift). Stage 3: PE-MsBV Lookup (O(1) arbitration via
         policy_id in self.msbv_table). Returns (True, msg) or (False, reason).
         """
-        try:
-            header = self.parse_header(header_bytes)
-        except ValueError as e:
-            return False, str(e)
+        current_epoch = self.clock()
+        return self._validate_at(header_bytes, payload_bytes, current_epoch)
+
+    def _validate_at(self, header_bytes, payload_bytes, current_epoch):
+        if len(header_bytes) != HEADER_SIZE:
+            if self.metrics is not None:
+                self.metrics.count(VERDICT_TOO_SHORT)
+            return False, "Header must be exactly 16 bytes"
+        fields = _HEADER.unpack_from(header_bytes)
+        payload_val = _payload_head(payload_bytes, 0, len(payload_bytes))
+        return self._validate_fields(fields, payload_val, current_epoch)
+
+    def _validate_fields(self, fields, payload_val, current_epoch):
+        """Three stages over already-decoded header fields (see validate_segment)."""
+        verdict = self._arbitrate(fields, payload_val, current_epoch)
+        if verdict == VERDICT_FORWARDED:
+            return True, "Header Valid"
+        return False, _drop_reason(verdict, fields, payload_val, current_epoch)
+
+    def _arbitrate_fields(self, fields, payload_val, current_epoch):
+        """Run the three stages and return the first failing VERDICT_* code."""
+        magic, epoch, fingerprint, masked_policy_id, rlcp_checksum = fields
 
         # Stage 1: Folded Checksum (12-bit RLCP integrity)
-        header_parts = (
-            header["magic"],
-            header["epoch"],
-            header["fingerprint"],
-            header["masked_policy_id"],
-            header["rlcp_flags"],
-        )
-        expected_checksum = self.calculate_folded_checksum(
-            header_parts, payload_bytes[:2]
+        expected_checksum = _fold_checksum(
+            magic, epoch, fingerprint, masked_policy_id, rlcp_checksum >> 12, payload_val
         )
-        if expected_checksum != header["checksum"]:
-            return (
-                False,
-                f"Checksum Mismatch: expected {expected_checksum:#06x}, got {header['checksum']:#06x}",
-            )
+        if expected_checksum != rlcp_checksum & 0xFFF:
+            return VERDICT_CHECKSUM_MISMATCH
 
-        # Stage 2: Epoch Sync (±2000 ms drift validation)
-        current_epoch = int(time.time() * 1000) & 0xFFFFFFFF
-        received_epoch = header["epoch"]
-        diff = (current_epoch - received_epoch) & 0xFFFFFFFF
+        # Stage 2: Epoch Sync (±2000 ms drift validation, in-window replay)
+        diff = (current_epoch - epoch) & 0xFFFFFFFF
         if diff > 0x7FFFFFFF:
             diff -= 0x100000000
-        if abs(diff) > 2000:
-            return False, f"Epoch Replay/Expired: diff {diff} ticks"
+        if abs(diff) > EPOCH_DRIFT_MS:
+            return VERDICT_EPOCH_EXPIRED
+        if self.replay_filter is not None and self.replay_filter.seen(
+            epoch, fingerprint, masked_policy_id, rlcp_checksum
+        ):
+            return VERDICT_REPLAYED
 
         # Stage 3: PE-MsBV Lookup (O(1) arbitration)
-        policy_id = header["policy_id"]
-        if policy_id not in self.msbv_table:
-            return (
-                False,
-                f"Policy ID {policy_id:#0x} rejected by MsBV+ (Priority Arbitration Pipeline)",
-            )
-        return True, "Header Valid"
+        if (masked_policy_id ^ epoch) not in self.msbv_table:
+            return VERDICT_POLICY_REJECTED
+        return VERDICT_FORWARDED
+
+    def _arbitrate_timed(self, fields, payload_val, current_epoch):
+        """_arbitrate_fields with per-stage timing and verdict accounting."""
+        metrics = self.metrics
+        clock = time.perf_counter_ns
+        magic, epoch, fingerprint, masked_policy_id, rlcp_checksum = fields
+
+        t0 = clock()
+        expected_checksum = _fold_checksum(
+            magic, epoch, fingerprint, masked_policy_id, rlcp_checksum >> 12, payload_val
+        )
+        checksum_ok = expected_checksum == rlcp_checksum & 0xFFF
+        t1 = clock()
+        metrics.observe(STAGE_CHECKSUM, t1 - t0)
+        if not checksum_ok:
+            metrics.count(VERDICT_CHECKSUM_MISMATCH)
+            return VERDICT_CHECKSUM_MISMATCH
+
+        # Restart the clock after each observe() so recording cost is not
+        # charged to the following stage.
+        t1 = clock()
+        diff = (current_epoch - epoch) & 0xFFFFFFFF
+        if diff > 0x7FFFFFFF:
+            diff -= 0x100000000
+        verdict = VERDICT_FORWARDED
+        if abs(diff) > EPOCH_DRIFT_MS:
+            verdict = VERDICT_EPOCH_EXPIRED
+        elif self.replay_filter is not None and self.replay_filter.seen(
+            epoch, fingerprint, masked_policy_id, rlcp_checksum
+        ):
+            verdict = VERDICT_REPLAYED
+        t2 = clock()
+        metrics.observe(STAGE_EPOCH, t2 - t1)
+        if verdict != VERDICT_FORWARDED:
+            metrics.count(verdict)
+            return verdict
+
+        t2 = clock()
+        policy_id = masked_policy_id ^ epoch
+        registered = policy_id in self.msbv_table
+        t3 = clock()
+        metrics.observe(STAGE_MSBV, t3 - t2)
+        if not registered:
+            metrics.count(VERDICT_POLICY_REJECTED)
+            return VERDICT_POLICY_REJECTED
+        metrics.accept(policy_id)
+        return VERDICT_FORWARDED
 
     def atomic_epoch_switch(self, new_epoch_config=None):
         """
@@ -134,38 +639,364 @@ class FDOGate:
         table to the shadow so that validation continues without read-write
         conflict and without branch entropy. Zero downtime. When
         new_epoch_config is provided, the active MsBV table is replaced
-        atomically (simulation: single reference assignment).
+        atomically (simulation: single reference assignment). A plain
+        mapping is compiled first; an MsBVTable is swapped in as-is.
         """
         if new_epoch_config is not None:
-            self._active_msbv = dict(new_epoch_config)
+            self._active_msbv = MsBVTable.from_mapping(new_epoch_config)
             self.msbv_table = self._active_msbv
 
-    def process_packet(self, packet_bytes):
-        """Arbitrate packet through validate_segment; return forwarded or dropped."""
-        if len(packet_bytes) < 16:
+    def reload_policies(self, policy_file=None):
+        """Recompile (or reuse the cached compile of) a policy dictionary and swap it in."""
+        if policy_file is not None:
+            self.policy_file = policy_file
+        self.atomic_epoch_switch(load_policy_table(self.policy_file))
+
+    def policy_action(self, policy_id):
+        """Enforcement action (DROP, INSPECT_AND_LOG, FORWARD, ENCRYPT_OR_DROP) or None."""
+        return self.msbv_table.action(policy_id)
+
+    def arbitrate(self, packet_bytes, offset=0, length=None):
+        """
+        Allocation-free counterpart of process_packet: run the three stages
+        and return only the VERDICT_* code. No reason string or result dict
+        is built, so a flood of rejected packets costs the same as accepts.
+        """
+        size = (len(packet_bytes) - offset) if length is None else length
+        if size < HEADER_SIZE:
+            if self.metrics is not None:
+                self.metrics.count(VERDICT_TOO_SHORT)
+            return VERDICT_TOO_SHORT
+        return self._arbitrate(
+            _HEADER.unpack_from(packet_bytes, offset),
+            _payload_head(packet_bytes, offset + HEADER_SIZE, size - HEADER_SIZE),
+            self.clock(),
+        )
+
+    def arbitrate_detail(self, packet_bytes, offset=0, length=None):
+        """
+        arbitrate() returning a GateVerdict: the code plus what is needed to
+        render the drop reason on demand (verdict.reason, verdict.as_dict()).
+        """
+        size = (len(packet_bytes) - offset) if length is None else length
+        if size < HEADER_SIZE:
+            if self.metrics is not None:
+                self.metrics.count(VERDICT_TOO_SHORT)
+            return GateVerdict(VERDICT_TOO_SHORT)
+        fields = _HEADER.unpack_from(packet_bytes, offset)
+        payload_val = _payload_head(packet_bytes, offset + HEADER_SIZE, size - HEADER_SIZE)
+        current_epoch = self.clock()
+        verdict = self._arbitrate(fields, payload_val, current_epoch)
+        return GateVerdict(verdict, fields, payload_val, current_epoch)
+
+    def process_packet(self, packet_bytes, offset=0, length=None):
+        """
+        Arbitrate one packet; return forwarded or dropped. Zero-copy: the
+        packet may be bytes, bytearray, memoryview or mmap, optionally located
+        at buffer[offset:offset + length]. The header is decoded once with
+        unpack_from and only the first two payload bytes are ever read.
+        """
+        size = (len(packet_bytes) - offset) if length is None else length
+        if size < HEADER_SIZE:
+            if self.metrics is not None:
+                self.metrics.count(VERDICT_TOO_SHORT)
             return {"status": "dropped", "reason": "Packet too short"}
-        header_bytes = packet_bytes[:16]
-        payload = packet_bytes[16:]
-        is_valid, msg = self.validate_segment(header_bytes, payload)
-        if is_valid:
-            header = self.parse_header(header_bytes)
+        fields = _HEADER.unpack_from(packet_bytes, offset)
+        payload_val = _payload_head(packet_bytes, offset + HEADER_SIZE, size - HEADER_SIZE)
+        current_epoch = self.clock()
+        verdict = self._arbitrate(fields, payload_val, current_epoch)
+        if verdict == VERDICT_FORWARDED:
+            epoch = fields[1]
             return {
                 "status": "forwarded",
-                "policy_id": header["policy_id"],
-                "epoch": header["epoch"],
+                "policy_id": fields[3] ^ epoch,
+                "epoch": epoch,
             }
-        return {"status": "dropped", "reason": msg}
+        return {"status": "dropped", "reason": _drop_reason(verdict, fields, payload_val, current_epoch)}
 
-    def create_packet(self, magic, sequence, policy_id, payload=b""):
-        """Build valid 16-byte header + payload (epoch, masked PID, RLCP/checksum)."""
-        current_epoch = int(time.time() * 1000) & 0xFFFFFFFF
-        dummy_fingerprint = 0xDEADBEEF
-        rlcp_flags = 0x0
+    def validate_batch(self, packets, offsets=None):
+        """
+        Validate many packets in one call. `packets` is either a sequence of
+        bytes-like packets, or one contiguous buffer split by `offsets`
+        (N+1 boundaries, packet i spans offsets[i]:offsets[i+1]). The epoch
+        clock is read once and the MsBV table is bound once per batch; stages
+        run in the same order as validate_segment. Returns a bytearray holding
+        one VERDICT_* code per packet. Offsets that are negative, decreasing
+        or past the end of the buffer raise ValueError before any packet is
+        judged.
+        """
+        current_epoch = self.clock()
+        return self._validate_batch(packets, offsets, current_epoch)
+
+    def _validate_batch(self, packets, offsets, current_epoch):
+        if self.metrics is not None:
+            return self._validate_batch_timed(packets, offsets, current_epoch)
+        table = self.msbv_table
+        replay_seen = self.replay_filter.seen if self.replay_filter is not None else None
+        unpack_from = _HEADER.unpack_from
+        unpack_head = _PAYLOAD_HEAD.unpack_from
+        verdicts = bytearray()
+        append = verdicts.append
+        for view, start, end in _iter_segments(packets, offsets):
+            size = end - start
+            if size < HEADER_SIZE:
+                append(VERDICT_TOO_SHORT)
+                continue
+            magic, epoch, fingerprint, masked_pid, rlcp_checksum = unpack_from(view, start)
+            rlcp_flags = rlcp_checksum >> 12
+            xor_sum = (
+                magic
+                ^ (epoch >> 16) ^ (epoch & 0xFFFF)
+                ^ (fingerprint >> 16) ^ (fingerprint & 0xFFFF)
+                ^ (masked_pid >> 16) ^ (masked_pid & 0xFFFF)
+                ^ (rlcp_flags << 12)
+            )
+            if size >= HEADER_SIZE + 2:
+                xor_sum ^= unpack_head(view, start + HEADER_SIZE)[0]
+            elif size == HEADER_SIZE + 1:
+                xor_sum ^= view[start + HEADER_SIZE] << 8
+            if (xor_sum & 0xFFF) != (rlcp_checksum & 0xFFF):
+                append(VERDICT_CHECKSUM_MISMATCH)
+                continue
+            diff = (current_epoch - epoch) & 0xFFFFFFFF
+            if diff > 0x7FFFFFFF:
+                diff -= 0x100000000
+            if diff > EPOCH_DRIFT_MS or diff < -EPOCH_DRIFT_MS:
+                append(VERDICT_EPOCH_EXPIRED)
+                continue
+            if replay_seen is not None and replay_seen(epoch, fingerprint, masked_pid, rlcp_checksum):
+                append(VERDICT_REPLAYED)
+                continue
+            if (masked_pid ^ epoch) not in table:
+                append(VERDICT_POLICY_REJECTED)
+                continue
+            append(VERDICT_FORWARDED)
+        return verdicts
+
+    def _validate_batch_timed(self, packets, offsets, current_epoch):
+        """validate_batch through the timed per-packet stages."""
+        arbitrate = self._arbitrate_timed
+        count = self.metrics.count
+        unpack_from = _HEADER.unpack_from
+        verdicts = bytearray()
+        append = verdicts.append
+        for view, start, end in _iter_segments(packets, offsets):
+            size = end - start
+            if size < HEADER_SIZE:
+                count(VERDICT_TOO_SHORT)
+                append(VERDICT_TOO_SHORT)
+                continue
+            payload_val = _payload_head(view, start + HEADER_SIZE, size - HEADER_SIZE)
+            append(arbitrate(unpack_from(view, start), payload_val, current_epoch))
+        return verdicts
+
+    def process_batch(self, packets, offsets=None):
+        """
+        Batch counterpart of process_packet. Runs validate_batch and returns
+        the same per-packet result dicts process_packet would produce, with
+        drop reasons rendered only for rejected packets.
+        """
+        current_epoch = self.clock()
+        verdicts = self._validate_batch(packets, offsets, current_epoch)
+        results = []
+        for verdict, (view, start, end) in zip(verdicts, _iter_segments(packets, offsets)):
+            if verdict == VERDICT_FORWARDED:
+                _, epoch, _, masked_pid, _ = _HEADER.unpack_from(view, start)
+                results.append(
+                    {"status": "forwarded", "policy_id": masked_pid ^ epoch, "epoch": epoch}
+                )
+            elif verdict == VERDICT_TOO_SHORT:
+                results.append({"status": "dropped", "reason": "Packet too short"})
+            else:
+                fields = _HEADER.unpack_from(view, start)
+                payload_val = _payload_head(view, start + HEADER_SIZE, end - start - HEADER_SIZE)
+                reason = _drop_reason(verdict, fields, payload_val, current_epoch)
+                results.append({"status": "dropped", "reason": reason})
+        return results
+
+    def explain_batch(self, packets, offsets=None):
+        """
+        validate_batch plus drop reasons: returns (verdicts, reasons), where
+        reasons maps the index of every rejected packet to the message
+        process_packet would give. Accepted packets are never decoded twice.
+        """
+        current_epoch = self.clock()
+        verdicts = self._validate_batch(packets, offsets, current_epoch)
+        reasons = {}
+        for index, (verdict, (view, start, end)) in enumerate(
+            zip(verdicts, _iter_segments(packets, offsets))
+        ):
+            if verdict == VERDICT_FORWARDED:
+                continue
+            if verdict == VERDICT_TOO_SHORT:
+                reasons[index] = "Packet too short"
+                continue
+            fields = _HEADER.unpack_from(view, start)
+            payload_val = _payload_head(view, start + HEADER_SIZE, end - start - HEADER_SIZE)
+            reasons[index] = _drop_reason(verdict, fields, payload_val, current_epoch)
+        return verdicts, reasons
+
+    def create_packet(self, magic, sequence, policy_id, payload=b"", fingerprint=None, rlcp_flags=0):
+        """
+        Build valid 16-byte header + payload (epoch, masked PID, RLCP/checksum).
+        The header has no sequence field, so `sequence` is folded into the
+        default I/O fingerprint (0xDEADBEEF ^ sequence): packets stamped in
+        the same millisecond still get distinct headers. Pass `fingerprint`
+        to stamp a measured I/O fingerprint instead.
+        """
+        current_epoch = self.clock()
+        if fingerprint is None:
+            fingerprint = (DEFAULT_FINGERPRINT ^ (sequence or 0)) & 0xFFFFFFFF
         masked_pid = policy_id ^ current_epoch
-        header_parts = (magic, current_epoch, dummy_fingerprint, masked_pid, rlcp_flags)
+        header_parts = (magic, current_epoch, fingerprint, masked_pid, rlcp_flags)
         checksum = self.calculate_folded_checksum(header_parts, payload[:2])
         final_checksum_field = (rlcp_flags << 12) | (checksum & 0xFFF)
         header = struct.pack(
-            "!HIIIH", magic, current_epoch, dummy_fingerprint, masked_pid, final_checksum_field
+            "!HIIIH", magic, current_epoch, fingerprint, masked_pid, final_checksum_field
         )
         return header + payload
+
+    def create_packets(self, magic, policy_ids, payloads=b"", fingerprints=None, rlcp_flags=0,
+                       sequences=None, out=None):
+        """
+        Bulk create_packet: stamp len(policy_ids) packets with one clock read
+        into a single preallocated bytearray (or `out`, any writable buffer
+        large enough; a smaller one raises ValueError). magic, payloads,
+        fingerprints, rlcp_flags and sequences are each a scalar (int or
+        NumPy integer) shared by every packet or a sequence with one entry
+        per packet; sequences default to the packet index.
+        Returns (buffer, offsets) in the validate_batch layout. See
+        gate_vector.build_packets for the NumPy-vectorized builder.
+        """
+        count = len(policy_ids)
+        policy_ids = _broadcast(policy_ids, count)
+        magics = _broadcast(magic, count)
+        bodies = _broadcast(payloads, count, bytes_like=True)
+        flags = _broadcast(rlcp_flags, count)
+        if fingerprints is None:
+            sequences = range(count) if sequences is None else _broadcast(sequences, count)
+            fingerprints = [(DEFAULT_FINGERPRINT ^ seq) & 0xFFFFFFFF for seq in sequences]
+        else:
+            fingerprints = _broadcast(fingerprints, count)
+
+        offsets = [0] * (count + 1)
+        total = 0
+        for i, body in enumerate(bodies):
+            total += HEADER_SIZE + len(body)
+            offsets[i + 1] = total
+        if out is None:
+            buffer = bytearray(total)
+        else:
+            buffer = out
+            size = memoryview(out).nbytes
+            if size < total:
+                raise ValueError(f"out holds {size} bytes, the packets need {total}")
+
+        epoch = self.clock()
+        epoch_fold = (epoch >> 16) ^ (epoch & 0xFFFF)
+        pack_into = _HEADER.pack_into
+        for i in range(count):
+            start = offsets[i]
+            body = bodies[i]
+            fingerprint = fingerprints[i]
+            masked_pid = policy_ids[i] ^ epoch
+            rlcp = flags[i]
+            xor_sum = (
+                magics[i] ^ epoch_fold
+                ^ (fingerprint >> 16) ^ (fingerprint & 0xFFFF)
+                ^ (masked_pid >> 16) ^ (masked_pid & 0xFFFF)
+                ^ (rlcp << 12)
+            )
+            size = len(body)
+            if size >= 2:
+                xor_sum ^= (body[0] << 8) | body[1]
+            elif size == 1:
+                xor_sum ^= body[0] << 8
+            pack_into(
+                buffer, start, magics[i], epoch, fingerprint, masked_pid,
+                (rlcp << 12) | (xor_sum & 0xFFF),
+            )
+            if size:
+                buffer[start + HEADER_SIZE:offsets[i + 1]] = body
+        return buffer, offsets
+
+
+def _fold_checksum(magic, epoch, fingerprint, masked_policy_id, rlcp_flags, payload_val):
+    """12-bit fold of the header words and the 16-bit payload head value."""
+    epoch_fold = (epoch >> 16) ^ (epoch & 0xFFFF)
+    fp_fold = (fingerprint >> 16) ^ (fingerprint & 0xFFFF)
+    pid_fold = (masked_policy_id >> 16) ^ (masked_policy_id & 0xFFFF)
+    xor_sum = magic ^ epoch_fold ^ fp_fold ^ pid_fold ^ (rlcp_flags << 12) ^ payload_val
+    return xor_sum & 0xFFF
+
+
+def _drop_reason(verdict, fields, payload_val, current_epoch):
+    """Render the human-readable reason for a rejection verdict (no side effects)."""
+    magic, epoch, fingerprint, masked_policy_id, rlcp_checksum = fields
+    if verdict == VERDICT_CHECKSUM_MISMATCH:
+        expected = _fold_checksum(
+            magic, epoch, fingerprint, masked_policy_id, rlcp_checksum >> 12, payload_val
+        )
+        return f"Checksum Mismatch: expected {expected:#06x}, got {rlcp_checksum & 0xFFF:#06x}"
+    if verdict == VERDICT_EPOCH_EXPIRED:
+        diff = (current_epoch - epoch) & 0xFFFFFFFF
+        if diff > 0x7FFFFFFF:
+            diff -= 0x100000000
+        return f"Epoch Replay/Expired: diff {diff} ticks"
+    if verdict == VERDICT_REPLAYED:
+        return "Epoch Replay/Duplicate: header already seen within drift window"
+    if verdict == VERDICT_POLICY_REJECTED:
+        policy_id = masked_policy_id ^ epoch
+        return f"Policy ID {policy_id:#0x} rejected by MsBV+ (Priority Arbitration Pipeline)"
+    return "Packet too short"
+
+
+def _broadcast(value, count, bytes_like=False):
+    """
+    A per-packet sequence of length `count` from a scalar or a sequence.
+    Integers come back as Python ints: a NumPy uint8 flag shifted left by
+    12 would otherwise wrap before it reached the checksum.
+    """
+    if bytes_like:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return [value] * count
+    elif isinstance(value, numbers.Integral):  # includes NumPy integer scalars
+        return [operator.index(value)] * count
+    if len(value) != count:
+        raise ValueError(f"expected {count} values, got {len(value)}")
+    if not bytes_like and hasattr(value, "tolist"):
+        return value.tolist()  # NumPy array
+    return value
+
+
+def _payload_head(buffer, start, size):
+    """First two payload bytes as the value folded into the checksum (no copy)."""
+    if size >= 2:
+        return _PAYLOAD_HEAD.unpack_from(buffer, start)[0]
+    if size == 1:
+        return buffer[start] << 8
+    return 0
+
+
+def _iter_segments(packets, offsets):
+    """Yield (buffer, start, end) for each packet without copying payloads."""
+    if offsets is None:
+        for packet in packets:
+            yield packet, 0, len(packet)
+        return
+    view = memoryview(packets)
+    _check_offsets(offsets, view.nbytes)
+    for i in range(len(offsets) - 1):
+        yield view, offsets[i], offsets[i + 1]
+
+
+def _check_offsets(offsets, size):
+    """Reject boundaries that are negative, decreasing or past the end of the buffer."""
+    if not len(offsets):
+        return
+    if offsets[0] < 0:
+        raise ValueError(f"offsets start at {offsets[0]}, before the buffer")
+    if offsets[-1] > size:
+        raise ValueError(f"offsets end at {offsets[-1]}, past the {size}-byte buffer")
+    if any(map(operator.gt, offsets, islice(offsets, 1, None))):
+        raise ValueError("offsets must not decrease")
@@ -0,0 +1,102 @@
+"""
+A-FDO Gate — epoch clock sources.
+
+FDOGate reads the Stage 2 epoch through an injectable clock: any zero-argument
+callable returning the current epoch in milliseconds, truncated to 32 bits
+like the header field. Provided sources:
+
+- system_clock: one wall-clock read per call (the default).
+- CoarseClock: a cached millisecond value refreshed by a background thread,
+  so the hot path reads an attribute instead of making a clock syscall.
+- SimulatedClock: deterministic time that only moves when told to, for
+  tests and for replaying recorded captures faster than real time.
+- BatchClock: wraps another source and serves one reading until the next
+  tick(), so every packet of a batch sees the same epoch.
+"""
+
+import threading
+import time
+
+
+def system_clock():
+    """Wall-clock epoch in milliseconds, masked to the 32-bit header field."""
+    return int(time.time() * 1000) & 0xFFFFFFFF
+
+
+class CoarseClock:
+    """
+    Millisecond epoch cached by a daemon thread every `resolution_ms`.
+    Readings lag wall time by at most one resolution step, well inside the
+    ±2000 ms drift window. Call stop() (or use as a context manager) to end
+    the tick thread.
+    """
+
+    def __init__(self, resolution_ms=1.0, source=system_clock):
+        self.resolution = resolution_ms / 1000.0
+        self.source = source
+        self.now = source()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._tick, name="fdo-gate-clock", daemon=True)
+        self._thread.start()
+
+    def _tick(self):
+        source = self.source
+        wait = self._stop.wait
+        resolution = self.resolution
+        while not wait(resolution):
+            self.now = source()
+
+    def __call__(self):
+        return self.now
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class SimulatedClock:
+    """
+    Deterministic epoch clock. Starts at `start_ms` and changes only through
+    advance() and set(), so Stage 2 results do not depend on how fast the
+    caller runs. Replaying a capture at any speed is a matter of set()-ing
+    each packet's recorded arrival time before arbitrating it.
+    """
+
+    def __init__(self, start_ms=None):
+        self.now = (system_clock() if start_ms is None else start_ms) & 0xFFFFFFFF
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, ms):
+        self.now = (self.now + int(ms)) & 0xFFFFFFFF
+        return self.now
+
+    def set(self, epoch_ms):
+        self.now = int(epoch_ms) & 0xFFFFFFFF
+        return self.now
+
+
+class BatchClock:
+    """
+    Serves one reading of `source` until tick() is called again, so a loop
+    of single-packet calls (process_packet, arbitrate) costs one clock read
+    per batch instead of one per packet.
+    """
+
+    def __init__(self, source=system_clock):
+        self.source = source
+        self.now = source()
+
+    def __call__(self):
+        return self.now
+
+    def tick(self):
+        self.now = self.source()
+        return self.now
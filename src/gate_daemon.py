@@ -0,0 +1,297 @@
+"""
+A-FDO Gate daemon — asyncio network front-end for FDOGate.
+
+Accepts DOIP segments as length-prefixed frames over TCP (4-byte big-endian
+length, then the segment) and as raw datagrams over UDP, arbitrates them in
+batches through FDOGate.validate_batch, and forwards accepted segments to an
+upstream over TCP using the same framing. Drops are counted by reason.
+
+Backpressure: when the upstream write buffer passes its high-water mark,
+TCP ingress stops reading (the kernel window pushes back on senders) and UDP
+datagrams are dropped with reason "backpressure" until the buffer drains.
+
+    python -m src.gate_daemon --tcp 127.0.0.1:9400 --udp 127.0.0.1:9401 \\
+        --upstream 127.0.0.1:9500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import struct
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fdo_gate import FDOGate, ReplayFilter, VERDICT_FORWARDED, VERDICT_NAMES
+from gate_metrics import GateMetrics
+
+FRAME = struct.Struct("!I")
+DEFAULT_MAX_FRAME = 16 * 1024 * 1024
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_UDP_FLUSH_DELAY = 0.0002
+UDP_RECEIVE_BUFFER = 4 * 1024 * 1024
+DAEMON_DROP_REASONS = ("oversize", "backpressure", "upstream_unavailable")
+
+logger = logging.getLogger("fdo_gate.daemon")
+
+
+def parse_address(value):
+    """Split HOST:PORT into (host, int(port))."""
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class _UpstreamProtocol(asyncio.Protocol):
+    def __init__(self, daemon):
+        self.daemon = daemon
+
+    def pause_writing(self):
+        self.daemon._set_backpressure(True)
+
+    def resume_writing(self):
+        self.daemon._set_backpressure(False)
+
+    def connection_lost(self, exc):
+        logger.warning("Upstream connection lost: %s", exc)
+        self.daemon._upstream = None
+        self.daemon._set_backpressure(False)
+
+
+class _TCPIngressProtocol(asyncio.Protocol):
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self.transport = None
+        self._pending = bytearray()
+        self._needed = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.daemon._ingress.add(transport)
+        if self.daemon.backpressure:
+            transport.pause_reading()
+
+    def connection_lost(self, exc):
+        self.daemon._ingress.discard(self.transport)
+
+    def data_received(self, data):
+        if self._pending:
+            # Accumulate a partial frame until it is complete, then parse once.
+            self._pending += data
+            if len(self._pending) < self._needed:
+                return
+            data = bytes(self._pending)
+            self._pending = bytearray()
+        view = memoryview(data)
+        size = len(data)
+        frames = []
+        pos = 0
+        max_frame = self.daemon.max_frame
+        self._needed = FRAME.size
+        while size - pos >= FRAME.size:
+            length = FRAME.unpack_from(data, pos)[0]
+            if length > max_frame:
+                self.daemon._count("oversize")
+                self.transport.close()
+                return
+            end = pos + FRAME.size + length
+            if end > size:
+                self._needed = FRAME.size + length
+                break
+            frames.append(view[pos + FRAME.size:end])
+            pos = end
+            if len(frames) == self.daemon.batch_size:
+                self.daemon.arbitrate(frames)
+                frames = []
+        if frames:
+            self.daemon.arbitrate(frames)
+        if pos < size:
+            self._pending = bytearray(view[pos:])
+
+
+class _UDPIngressProtocol(asyncio.DatagramProtocol):
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self._batch = []
+        self._scheduled = False
+
+    def datagram_received(self, data, addr):
+        self._batch.append(data)
+        if len(self._batch) >= self.daemon.batch_size:
+            self._flush()
+        elif not self._scheduled:
+            # asyncio delivers one datagram per loop iteration, so coalesce
+            # over a short window rather than until the end of the iteration.
+            self._scheduled = True
+            asyncio.get_running_loop().call_later(self.daemon.udp_flush_delay, self._flush)
+
+    def _flush(self):
+        self._scheduled = False
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self.daemon.arbitrate(batch, datagram=True)
+
+
+class GateDaemon:
+    """Asyncio gate service: ingress listeners, batched arbitration, upstream forwarding."""
+
+    def __init__(self, gate=None, upstream=None, batch_size=DEFAULT_BATCH_SIZE,
+                 max_frame=DEFAULT_MAX_FRAME, high_water=4 * 1024 * 1024,
+                 udp_flush_delay=DEFAULT_UDP_FLUSH_DELAY):
+        self.gate = gate or FDOGate(policy_file="Policy_Dictionary.json")
+        self.upstream_address = upstream
+        self.batch_size = batch_size
+        self.max_frame = max_frame
+        self.high_water = high_water
+        self.udp_flush_delay = udp_flush_delay
+        self.backpressure = False
+        self.received = 0
+        self.batches = 0
+        self.counters = {name: 0 for name in VERDICT_NAMES + DAEMON_DROP_REASONS}
+        self._upstream = None
+        self._ingress = set()
+        self._servers = []
+
+    async def start(self, tcp=None, udp=None):
+        loop = asyncio.get_running_loop()
+        if self.upstream_address:
+            transport, _ = await loop.create_connection(
+                lambda: _UpstreamProtocol(self), *self.upstream_address
+            )
+            transport.set_write_buffer_limits(high=self.high_water)
+            self._upstream = transport
+        if tcp:
+            server = await loop.create_server(lambda: _TCPIngressProtocol(self), *tcp)
+            self._servers.append(server)
+            logger.info("TCP ingress on %s:%s", *tcp)
+        if udp:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _UDPIngressProtocol(self), local_addr=udp
+            )
+            sock = transport.get_extra_info("socket")
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER)
+            self._servers.append(transport)
+            logger.info("UDP ingress on %s:%s", *udp)
+
+    def close(self):
+        for server in self._servers:
+            server.close()
+        if self._upstream is not None:
+            self._upstream.close()
+
+    def arbitrate(self, packets, datagram=False):
+        """Validate one batch and forward accepted packets upstream."""
+        self.received += len(packets)
+        self.batches += 1
+        if datagram and self.backpressure:
+            self._count("backpressure", len(packets))
+            return
+        verdicts = self.gate.validate_batch(packets)
+        counters = self.counters
+        upstream = self._upstream
+        unavailable = upstream is None and self.upstream_address is not None
+        out = []
+        for packet, verdict in zip(packets, verdicts):
+            if verdict != VERDICT_FORWARDED:
+                counters[VERDICT_NAMES[verdict]] += 1
+            elif unavailable:
+                counters["upstream_unavailable"] += 1
+            else:
+                counters["forwarded"] += 1
+                if upstream is not None:
+                    out.append(FRAME.pack(len(packet)))
+                    out.append(packet)
+        if out:
+            upstream.writelines(out)
+
+    def _count(self, reason, n=1):
+        self.counters[reason] += n
+
+    def _set_backpressure(self, engaged):
+        if engaged == self.backpressure:
+            return
+        self.backpressure = engaged
+        for transport in self._ingress:
+            if engaged:
+                transport.pause_reading()
+            else:
+                transport.resume_reading()
+
+    def stats(self):
+        """Snapshot of packet counters (plus gate stage metrics when attached)."""
+        dropped = {k: v for k, v in self.counters.items() if k != "forwarded" and v}
+        stats = {
+            "received": self.received,
+            "batches": self.batches,
+            "forwarded": self.counters["forwarded"],
+            "dropped": dropped,
+            "backpressure": self.backpressure,
+        }
+        if self.gate.metrics is not None:
+            stats["gate"] = self.gate.metrics.snapshot()
+        return stats
+
+
+async def _serve(args):
+    daemon = GateDaemon(
+        gate=FDOGate(
+            policy_file=args.policy_file,
+            replay_filter=ReplayFilter() if args.replay_filter else None,
+            metrics=GateMetrics() if args.metrics else None,
+        ),
+        upstream=parse_address(args.upstream) if args.upstream else None,
+        batch_size=args.batch_size,
+        max_frame=args.max_frame,
+        high_water=args.high_water,
+        udp_flush_delay=args.udp_flush_us / 1e6,
+    )
+    await daemon.start(
+        tcp=parse_address(args.tcp) if args.tcp else None,
+        udp=parse_address(args.udp) if args.udp else None,
+    )
+    task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    try:
+        while True:
+            await asyncio.sleep(args.stats_interval or 3600)
+            if args.stats_interval:
+                print(json.dumps(daemon.stats()), file=sys.stderr, flush=True)
+    finally:
+        daemon.close()
+        print(json.dumps(daemon.stats()), file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="A-FDO Gate network daemon")
+    parser.add_argument("--tcp", help="TCP listen HOST:PORT (length-prefixed frames)")
+    parser.add_argument("--udp", help="UDP listen HOST:PORT (one segment per datagram)")
+    parser.add_argument("--upstream", help="forward accepted segments to HOST:PORT over TCP")
+    parser.add_argument("--policy-file", default="Policy_Dictionary.json",
+                        help="policy dictionary or MsBV snapshot")
+    parser.add_argument("--replay-filter", action="store_true",
+                        help="drop headers replayed inside the epoch drift window")
+    parser.add_argument("--metrics", action="store_true",
+                        help="time gate stages and include them in the stats output")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--max-frame", type=int, default=DEFAULT_MAX_FRAME)
+    parser.add_argument("--high-water", type=int, default=4 * 1024 * 1024,
+                        help="upstream write-buffer bytes before backpressure engages")
+    parser.add_argument("--udp-flush-us", type=float, default=DEFAULT_UDP_FLUSH_DELAY * 1e6,
+                        help="max microseconds a datagram waits for its batch to fill")
+    parser.add_argument("--stats-interval", type=float, default=0,
+                        help="print counters to stderr every N seconds")
+    args = parser.parse_args(argv)
+    if not (args.tcp or args.udp):
+        parser.error("at least one of --tcp or --udp is required")
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    try:
+        asyncio.run(_serve(args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
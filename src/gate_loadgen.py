@@ -0,0 +1,159 @@
+"""
+A-FDO Gate load generator — local packets/sec and latency measurement.
+
+Runs an in-process upstream sink, optionally spawns the gate daemon pointed
+at it, then streams freshly stamped segments to the daemon's TCP ingress.
+Each payload carries an 8-byte sequence number so the sink can match
+forwarded segments to their send time and report p50/p99 latency.
+
+    python -m src.gate_loadgen --spawn --packets 200000 --invalid-ratio 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fdo_gate import FDOGate, HEADER_SIZE
+from gate_daemon import FRAME, parse_address
+
+_SEQ = struct.Struct("!Q")
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _Sink(asyncio.Protocol):
+    """Upstream stand-in: de-frames forwarded segments and timestamps them."""
+
+    def __init__(self, send_ns, latencies, done, expected):
+        self.send_ns = send_ns
+        self.latencies = latencies
+        self.done = done
+        self.expected = expected
+        self._buffer = bytearray()
+
+    def data_received(self, data):
+        now = time.perf_counter_ns()
+        buffer = self._buffer
+        buffer += data
+        pos = 0
+        while len(buffer) - pos >= FRAME.size:
+            length = FRAME.unpack_from(buffer, pos)[0]
+            end = pos + FRAME.size + length
+            if end > len(buffer):
+                break
+            seq = _SEQ.unpack_from(buffer, pos + FRAME.size + HEADER_SIZE)[0]
+            self.latencies.append(now - self.send_ns[seq])
+            pos = end
+        del buffer[:pos]
+        if len(self.latencies) >= self.expected and not self.done.done():
+            self.done.set_result(None)
+
+
+async def run_load(args):
+    loop = asyncio.get_running_loop()
+    gate = FDOGate()
+    rng = random.Random(args.seed)
+    invalid = [rng.random() < args.invalid_ratio for _ in range(args.packets)]
+    expected = invalid.count(False)
+    send_ns = [0] * args.packets
+    latencies = []
+    done = loop.create_future()
+    if expected == 0:
+        done.set_result(None)
+
+    sink = await loop.create_server(
+        lambda: _Sink(send_ns, latencies, done, expected), "127.0.0.1", 0
+    )
+    sink_port = sink.sockets[0].getsockname()[1]
+
+    daemon = None
+    target = parse_address(args.target)
+    if args.spawn:
+        daemon = subprocess.Popen(
+            [sys.executable, "-m", "src.gate_daemon", "--tcp", args.target,
+             "--upstream", f"127.0.0.1:{sink_port}", "--batch-size", str(args.batch_size)],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+    try:
+        for _ in range(100):
+            try:
+                _, writer = await asyncio.open_connection(*target)
+                break
+            except OSError:
+                await asyncio.sleep(0.05)
+        else:
+            raise RuntimeError(f"gate daemon not reachable at {args.target}")
+
+        padding = b"\x00" * max(0, args.payload_size - _SEQ.size)
+        interval = 1.0 / args.rate if args.rate else 0.0
+        start = time.perf_counter()
+        for seq in range(args.packets):
+            policy_id = 0xFF if invalid[seq] else 0x01
+            packet = gate.create_packet(0xFD01, seq, policy_id, _SEQ.pack(seq) + padding)
+            send_ns[seq] = time.perf_counter_ns()
+            writer.write(FRAME.pack(len(packet)) + packet)
+            if seq % args.burst == args.burst - 1:
+                await writer.drain()
+                if interval:
+                    delay = start + (seq + 1) * interval - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+        await writer.drain()
+        try:
+            await asyncio.wait_for(done, timeout=args.timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - start
+        writer.close()
+    finally:
+        sink.close()
+        if daemon is not None:
+            daemon.terminate()
+            daemon.wait()
+
+    ordered = sorted(latencies)
+    return {
+        "sent": args.packets,
+        "expected_forwarded": expected,
+        "forwarded": len(latencies),
+        "elapsed_s": round(elapsed, 4),
+        "packets_per_sec": round(args.packets / elapsed, 1),
+        "latency_us": {
+            "p50": round(percentile(ordered, 0.50) / 1000, 1),
+            "p99": round(percentile(ordered, 0.99) / 1000, 1),
+            "max": round(ordered[-1] / 1000, 1) if ordered else 0.0,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="A-FDO Gate load generator")
+    parser.add_argument("--target", default="127.0.0.1:9400", help="daemon TCP ingress HOST:PORT")
+    parser.add_argument("--spawn", action="store_true", help="start a gate daemon on --target")
+    parser.add_argument("--packets", type=int, default=100000)
+    parser.add_argument("--payload-size", type=int, default=64)
+    parser.add_argument("--invalid-ratio", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=0, help="packets/sec (0 = max speed)")
+    parser.add_argument("--burst", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=256, help="daemon batch size (--spawn)")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_load(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
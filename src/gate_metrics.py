@@ -0,0 +1,123 @@
+"""
+A-FDO Gate — per-stage telemetry.
+
+GateMetrics records where arbitration time goes and why packets are dropped:
+
+- one nanosecond latency histogram per stage (checksum, epoch, msbv), kept
+  as 64 log2 buckets so recording is a bit_length() and a list increment;
+- one preallocated counter per verdict code (forwarded plus every drop
+  reason), indexed directly by the VERDICT_* constant;
+- accepted packet counts per unmasked policy ID.
+
+Attach it with FDOGate(metrics=GateMetrics()) or gate.set_metrics(...).
+A gate without metrics binds its uninstrumented arbitration path, so the
+disabled cost is nothing per packet and a single None check per batch.
+Export with snapshot() (plain dict) or prometheus() (text exposition format).
+"""
+
+try:
+    from fdo_gate import STAGE_NAMES, VERDICT_FORWARDED, VERDICT_NAMES
+except ImportError:  # imported as src.gate_metrics
+    from .fdo_gate import STAGE_NAMES, VERDICT_FORWARDED, VERDICT_NAMES
+
+HISTOGRAM_BUCKETS = 64
+
+
+class GateMetrics:
+    """Stage latency histograms, verdict counters and per-policy accept counts."""
+
+    def __init__(self, namespace="fdo_gate"):
+        self.namespace = namespace
+        self.reset()
+
+    def reset(self):
+        self.stage_buckets = [[0] * HISTOGRAM_BUCKETS for _ in STAGE_NAMES]
+        self.stage_count = [0] * len(STAGE_NAMES)
+        self.stage_sum_ns = [0] * len(STAGE_NAMES)
+        self.verdicts = [0] * len(VERDICT_NAMES)
+        self.accepted = {}
+
+    def observe(self, stage, elapsed_ns):
+        """Record one stage duration; bucket i holds durations below 2**i ns."""
+        self.stage_buckets[stage][elapsed_ns.bit_length()] += 1
+        self.stage_count[stage] += 1
+        self.stage_sum_ns[stage] += elapsed_ns
+
+    def count(self, verdict, n=1):
+        self.verdicts[verdict] += n
+
+    def accept(self, policy_id):
+        self.verdicts[VERDICT_FORWARDED] += 1
+        accepted = self.accepted
+        accepted[policy_id] = accepted.get(policy_id, 0) + 1
+
+    def percentile(self, stage, fraction):
+        """
+        Upper bound (ns) of the histogram bucket holding the `fraction`
+        quantile of one stage (an index into STAGE_NAMES); 0 when empty.
+        Resolution is the log2 bucket width.
+        """
+        total = self.stage_count[stage]
+        if not total:
+            return 0
+        rank = max(1, int(fraction * total + 0.5))
+        cumulative = 0
+        for i, hits in enumerate(self.stage_buckets[stage]):
+            cumulative += hits
+            if cumulative >= rank:
+                return 1 << i
+        return 1 << (HISTOGRAM_BUCKETS - 1)
+
+    def snapshot(self):
+        """Counters and cumulative histograms as a JSON-serializable dict."""
+        stages = {}
+        for index, name in enumerate(STAGE_NAMES):
+            cumulative = 0
+            buckets = {}
+            for i, hits in enumerate(self.stage_buckets[index]):
+                cumulative += hits
+                if hits:
+                    buckets[1 << i] = cumulative
+            stages[name] = {
+                "count": self.stage_count[index],
+                "sum_ns": self.stage_sum_ns[index],
+                "le_ns": buckets,
+            }
+        return {
+            "verdicts": dict(zip(VERDICT_NAMES, self.verdicts)),
+            "accepted_by_policy": {f"{pid:#x}": n for pid, n in sorted(self.accepted.items())},
+            "stages": stages,
+        }
+
+    def prometheus(self):
+        """Prometheus text exposition (counters plus a seconds histogram per stage)."""
+        ns = self.namespace
+        lines = [
+            f"# HELP {ns}_packets_total Packets arbitrated, by verdict.",
+            f"# TYPE {ns}_packets_total counter",
+        ]
+        for name, value in zip(VERDICT_NAMES, self.verdicts):
+            lines.append(f'{ns}_packets_total{{verdict="{name}"}} {value}')
+        lines += [
+            f"# HELP {ns}_policy_accepted_total Forwarded packets, by unmasked policy ID.",
+            f"# TYPE {ns}_policy_accepted_total counter",
+        ]
+        for pid, value in sorted(self.accepted.items()):
+            lines.append(f'{ns}_policy_accepted_total{{policy_id="{pid:#x}"}} {value}')
+        lines += [
+            f"# HELP {ns}_stage_seconds Time spent in each arbitration stage.",
+            f"# TYPE {ns}_stage_seconds histogram",
+        ]
+        for index, stage in enumerate(STAGE_NAMES):
+            buckets = self.stage_buckets[index]
+            top = max((i for i, hits in enumerate(buckets) if hits), default=0)
+            cumulative = 0
+            for i in range(top + 1):
+                cumulative += buckets[i]
+                lines.append(
+                    f'{ns}_stage_seconds_bucket{{stage="{stage}",le="{(1 << i) / 1e9:.9g}"}} {cumulative}'
+                )
+            lines.append(f'{ns}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {self.stage_count[index]}')
+            lines.append(f'{ns}_stage_seconds_sum{{stage="{stage}"}} {self.stage_sum_ns[index] / 1e9:.9g}')
+            lines.append(f'{ns}_stage_seconds_count{{stage="{stage}"}} {self.stage_count[index]}')
+        return "\n".join(lines) + "\n"
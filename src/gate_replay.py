@@ -0,0 +1,464 @@
+"""
+A-FDO Gate capture replay — drive FDOGate with recorded traffic.
+
+Streams DOIP segments out of a capture file through FDOGate.arbitrate and
+reports throughput, per-stage latency percentiles and the verdict mix.
+Captures are memory-mapped and segments are arbitrated in place (offset and
+length into the mapping), so no packet is copied. Supported formats:
+
+- pcap (microsecond or nanosecond timestamps) and pcapng (SHB/IDB/EPB/SPB);
+  link types Ethernet (with 802.1Q tags), raw IPv4/IPv6, and the
+  USER0-USER15 DLTs, whose frames are the segment itself. The UDP or TCP
+  payload of each IP packet is taken as one segment (TCP is not reassembled).
+  Simple Packet Blocks have no timestamp and reuse the previous packet's.
+- fdocap: b"FDOCAP01" followed by records of !QI (capture time in ns,
+  segment length) and the segment bytes.
+
+By default the gate reads a SimulatedClock set to each record's capture
+time, so Stage 2 judges every segment against the instant it was captured
+whatever the replay speed. --speed 1 paces records at their original
+spacing (2 = twice as fast); --speed 0 replays as fast as possible.
+
+    python -m src.gate_replay generate /tmp/gate.pcapng --packets 100000
+    python -m src.gate_replay run /tmp/gate.pcapng --speed 0
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fdo_gate import FDOGate, HEADER_SIZE, ReplayFilter, STAGE_NAMES, VERDICT_NAMES
+from gate_clock import SimulatedClock, system_clock
+from gate_metrics import GateMetrics
+
+FDOCAP_MAGIC = b"FDOCAP01"
+_FDOCAP_RECORD = struct.Struct("!QI")
+
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER = 0x1A2B3C4D
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_USER0 = 147
+LINKTYPE_USER15 = 162
+
+_ETHERTYPE = struct.Struct("!H")
+_IPV4_HEADER = struct.Struct("!BBHHHBBH4s4s")
+_UDP_HEADER = struct.Struct("!HHHH")
+
+CAPTURE_FORMATS = ("pcap", "pcapng", "fdocap")
+
+# Capture time of the first generated record (2026-01-01T00:00:00Z), so the
+# same --seed always writes the same capture.
+GENERATE_EPOCH_NS = 1_767_225_600 * 1_000_000_000
+
+
+def _segment_bounds(buf, start, end, linktype):
+    """(start, end) of the DOIP segment inside one captured frame, or None."""
+    if LINKTYPE_USER0 <= linktype <= LINKTYPE_USER15:
+        return start, end
+    if linktype == LINKTYPE_ETHERNET:
+        pos = start + 12
+        if end - pos < 2:
+            return None
+        ethertype = _ETHERTYPE.unpack_from(buf, pos)[0]
+        pos += 2
+        while ethertype in (0x8100, 0x88A8) and end - pos >= 4:
+            ethertype = _ETHERTYPE.unpack_from(buf, pos + 2)[0]
+            pos += 4
+        if ethertype not in (0x0800, 0x86DD):
+            return None
+        start = pos
+    elif linktype not in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        return None
+
+    if end - start < 20:
+        return None
+    version = buf[start] >> 4
+    if version == 4:
+        header_len = (buf[start] & 0x0F) * 4
+        protocol = buf[start + 9]
+        total = _ETHERTYPE.unpack_from(buf, start + 2)[0]
+        end = min(end, start + total) if total else end
+    elif version == 6 and end - start >= 40:
+        header_len = 40
+        protocol = buf[start + 6]
+        end = min(end, start + 40 + _ETHERTYPE.unpack_from(buf, start + 4)[0])
+    else:
+        return None
+    pos = start + header_len
+    if protocol == 17:
+        pos += 8
+    elif protocol == 6 and end - pos >= 13:
+        pos += (buf[pos + 12] >> 4) * 4
+    else:
+        return None
+    return (pos, end) if pos <= end else None
+
+
+class Capture:
+    """
+    Read-only memory-mapped capture. records() yields (timestamp_ns, start,
+    end) offsets of each segment within self.buffer; frames that carry no
+    UDP/TCP payload are skipped and counted in self.skipped. A pcapng block
+    that is too short for its fields or names an undescribed interface
+    raises ValueError.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.skipped = 0
+        self._file = open(path, "rb")
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        head = self.buffer[:8]
+        if head == FDOCAP_MAGIC:
+            self.format = "fdocap"
+        elif len(head) >= 4 and struct.unpack("<I", head[:4])[0] == PCAPNG_SHB:
+            self.format = "pcapng"
+        elif len(head) >= 4 and {struct.unpack("<I", head[:4])[0], struct.unpack(">I", head[:4])[0]} & {
+            PCAP_MAGIC_US, PCAP_MAGIC_NS
+        }:
+            self.format = "pcap"
+        else:
+            self.close()
+            raise ValueError(f"{path}: not a pcap, pcapng or fdocap capture")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+            self._file.close()
+
+    def records(self):
+        return getattr(self, f"_{self.format}_records")()
+
+    def _fdocap_records(self):
+        buf = self.buffer
+        size = len(buf)
+        pos = len(FDOCAP_MAGIC)
+        unpack_from = _FDOCAP_RECORD.unpack_from
+        while size - pos >= _FDOCAP_RECORD.size:
+            timestamp, length = unpack_from(buf, pos)
+            pos += _FDOCAP_RECORD.size
+            yield timestamp, pos, min(pos + length, size)
+            pos += length
+
+    def _pcap_records(self):
+        buf = self.buffer
+        magic = struct.unpack_from("<I", buf, 0)[0]
+        order = "<" if magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS) else ">"
+        magic = struct.unpack_from(order + "I", buf, 0)[0]
+        scale = 1 if magic == PCAP_MAGIC_NS else 1000
+        linktype = struct.unpack_from(order + "I", buf, 20)[0] & 0x0FFFFFFF
+        record = struct.Struct(order + "IIII")
+        size = len(buf)
+        pos = 24
+        while size - pos >= record.size:
+            seconds, fraction, captured, _ = record.unpack_from(buf, pos)
+            pos += record.size
+            end = min(pos + captured, size)
+            bounds = _segment_bounds(buf, pos, end, linktype)
+            if bounds is None:
+                self.skipped += 1
+            else:
+                yield seconds * 1_000_000_000 + fraction * scale, bounds[0], bounds[1]
+            pos += captured
+
+    def _pcapng_records(self):
+        buf = self.buffer
+        size = len(buf)
+        pos = 0
+        order = "<"
+        interfaces = []
+        # SPBs carry no timestamp; they take the previous packet's.
+        last_ns = 0
+        while size - pos >= 12:
+            block_type = struct.unpack_from(order + "I", buf, pos)[0]
+            if block_type == PCAPNG_SHB:
+                bom = struct.unpack_from("<I", buf, pos + 8)[0]
+                order = "<" if bom == PCAPNG_BYTE_ORDER else ">"
+                interfaces = []
+            block_len = struct.unpack_from(order + "I", buf, pos + 4)[0]
+            if block_len < 12 or pos + block_len > size:
+                break
+            body = pos + 8
+            # Data after the fixed fields runs to the trailing block length.
+            body_end = pos + block_len - 4
+            if block_type == 1:
+                if block_len < 20:
+                    self._malformed(pos, "interface description block too short")
+                linktype = struct.unpack_from(order + "H", buf, body)[0]
+                interfaces.append((linktype, _pcapng_resolution(buf, body + 8, body_end, order)))
+            elif block_type == 6:
+                if block_len < 32:
+                    self._malformed(pos, "enhanced packet block too short")
+                interface, high, low, captured, _ = struct.unpack_from(order + "IIIII", buf, body)
+                if interface >= len(interfaces):
+                    self._malformed(pos, f"packet on interface {interface}, {len(interfaces)} described")
+                linktype, units_per_second = interfaces[interface]
+                start = body + 20
+                bounds = _segment_bounds(buf, start, min(start + captured, body_end), linktype)
+                if bounds is None:
+                    self.skipped += 1
+                else:
+                    last_ns = ((high << 32) | low) * 1_000_000_000 // units_per_second
+                    yield last_ns, bounds[0], bounds[1]
+            elif block_type == 3:
+                if block_len < 16:
+                    self._malformed(pos, "simple packet block too short")
+                if not interfaces:
+                    self._malformed(pos, "simple packet block before any interface description")
+                original = struct.unpack_from(order + "I", buf, body)[0]
+                start = body + 4
+                bounds = _segment_bounds(buf, start, min(start + original, body_end), interfaces[0][0])
+                if bounds is None:
+                    self.skipped += 1
+                else:
+                    yield last_ns, bounds[0], bounds[1]
+            pos += block_len
+
+    def _malformed(self, pos, problem):
+        raise ValueError(f"{self.path}: malformed pcapng block at offset {pos}: {problem}")
+
+
+def _pcapng_resolution(buf, pos, end, order):
+    """Timestamp units per second from an IDB's if_tsresol option (default µs)."""
+    while end - pos >= 4:
+        code, length = struct.unpack_from(order + "HH", buf, pos)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            resolution = buf[pos + 4]
+            if resolution & 0x80:
+                return 1 << (resolution & 0x7F)
+            return 10 ** resolution
+        pos += 4 + ((length + 3) & ~3)
+    return 1_000_000
+
+
+# --- synthetic capture generation -------------------------------------------------
+
+
+def _ipv4_udp_frame(segment, sport=40000, dport=9401):
+    udp_len = 8 + len(segment)
+    ip = bytearray(_IPV4_HEADER.pack(
+        0x45, 0, 20 + udp_len, 0, 0x4000, 64, 17, 0, bytes((10, 0, 0, 1)), bytes((10, 0, 0, 2))
+    ))
+    checksum = sum(struct.unpack("!10H", ip))
+    checksum = (checksum & 0xFFFF) + (checksum >> 16)
+    struct.pack_into("!H", ip, 10, ~checksum & 0xFFFF)
+    ethernet = b"\x02\x00\x00\x00\x00\x02\x02\x00\x00\x00\x00\x01\x08\x00"
+    return ethernet + bytes(ip) + _UDP_HEADER.pack(sport, dport, udp_len, 0) + segment
+
+
+def synthesize_traffic(packets, rate=100000.0, invalid_ratio=0.2, seed=0, start_ns=None,
+                       payload_size=32, policy_file="Policy_Dictionary.json"):
+    """
+    Yield (timestamp_ns, segment) for a synthetic capture: Poisson arrivals
+    at `rate` packets/s, each header stamped with its own capture time.
+    A share `invalid_ratio` of packets is split evenly between corrupted
+    checksums, stale epochs (3 s old), unregistered policies and exact
+    replays of an earlier packet from inside the drift window. Without
+    `start_ns` the capture starts at the current wall-clock time.
+    """
+    rng = random.Random(seed)
+    clock = SimulatedClock()
+    gate = FDOGate(policy_file=policy_file, clock=clock)
+    policies = sorted(gate.msbv_table) or [0x01]
+    now_ns = time.time_ns() if start_ns is None else start_ns
+    recent = []
+    for seq in range(packets):
+        now_ns += int(rng.expovariate(rate) * 1e9)
+        clock.set(now_ns // 1_000_000)
+        payload = struct.pack("!Q", seq) + bytes(max(0, payload_size - 8))
+        kind = rng.randrange(4) if rng.random() < invalid_ratio else None
+        if kind == 3 and recent:
+            segment = rng.choice(recent)
+        elif kind == 1:
+            clock.advance(-3000)
+            segment = gate.create_packet(0xFD01, seq, rng.choice(policies), payload)
+        else:
+            policy_id = 0xFFFF_FF00 | rng.randrange(256) if kind == 2 else rng.choice(policies)
+            segment = gate.create_packet(0xFD01, seq, policy_id, payload)
+            if kind == 0:
+                # Only the header and first two payload bytes are checksummed.
+                segment = bytearray(segment)
+                segment[rng.randrange(min(len(segment), HEADER_SIZE + 2))] ^= 0x01
+                segment = bytes(segment)
+            elif kind is None:
+                recent.append(segment)
+                if len(recent) > 64:
+                    del recent[0]
+        yield now_ns, segment
+
+
+def write_capture(path, records, fmt="pcap"):
+    """Write (timestamp_ns, segment) records as pcap/pcapng (Ethernet/IPv4/UDP) or fdocap."""
+    count = 0
+    with open(path, "wb") as f:
+        if fmt == "fdocap":
+            f.write(FDOCAP_MAGIC)
+            for timestamp, segment in records:
+                f.write(_FDOCAP_RECORD.pack(timestamp, len(segment)) + segment)
+                count += 1
+        elif fmt == "pcap":
+            f.write(struct.pack("<IHHiIII", PCAP_MAGIC_NS, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+            for timestamp, segment in records:
+                frame = _ipv4_udp_frame(segment)
+                seconds, nanos = divmod(timestamp, 1_000_000_000)
+                f.write(struct.pack("<IIII", seconds, nanos, len(frame), len(frame)) + frame)
+                count += 1
+        elif fmt == "pcapng":
+            f.write(struct.pack("<IIIHHqI", PCAPNG_SHB, 28, PCAPNG_BYTE_ORDER, 1, 0, -1, 28))
+            # IDB: Ethernet, nanosecond if_tsresol (option 9 = 9), end of options.
+            f.write(struct.pack("<IIHHIHHB3xHHI", 1, 32, LINKTYPE_ETHERNET, 0, 65535, 9, 1, 9, 0, 0, 32))
+            for timestamp, segment in records:
+                frame = _ipv4_udp_frame(segment)
+                padded = (len(frame) + 3) & ~3
+                block_len = 32 + padded
+                f.write(struct.pack(
+                    "<IIIIIII", 6, block_len, 0, timestamp >> 32, timestamp & 0xFFFFFFFF,
+                    len(frame), len(frame),
+                ))
+                f.write(frame + bytes(padded - len(frame)) + struct.pack("<I", block_len))
+                count += 1
+        else:
+            raise ValueError(f"unknown capture format {fmt!r}")
+    return count
+
+
+# --- replay -------------------------------------------------------------------------
+
+
+def replay(capture, gate, clock=None, speed=0.0, limit=None):
+    """
+    Arbitrate every segment of `capture` in order. When `clock` is a
+    SimulatedClock it is set to each record's capture time first; `speed`
+    > 0 paces records at their recorded spacing divided by `speed`.
+    Returns a report dict (see module docstring).
+    """
+    buf = capture.buffer
+    arbitrate = gate.arbitrate
+    set_clock = clock.set if isinstance(clock, SimulatedClock) else None
+    verdicts = [0] * len(VERDICT_NAMES)
+    packets = 0
+    total_bytes = 0
+    first_ts = last_ts = None
+    perf_counter = time.perf_counter
+    sleep = time.sleep
+    started = perf_counter()
+    for timestamp, start, end in capture.records():
+        if first_ts is None:
+            first_ts = timestamp
+        last_ts = timestamp
+        if speed:
+            lag = (timestamp - first_ts) / 1e9 / speed - (perf_counter() - started)
+            if lag > 0.0002:
+                sleep(lag)
+        if set_clock is not None:
+            set_clock(timestamp // 1_000_000)
+        verdicts[arbitrate(buf, start, end - start)] += 1
+        packets += 1
+        total_bytes += end - start
+        if limit is not None and packets >= limit:
+            break
+    elapsed = perf_counter() - started
+
+    span = (last_ts - first_ts) / 1e9 if packets else 0.0
+    report = {
+        "capture": capture.path,
+        "format": capture.format,
+        "packets": packets,
+        "skipped_frames": capture.skipped,
+        "bytes": total_bytes,
+        "elapsed_s": round(elapsed, 4),
+        "packets_per_sec": round(packets / elapsed, 1) if elapsed else 0.0,
+        "mbit_per_sec": round(total_bytes * 8 / elapsed / 1e6, 2) if elapsed else 0.0,
+        "capture_span_s": round(span, 4),
+        "speedup": round(span / elapsed, 2) if elapsed else 0.0,
+        "verdicts": dict(zip(VERDICT_NAMES, verdicts)),
+    }
+    metrics = gate.metrics
+    if metrics is not None:
+        report["stage_latency_ns"] = {
+            name: {
+                "p50": metrics.percentile(index, 0.50),
+                "p90": metrics.percentile(index, 0.90),
+                "p99": metrics.percentile(index, 0.99),
+                "count": metrics.stage_count[index],
+            }
+            for index, name in enumerate(STAGE_NAMES)
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="A-FDO Gate capture replay harness")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="write a synthetic capture")
+    generate.add_argument("path")
+    generate.add_argument("--format", choices=CAPTURE_FORMATS, help="default: from the file extension")
+    generate.add_argument("--packets", type=int, default=100000)
+    generate.add_argument("--rate", type=float, default=100000.0, help="mean packets/sec in capture time")
+    generate.add_argument("--invalid-ratio", type=float, default=0.2)
+    generate.add_argument("--payload-size", type=int, default=32)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--start-ns", type=int, default=GENERATE_EPOCH_NS,
+                          help="capture time of the first record (default: 2026-01-01T00:00:00Z)")
+
+    run = commands.add_parser("run", help="replay a capture through FDOGate")
+    run.add_argument("path")
+    run.add_argument("--speed", type=float, default=0.0,
+                     help="1 = original timing, N = N times faster, 0 = as fast as possible")
+    run.add_argument("--clock", choices=("capture", "wall"), default="capture",
+                     help="epoch source for Stage 2: record timestamps or the wall clock")
+    run.add_argument("--policy-file", default="Policy_Dictionary.json")
+    run.add_argument("--replay-filter", action="store_true")
+    run.add_argument("--no-metrics", action="store_true", help="skip stage timing (raw throughput)")
+    run.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        fmt = args.format or os.path.splitext(args.path)[1].lstrip(".")
+        if fmt not in CAPTURE_FORMATS:
+            parser.error("cannot infer --format from the file extension")
+        records = synthesize_traffic(
+            args.packets, args.rate, args.invalid_ratio, args.seed, args.start_ns,
+            payload_size=args.payload_size,
+        )
+        count = write_capture(args.path, records, fmt)
+        print(json.dumps({"path": args.path, "format": fmt, "packets": count}))
+        return
+
+    clock = SimulatedClock(0) if args.clock == "capture" else system_clock
+    gate = FDOGate(
+        policy_file=args.policy_file,
+        replay_filter=ReplayFilter() if args.replay_filter else None,
+        metrics=None if args.no_metrics else GateMetrics(),
+        clock=clock,
+    )
+    with Capture(args.path) as capture:
+        report = replay(capture, gate, clock, args.speed, args.limit)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+A-FDO Gate — multi-core sharded execution.
+
+Spreads packets across N worker processes, each running its own FDOGate,
+hashed on I/O fingerprint or unmasked policy ID. Packets never cross a pipe:
+the coordinator writes each shard's batch into that worker's
+multiprocessing.shared_memory ring as one record
+
+    [offsets (n+1) x u32 little-endian][packet bytes]
+
+and sends only (position, n, data_length, epoch) as a control message. The
+epoch is read once per batch from the coordinator's clock, so every shard
+judges Stage 2 against the same instant (and simulated clocks work). The worker
+validates the record in place with validate_batch and overwrites the first
+n bytes of the record with its verdict codes, so results also come back in
+bulk through shared memory. Only the first 18 bytes of a packet (header plus
+the two payload bytes folded into the checksum) decide its verdict, so that
+is all that is copied into the ring.
+
+Routing is vectorized: the coordinator gathers every packet's significant
+bytes into one N x 18 array, computes all shard keys as array operations,
+and builds each ring record with a single fancy-indexed copy. Its cost per
+packet is a few array passes, not a Python loop iteration, so it stays well
+below what the workers spend validating.
+
+Atomic Epoch Switch across workers is two-phase: the new MsBV table is first
+staged as a shadow table in every worker, then a single generation word in a
+shared control block is bumped. Every worker compares that word before each
+batch, so all shards move to the new table at the same instant.
+"""
+
+import collections
+import multiprocessing
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+try:
+    from fdo_gate import FDOGate, HEADER_SIZE, MsBVTable
+    from gate_clock import system_clock
+except ImportError:  # imported as src.gate_shard
+    from .fdo_gate import FDOGate, HEADER_SIZE, MsBVTable
+    from .gate_clock import system_clock
+
+# Header plus the two payload bytes that feed the folded checksum.
+SIGNIFICANT_BYTES = HEADER_SIZE + 2
+DEFAULT_RING_BYTES = 1 << 20
+DEFAULT_CHUNK = 4096
+
+_GENERATION = struct.Struct("<Q")
+_OFFSET = 4
+_SPAN = np.arange(SIGNIFICANT_BYTES, dtype=np.int64)
+
+
+def _words(heads, at):
+    """Big-endian u32 at byte `at` of every row of an N x 18 uint8 array."""
+    w = heads[:, at:at + 4].astype(np.uint32)
+    return (w[:, 0] << 24) | (w[:, 1] << 16) | (w[:, 2] << 8) | w[:, 3]
+
+
+def shard_by_fingerprint(heads, lengths, shards):
+    keys = _words(heads, 6) % shards
+    keys[lengths < HEADER_SIZE] = 0
+    return keys
+
+
+def shard_by_policy(heads, lengths, shards):
+    keys = (_words(heads, 10) ^ _words(heads, 2)) % shards
+    keys[lengths < HEADER_SIZE] = 0
+    return keys
+
+
+SHARD_KEYS = {"fingerprint": shard_by_fingerprint, "policy": shard_by_policy}
+
+
+def _significant_bytes(packets, offsets):
+    """
+    (N x 18 uint8 array of each packet's leading bytes, int64 lengths) for a
+    list of packets or a buffer split by offsets. Bytes past a packet's end
+    are filler; callers mask them by length. A list is gathered 18 bytes
+    per packet, so payloads are never copied.
+    """
+    if offsets is None:
+        lengths = np.fromiter(map(len, packets), dtype=np.int64, count=len(packets))
+        data = np.frombuffer(b"".join([packet[:SIGNIFICANT_BYTES] for packet in packets]), dtype=np.uint8)
+        starts = np.zeros(len(lengths), dtype=np.int64)
+        np.cumsum(np.minimum(lengths[:-1], SIGNIFICANT_BYTES), out=starts[1:])
+    else:
+        bounds = np.asarray(offsets, dtype=np.int64)
+        data = np.frombuffer(packets, dtype=np.uint8)
+        starts = bounds[:-1]
+        lengths = bounds[1:] - starts
+    if not len(data):
+        return np.zeros((len(lengths), SIGNIFICANT_BYTES), dtype=np.uint8), lengths
+    return data[np.minimum(starts[:, None] + _SPAN, len(data) - 1)], lengths
+
+
+def _worker_main(conn, ring_name, control_name, policy_file, replay_filter):
+    ring = shared_memory.SharedMemory(name=ring_name)
+    control = shared_memory.SharedMemory(name=control_name)
+    gate = FDOGate(policy_file=policy_file, replay_filter=replay_filter)
+    generation = 0
+    shadow = {}
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            if message[0] == "prepare":
+                _, staged_generation, staged_table = message
+                shadow[staged_generation] = staged_table
+                conn.send(("ready", staged_generation))
+                continue
+
+            _, pos, count, data_length, current_epoch = message
+            current = _GENERATION.unpack_from(control.buf, 0)[0]
+            if current != generation:
+                gate.atomic_epoch_switch(shadow[current])
+                shadow = {g: t for g, t in shadow.items() if g > current}
+                generation = current
+
+            buf = ring.buf
+            data_start = pos + _OFFSET * (count + 1)
+            offsets = struct.unpack_from(f"<{count + 1}I", buf, pos)
+            with buf[data_start:data_start + data_length] as data:
+                verdicts = gate._validate_batch(data, offsets, current_epoch)
+            buf[pos:pos + count] = verdicts
+            conn.send(("done", pos))
+    finally:
+        ring.close()
+        control.close()
+        conn.close()
+
+
+class _Shard:
+    def __init__(self, ring, conn, process):
+        self.ring = ring
+        self.conn = conn
+        self.process = process
+        self.write_pos = 0
+        self.inflight = collections.deque()
+
+    def reserve(self, size):
+        """Return a ring position with `size` free bytes, or None if full."""
+        capacity = self.ring.size
+        if not self.inflight:
+            self.write_pos = 0
+            return 0 if size <= capacity else None
+        # Strict comparisons keep tail != head while records are in flight,
+        # so tail < head always means the ring has wrapped.
+        head = self.inflight[0][0]
+        tail = self.write_pos
+        if tail > head:
+            if tail + size <= capacity:
+                return tail
+            return 0 if size < head else None
+        return tail if tail + size < head else None
+
+
+class ShardedGate:
+    """
+    FDOGate fanned out over worker processes. validate_batch mirrors
+    FDOGate.validate_batch (same inputs, same verdict codes, same order);
+    atomic_epoch_switch swaps the MsBV table in every worker at once.
+    Use as a context manager or call close() to stop workers and unlink
+    shared memory. A replay_filter is copied into every worker; shard on
+    fingerprint so duplicates of a header always reach the same filter.
+    `clock` stays in the coordinator and is read once per validate_batch.
+    """
+
+    def __init__(self, workers=None, shard_key="fingerprint", policy_file="Policy_Dictionary.json",
+                 ring_bytes=DEFAULT_RING_BYTES, chunk=DEFAULT_CHUNK, mp_context=None,
+                 replay_filter=None, clock=None):
+        ctx = mp_context or multiprocessing.get_context()
+        self.clock = clock or system_clock
+        self.workers = workers or multiprocessing.cpu_count()
+        self.shard_key = SHARD_KEYS[shard_key]
+        self.chunk = max(1, min(chunk, ring_bytes // (SIGNIFICANT_BYTES + 2 * _OFFSET)))
+        self.generation = 0
+        self._control = shared_memory.SharedMemory(create=True, size=_GENERATION.size)
+        _GENERATION.pack_into(self._control.buf, 0, 0)
+        self._shards = []
+        for _ in range(self.workers):
+            ring = shared_memory.SharedMemory(create=True, size=ring_bytes)
+            parent, child = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker_main,
+                args=(child, ring.name, self._control.name, policy_file, replay_filter),
+                daemon=True,
+            )
+            process.start()
+            child.close()
+            self._shards.append(_Shard(ring, parent, process))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def validate_batch(self, packets, offsets=None):
+        """Shard, validate in parallel, and return verdicts in input order."""
+        current_epoch = self.clock()
+        heads, lengths = _significant_bytes(packets, offsets)
+        total = len(lengths)
+        verdicts = bytearray(total)
+        if not total:
+            return verdicts
+        head_lengths = np.minimum(lengths, SIGNIFICANT_BYTES)
+        keep = _SPAN < head_lengths[:, None]
+        shard_ids = self.shard_key(heads, lengths, self.workers)
+        order = np.argsort(shard_ids, kind="stable")
+        lo = 0
+        for shard, count in zip(self._shards, np.bincount(shard_ids, minlength=self.workers).tolist()):
+            routed = order[lo:lo + count]
+            lo += count
+            for first in range(0, count, self.chunk):
+                indices = routed[first:first + self.chunk]
+                bounds = np.zeros(len(indices) + 1, dtype="<u4")
+                np.cumsum(head_lengths[indices], out=bounds[1:])
+                self._dispatch(shard, indices, bounds, heads[indices][keep[indices]], verdicts, current_epoch)
+        for shard in self._shards:
+            while shard.inflight:
+                self._collect(shard, verdicts)
+        return verdicts
+
+    def _dispatch(self, shard, indices, bounds, data, verdicts, current_epoch):
+        count = len(indices)
+        data_start = _OFFSET * (count + 1)
+        size = data_start + len(data)
+        start = shard.reserve(size)
+        while start is None:
+            self._collect(shard, verdicts)
+            start = shard.reserve(size)
+        buf = shard.ring.buf
+        buf[start:start + data_start] = bounds.tobytes()
+        buf[start + data_start:start + size] = data.tobytes()
+        shard.inflight.append((start, indices))
+        shard.write_pos = start + size
+        shard.conn.send(("batch", start, count, len(data), current_epoch))
+
+    def _collect(self, shard, verdicts):
+        _, pos = shard.conn.recv()
+        start, indices = shard.inflight.popleft()
+        result = np.frombuffer(shard.ring.buf, dtype=np.uint8, count=len(indices), offset=pos)
+        np.frombuffer(verdicts, dtype=np.uint8)[indices] = result
+        del result  # release the export of ring.buf before the ring can be closed
+
+    def atomic_epoch_switch(self, new_epoch_config=None):
+        """
+        Stage new_epoch_config as the shadow table in every worker, then
+        publish it with a single shared generation write so all shards swap
+        on their next batch simultaneously.
+        """
+        if new_epoch_config is None:
+            return
+        table = MsBVTable.from_mapping(new_epoch_config)
+        staged = self.generation + 1
+        for shard in self._shards:
+            shard.conn.send(("prepare", staged, table))
+        for shard in self._shards:
+            shard.conn.recv()
+        _GENERATION.pack_into(self._control.buf, 0, staged)
+        self.generation = staged
+
+    def close(self):
+        for shard in self._shards:
+            try:
+                shard.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for shard in self._shards:
+            shard.process.join(timeout=5)
+            shard.conn.close()
+            shard.ring.close()
+            shard.ring.unlink()
+        self._shards = []
+        if self._control is not None:
+            self._control.close()
+            self._control.unlink()
+            self._control = None
+
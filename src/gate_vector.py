@@ -0,0 +1,286 @@
+"""
+A-FDO Gate — NumPy-vectorized header engine.
+
+Decodes N×16-byte governance headers through a big-endian structured dtype
+(!HIIIH) and evaluates the three-stage pipeline (Folded Checksum, Epoch Sync,
+PE-MsBV Lookup) as whole-array operations. Verdict codes are the VERDICT_*
+constants of fdo_gate, and decisions match FDOGate.validate_batch exactly.
+"""
+
+import numpy as np
+
+try:
+    from fdo_gate import (
+        DEFAULT_FINGERPRINT,
+        EPOCH_DRIFT_MS,
+        HEADER_SIZE,
+        VERDICT_CHECKSUM_MISMATCH,
+        VERDICT_EPOCH_EXPIRED,
+        VERDICT_FORWARDED,
+        VERDICT_POLICY_REJECTED,
+        VERDICT_REPLAYED,
+        VERDICT_TOO_SHORT,
+    )
+    from gate_clock import system_clock
+except ImportError:  # imported as src.gate_vector
+    from .fdo_gate import (
+        DEFAULT_FINGERPRINT,
+        EPOCH_DRIFT_MS,
+        HEADER_SIZE,
+        VERDICT_CHECKSUM_MISMATCH,
+        VERDICT_EPOCH_EXPIRED,
+        VERDICT_FORWARDED,
+        VERDICT_POLICY_REJECTED,
+        VERDICT_REPLAYED,
+        VERDICT_TOO_SHORT,
+    )
+    from .gate_clock import system_clock
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", ">u2"),
+        ("epoch", ">u4"),
+        ("fingerprint", ">u4"),
+        ("masked_policy_id", ">u4"),
+        ("rlcp_checksum", ">u2"),
+    ]
+)
+_HEADER_SPAN = np.arange(HEADER_SIZE, dtype=np.int64)
+
+
+def decode_headers(headers):
+    """
+    View an N×16 uint8 array (or a bytes-like of N*16 bytes) as HEADER_DTYPE
+    records without copying, and return the decoded fields as native-endian
+    arrays: magic, epoch, fingerprint, masked_policy_id, policy_id,
+    rlcp_flags, checksum (plus the structured records as "raw").
+    """
+    if not isinstance(headers, np.ndarray):
+        headers = np.frombuffer(headers, dtype=np.uint8)
+    records = np.ascontiguousarray(headers, dtype=np.uint8).reshape(-1).view(HEADER_DTYPE)
+    epoch = records["epoch"].astype(np.uint32)
+    masked_policy_id = records["masked_policy_id"].astype(np.uint32)
+    rlcp_checksum = records["rlcp_checksum"].astype(np.uint16)
+    return {
+        "magic": records["magic"].astype(np.uint16),
+        "epoch": epoch,
+        "fingerprint": records["fingerprint"].astype(np.uint32),
+        "masked_policy_id": masked_policy_id,
+        "policy_id": masked_policy_id ^ epoch,
+        "rlcp_flags": rlcp_checksum >> 12,
+        "checksum": rlcp_checksum & 0xFFF,
+        "raw": records,
+    }
+
+
+def folded_checksums(fields, payload_heads=None):
+    """
+    Vectorized calculate_folded_checksum. `payload_heads` holds the 16-bit
+    value folded in for each packet (first two payload bytes big-endian,
+    a lone byte shifted left by 8, or 0 for an empty payload).
+    """
+    epoch = fields["epoch"]
+    fingerprint = fields["fingerprint"]
+    masked_policy_id = fields["masked_policy_id"]
+    xor_sum = (
+        fields["magic"].astype(np.uint32)
+        ^ (epoch >> 16) ^ (epoch & 0xFFFF)
+        ^ (fingerprint >> 16) ^ (fingerprint & 0xFFFF)
+        ^ (masked_policy_id >> 16) ^ (masked_policy_id & 0xFFFF)
+        ^ (fields["rlcp_flags"].astype(np.uint32) << 12)
+    )
+    if payload_heads is not None:
+        xor_sum ^= payload_heads.astype(np.uint32)
+    return (xor_sum & 0xFFF).astype(np.uint16)
+
+
+def epoch_drift(epochs, current_epoch):
+    """Signed wrap-around drift (ms) between current_epoch and each header epoch."""
+    return (np.uint32(current_epoch & 0xFFFFFFFF) - epochs).view(np.int32)
+
+
+def policy_keys(msbv_table):
+    """Sorted uint32 array of registered policy IDs for vectorized lookup."""
+    return np.fromiter(sorted(msbv_table), dtype=np.uint32, count=len(msbv_table))
+
+
+def policy_registered(policy_ids, msbv_table):
+    """
+    Stage 3 over an array of unmasked policy IDs. Compiled tables (MsBVTable
+    or a mapped snapshot) are answered by gathering from their dense action
+    array; anything else falls back to a sorted-key membership test.
+    """
+    if getattr(msbv_table, "actions", None) is not None and not msbv_table.overflow_actions:
+        dense = np.frombuffer(msbv_table.actions, dtype=np.uint8)
+        if len(dense) == 0:
+            return np.zeros(len(policy_ids), dtype=bool)
+        in_range = policy_ids < len(dense)
+        return in_range & (dense[np.where(in_range, policy_ids, 0)] != 0)
+    keys = msbv_table if isinstance(msbv_table, np.ndarray) else policy_keys(msbv_table)
+    return np.isin(policy_ids, keys, assume_unique=True)
+
+
+def validate_headers(headers, payload_heads, msbv_table, current_epoch=None, replay_filter=None):
+    """
+    Run all three stages over N headers at once. Returns a uint8 array of
+    verdict codes; the first failing stage wins, as in validate_segment.
+    A ReplayFilter, being stateful, is consulted in input order only for
+    headers that pass Stages 1 and 2.
+    """
+    if current_epoch is None:
+        current_epoch = system_clock()
+    fields = decode_headers(headers)
+    checksum_ok = folded_checksums(fields, payload_heads) == fields["checksum"]
+    drift = epoch_drift(fields["epoch"], current_epoch)
+    epoch_ok = (drift <= EPOCH_DRIFT_MS) & (drift >= -EPOCH_DRIFT_MS)
+    policy_ok = policy_registered(fields["policy_id"], msbv_table)
+
+    verdicts = np.full(len(checksum_ok), VERDICT_FORWARDED, dtype=np.uint8)
+    verdicts[~policy_ok] = VERDICT_POLICY_REJECTED
+    verdicts[~epoch_ok] = VERDICT_EPOCH_EXPIRED
+    verdicts[~checksum_ok] = VERDICT_CHECKSUM_MISMATCH
+    if replay_filter is not None:
+        seen = replay_filter.seen
+        candidates = np.flatnonzero(checksum_ok & epoch_ok)
+        raw = fields["raw"]
+        for i, epoch, fingerprint, masked_policy_id, rlcp_checksum in zip(
+            candidates.tolist(),
+            raw["epoch"][candidates].tolist(),
+            raw["fingerprint"][candidates].tolist(),
+            raw["masked_policy_id"][candidates].tolist(),
+            raw["rlcp_checksum"][candidates].tolist(),
+        ):
+            if seen(epoch, fingerprint, masked_policy_id, rlcp_checksum):
+                verdicts[i] = VERDICT_REPLAYED
+    return verdicts
+
+
+def gather_segments(buffer, offsets):
+    """
+    Gather headers and payload heads from one contiguous buffer holding
+    packets at offsets[i]:offsets[i+1]. Returns (headers N×16 uint8,
+    payload_heads uint16, too_short bool mask). Short packets get a zeroed
+    header row and are flagged in the mask. Offsets that are negative,
+    decreasing or past the end of the buffer raise ValueError.
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    bounds = np.asarray(offsets, dtype=np.int64)
+    if len(bounds):
+        if bounds[0] < 0:
+            raise ValueError(f"offsets start at {bounds[0]}, before the buffer")
+        if bounds[-1] > len(data):
+            raise ValueError(f"offsets end at {bounds[-1]}, past the {len(data)}-byte buffer")
+        if np.any(bounds[1:] < bounds[:-1]):
+            raise ValueError("offsets must not decrease")
+    starts = bounds[:-1]
+    lengths = bounds[1:] - starts
+    too_short = lengths < HEADER_SIZE
+    if len(data) < HEADER_SIZE:
+        empty = np.zeros(len(starts), dtype=np.uint16)
+        return np.zeros((len(starts), HEADER_SIZE), dtype=np.uint8), empty, too_short
+
+    starts = np.where(too_short, 0, starts)
+    headers = data[starts[:, None] + _HEADER_SPAN]
+    headers[too_short] = 0
+
+    last = len(data) - 1
+    payload_len = lengths - HEADER_SIZE
+    head0 = data[np.minimum(starts + HEADER_SIZE, last)].astype(np.uint16)
+    head1 = data[np.minimum(starts + HEADER_SIZE + 1, last)].astype(np.uint16)
+    payload_heads = np.where(payload_len >= 1, head0 << 8, 0) | np.where(payload_len >= 2, head1, 0)
+    payload_heads = payload_heads.astype(np.uint16)
+    return headers, payload_heads, too_short
+
+
+def validate_buffer(gate, buffer, offsets, current_epoch=None):
+    """
+    Vectorized counterpart of FDOGate.validate_batch for a contiguous buffer.
+    Reads gate.msbv_table once (and gate.clock once, unless current_epoch
+    is given) and returns one verdict code per packet.
+    """
+    if current_epoch is None:
+        current_epoch = gate.clock()
+    headers, payload_heads, too_short = gather_segments(buffer, offsets)
+    verdicts = np.full(len(too_short), VERDICT_TOO_SHORT, dtype=np.uint8)
+    complete = ~too_short
+    verdicts[complete] = validate_headers(
+        headers[complete], payload_heads[complete], gate.msbv_table, current_epoch,
+        gate.replay_filter,
+    )
+    return verdicts
+
+
+def _payload_blob(payloads, count):
+    """(uint8 blob, int64 lengths) for one shared payload or one payload per packet."""
+    if isinstance(payloads, (bytes, bytearray, memoryview)):
+        body = np.frombuffer(payloads, dtype=np.uint8)
+        return np.tile(body, count), np.full(count, len(body), dtype=np.int64)
+    if len(payloads) != count:
+        raise ValueError(f"expected {count} payloads, got {len(payloads)}")
+    lengths = np.fromiter((len(p) for p in payloads), dtype=np.int64, count=count)
+    return np.frombuffer(b"".join(payloads), dtype=np.uint8), lengths
+
+
+def build_packets(policy_ids, magic=0xFD01, payloads=b"", fingerprints=None, rlcp_flags=0,
+                  sequences=None, epoch=None, out=None):
+    """
+    Vectorized FDOGate.create_packets. Scalars broadcast; arrays give one
+    value per packet. Fields are masked and checksummed as whole arrays,
+    written through HEADER_DTYPE into a single uint8 buffer, and payloads
+    are scattered in with one fancy-index assignment. `out` may be any
+    writable buffer (uint8 ndarray, bytearray, mmap, ...) of at least
+    offsets[-1] bytes; the packets are written into its start. Default
+    fingerprints are 0xDEADBEEF ^ sequence, as in create_packet. Returns
+    (buffer, offsets) in the validate_batch layout, where buffer is a uint8
+    array (viewing `out` when given).
+    """
+    policy_ids = np.asarray(policy_ids, dtype=np.uint32)
+    count = len(policy_ids)
+    if epoch is None:
+        epoch = system_clock()
+    if fingerprints is None:
+        if sequences is None:
+            sequences = np.arange(count, dtype=np.uint32)
+        fingerprints = np.uint32(DEFAULT_FINGERPRINT) ^ np.asarray(sequences, dtype=np.uint32)
+    fields = {
+        "magic": np.broadcast_to(np.asarray(magic, dtype=np.uint16), count),
+        "epoch": np.full(count, epoch & 0xFFFFFFFF, dtype=np.uint32),
+        "fingerprint": np.broadcast_to(np.asarray(fingerprints, dtype=np.uint32), count),
+        "masked_policy_id": policy_ids ^ np.uint32(epoch & 0xFFFFFFFF),
+        "rlcp_flags": np.broadcast_to(np.asarray(rlcp_flags, dtype=np.uint16), count),
+    }
+
+    blob, lengths = _payload_blob(payloads, count)
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(lengths + HEADER_SIZE, out=offsets[1:])
+    body_starts = np.zeros(count, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=body_starts[1:])
+    last = max(len(blob) - 1, 0)
+    if len(blob):
+        head0 = blob[np.minimum(body_starts, last)].astype(np.uint16)
+        head1 = blob[np.minimum(body_starts + 1, last)].astype(np.uint16)
+        payload_heads = np.where(lengths >= 1, head0 << 8, 0) | np.where(lengths >= 2, head1, 0)
+    else:
+        payload_heads = np.zeros(count, dtype=np.uint16)
+
+    records = np.empty(count, dtype=HEADER_DTYPE)
+    records["magic"] = fields["magic"]
+    records["epoch"] = fields["epoch"]
+    records["fingerprint"] = fields["fingerprint"]
+    records["masked_policy_id"] = fields["masked_policy_id"]
+    records["rlcp_checksum"] = (fields["rlcp_flags"] << 12) | folded_checksums(fields, payload_heads)
+
+    if out is None:
+        buffer = np.zeros(int(offsets[-1]), dtype=np.uint8)
+    else:
+        buffer = out if isinstance(out, np.ndarray) else np.frombuffer(out, dtype=np.uint8)
+        if buffer.dtype != np.uint8 or buffer.ndim != 1:
+            raise TypeError("out must be a flat uint8 buffer")
+        if len(buffer) < offsets[-1]:
+            raise ValueError(f"out holds {len(buffer)} bytes, the packets need {int(offsets[-1])}")
+    headers = records.view(np.uint8).reshape(count, HEADER_SIZE)
+    buffer[offsets[:-1, None] + _HEADER_SPAN] = headers
+    if len(blob):
+        shift = np.repeat(offsets[:-1] + HEADER_SIZE - body_starts, lengths)
+        buffer[shift + np.arange(len(blob), dtype=np.int64)] = blob
+    return buffer, offsets
@@ -1,96 +1,410 @@
-import sys
-import json
-import logging
+"""
+FDO Gate MCP server — JSON-RPC 2.0 over stdio, one message per line.
+
+Requests are read with asyncio streams and never wait on each other:
+initialize and tools/list are answered inline, while tools/call requests
+that arrive together are grouped into one job for a worker pool (threads by
+default, or processes with --pool process for CPU-bound gate work). Each job
+returns encoded response lines, so responses go out in completion order
+(clients match them by id). All responses ready in one loop pass are written
+with one write, and reading pauses while too many jobs are in flight.
+send_message and read_message remain as blocking one-message helpers over
+the same line encoding, for scripts that drive the protocol by hand.
+
+With --transport binary the same stdio pipe carries length-prefixed frames
+instead of lines: an 8-byte header (JSON length, attachment length; both
+unsigned 32-bit big-endian), the JSON-RPC message, then raw attachment
+bytes. Tools take their packets from the request's attachment and return
+bulk results (verdict bytes, built packets) in the response's attachment,
+so large batches skip hex/base64 conversion and JSON string escaping.
+A frame (or, on the lines transport, a line) larger than --max-frame-size
+(64 MiB by default) closes the session.
+
+Agents spawn one server per session, so startup is kept off the handshake
+path: importing this module loads no json, threading, asyncio, worker-pool,
+logging, base64 or fdo_gate code and builds no gate, and main() reads a stdio
+session's few options off argv without argparse. It answers initialize and
+tools/list from pre-serialized bytes straight off the stdio file
+descriptors, then a background thread parses the command line, loads the
+runtime and compiles the gate; the first tools/call is served by the full
+asyncio server. Message JSON switches from the json module's C codec to
+fast_json (orjson where installed) in that same thread. Spawned as
+`python -m mcp_server` (from src/), the server also skips compiling this
+file, which Python never caches as bytecode when it runs as a script.
+scripts/test_mcp_startup.py holds the import-time and time-to-initialize
+budgets for both spawns.
+
+With --listen PATH the server instead stays resident on a Unix domain
+socket and serves any number of concurrent sessions, each with its own
+pipelined loop and flow control. With the default thread pool they share
+one gate: the policy table is compiled once and, with --replay-filter,
+every session feeds the same replay cache (calls run concurrently; only the
+cache's test-and-set is locked). With --pool process each worker process
+builds its own gate and compiles the table itself (a compiled snapshot is
+mapped, so its pages are shared), and --replay-filter is rejected because
+the cache cannot span processes. Stdio-only MCP clients spawn
+`mcp_server.py --connect PATH`, a byte relay that loads neither asyncio nor
+the gate.
+"""
+
+import _thread
 import os
+import struct
+import sys
+
+# logging's level numbers, so the hot paths need not import it.
+_DEBUG, _INFO, _WARNING = 10, 20, 30
+
+
+class _LazyLogger:
+    """Stand-in for logging.getLogger(name) that imports logging on first use."""
+
+    def __init__(self, name):
+        self._name = name
+        self._logger = None
+
+    def __getattr__(self, attr):
+        if self._logger is None:
+            import logging
+
+            self._logger = logging.getLogger(self._name)
+        return getattr(self._logger, attr)
+
+
+# Logging goes through a queue to a background writer (see setup_logging);
+# nothing is configured, or even imported, at import time.
+logger = _LazyLogger("fdo_gate.mcp")
+verdict_logger = _LazyLogger("fdo_gate.mcp.verdicts")
+
+POLICY_FILE = "Policy_Dictionary.json"
+_gate = None
+_gate_lock = _thread.allocate_lock()
+_gate_options = {"policy_file": POLICY_FILE, "replay_filter": False}
+
 
-# Add current directory to sys.path to ensure we can import fdo_gate
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+def _unserializable(obj):
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
-from fdo_gate import FDOGate
 
-# Setup logging
-logging.basicConfig(filename='mcp_server.log', level=logging.DEBUG)
+class _ScanContext:
+    """The json.JSONDecoder defaults that _json.make_scanner reads."""
 
-# Initialize FDOGate
-# Note: The current implementation of FDOGate uses a hardcoded msbv_table and ignores the policy_file arg,
-# but we pass it for consistency.
-gate = FDOGate(policy_file="Policy_Dictionary.json")
+    strict = True
+    object_hook = object_pairs_hook = None
+    parse_float, parse_int = float, int
+    parse_constant = {"NaN": float("nan"), "Infinity": float("inf"), "-Infinity": float("-inf")}.__getitem__
 
-def read_message():
-    """Read a JSON-RPC message from stdin."""
+
+def _stdlib_codec():
+    """
+    (dumps, loads) on the json module's C scanner and encoder, called
+    directly: the same output as json.dumps(separators=(",", ":"),
+    ensure_ascii=False) and json.loads, without importing json (and re,
+    enum, ... behind it) onto the handshake path.
+    """
     try:
-        line = sys.stdin.readline()
-        if not line:
-            return None
-        return json.loads(line)
-    except Exception as e:
-        logging.error(f"Error reading message: {e}")
-        return None
+        from _json import encode_basestring, make_encoder, make_scanner
+    except ImportError:  # no C accelerator: the json module proper
+        import json
 
-def send_message(msg):
-    """Send a JSON-RPC message to stdout."""
-    json.dump(msg, sys.stdout)
-    sys.stdout.write('\n')
-    sys.stdout.flush()
+        encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+        return (lambda obj: encode(obj).encode()), json.loads
 
-def handle_initialize(request_id):
-    return {
-        "jsonrpc": "2.0",
-        "id": request_id,
-        "result": {
-            "protocolVersion": "2024-11-05",
-            "capabilities": {
-                "tools": {}
+    encode = make_encoder(None, _unserializable, encode_basestring, None, ":", ",", False, False, True)
+    scan = make_scanner(_ScanContext())
+
+    def dumps(obj):
+        return "".join(encode(obj, 0)).encode()
+
+    def loads(data):
+        text = (data if isinstance(data, str) else bytes(data).decode()).strip(" \t\n\r")
+        try:
+            obj, end = scan(text, 0)
+        except StopIteration as e:
+            raise ValueError(f"Expecting value: char {e.value}") from None
+        if end != len(text):
+            raise ValueError(f"Extra data: char {end}")
+        return obj
+
+    return dumps, loads
+
+
+# Message JSON codec. The stdlib's C codec serves import time and the
+# handshake; use_fast_json() swaps in fast_json (orjson where installed) once
+# the runtime loads, keeping its import off the spawn-to-initialize path.
+_dumps, _loads = _stdlib_codec()
+
+
+def use_fast_json():
+    """Encode and decode messages with the fast_json backend from now on."""
+    global _dumps, _loads
+    try:
+        import fast_json
+    except ImportError:  # imported as src.mcp_server
+        from . import fast_json
+
+    _dumps, _loads = fast_json.dumps, fast_json.loads
+
+
+def configure_gate(policy_file=POLICY_FILE, replay_filter=False):
+    """Set how get_gate() builds the shared gate; call before its first use."""
+    _gate_options.update(policy_file=policy_file, replay_filter=replay_filter)
+
+
+def _import_fdo_gate():
+    try:
+        import fdo_gate
+    except ImportError:  # imported as src.mcp_server
+        from . import fdo_gate
+    return fdo_gate
+
+
+def get_gate():
+    """The shared FDOGate; fdo_gate is imported and the PE-MsBV table compiled on first use."""
+    global _gate
+    if _gate is None:
+        with _gate_lock:
+            if _gate is None:
+                fdo_gate = _import_fdo_gate()
+                _gate = fdo_gate.FDOGate(
+                    policy_file=_gate_options["policy_file"],
+                    # Worker threads share the gate: lock the cache's test-and-set.
+                    replay_filter=(fdo_gate.ReplayFilter(lock=_thread.allocate_lock())
+                                   if _gate_options["replay_filter"] else None),
+                )
+    return _gate
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_LOG_FILE = "mcp_server.log"
+DEFAULT_LOG_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_LOG_BACKUPS = 3
+
+# Binary transport framing; ATTACHMENT is the message key the frame's raw
+# bytes travel under inside the server (never serialized as JSON).
+FRAME = struct.Struct("!II")
+ATTACHMENT = "_attachment"
+# Cap on one frame's JSON plus attachment, or one line (--max-frame-size); a
+# frame's length header is checked before any of its body is buffered.
+DEFAULT_MAX_FRAME_SIZE = 64 * 1024 * 1024
+max_frame_size = DEFAULT_MAX_FRAME_SIZE
+
+
+class FrameTooLarge(ValueError):
+    """A frame (or line) longer than max_frame_size bytes; the stream cannot resync."""
+
+
+def _check_frame(json_length, attachment_length):
+    size = json_length + attachment_length
+    if size > max_frame_size:
+        raise FrameTooLarge(f"frame of {size} bytes exceeds the {max_frame_size}-byte limit")
+
+
+class _Sampler:
+    """Lets through one call in every `every` (1 = all); counter based, no randomness."""
+
+    def __init__(self, rate=1.0):
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._count = 0
+
+    def take(self):
+        if self.every == 1:
+            return True
+        if not self.every:
+            return False
+        self._count += 1
+        return self._count % self.every == 0
+
+
+_verdict_sampler = _Sampler()
+
+
+def log_verdict(is_valid, msg):
+    """Per-packet Allowed/BLOCK line: level check and sampling before any formatting."""
+    level = _INFO if is_valid else _WARNING
+    if not verdict_logger.isEnabledFor(level) or not _verdict_sampler.take():
+        return
+    if is_valid:
+        verdict_logger.info("Layer 5 Allowed: Packet accepted. Msg: %s", msg)
+    else:
+        verdict_logger.warning("Layer 5 BLOCK: Packet rejected. Reason: %s", msg)
+
+
+def _install_queue_handler(handler, level, sample_rate):
+    import logging
+
+    root = logging.getLogger("fdo_gate")
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    root.propagate = False
+    _verdict_sampler.__init__(sample_rate)
+
+
+def setup_logging(path=DEFAULT_LOG_FILE, level=_INFO, max_bytes=DEFAULT_LOG_MAX_BYTES,
+                  backup_count=DEFAULT_LOG_BACKUPS, sample_rate=1.0, log_queue=None):
+    """
+    Route fdo_gate.* logging through a queue to a QueueListener thread that
+    writes a size-rotated file, so request handling never waits on disk.
+    Pass a multiprocessing queue as `log_queue` when worker processes log
+    too (see _init_worker). Per-packet verdict lines are kept at
+    `sample_rate` (1.0 = every line). Returns the started listener; call
+    its stop() to flush on shutdown.
+    """
+    import logging.handlers
+    import queue
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    if log_queue is None:
+        log_queue = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(log_queue)
+        # The listener is in-process: queue records as-is, unformatted.
+        handler.prepare = lambda record: record
+    else:
+        handler = logging.handlers.QueueHandler(log_queue)
+    _install_queue_handler(handler, level, sample_rate)
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=False)
+    listener.start()
+    return listener
+
+
+def _init_worker(log_queue, level, sample_rate, gate_options=None):
+    """ProcessPoolExecutor initializer: forward worker logging to the parent's listener."""
+    import logging.handlers
+
+    _install_queue_handler(logging.handlers.QueueHandler(log_queue), level, sample_rate)
+    use_fast_json()
+    if gate_options:
+        configure_gate(**gate_options)
+
+
+# fdo_gate.VERDICT_NAMES spelled out, so listing tools does not import the
+# gate (scripts/test_mcp_startup.py checks the two agree).
+VERDICT_CODES = "0=forwarded, 1=too_short, 2=checksum_mismatch, 3=epoch_expired, 4=policy_rejected, 5=replayed"
+
+SERVER_INFO = {"name": "fdo-gate-mcp", "version": "0.1.0"}
+INITIALIZE_RESULT = {
+    "protocolVersion": "2024-11-05",
+    "capabilities": {
+        "tools": {}
+    },
+    "serverInfo": SERVER_INFO,
+}
+TOOLS = [
+    {
+        "name": "validate_segment",
+        "description": "Validate a DOIP segment header against governance policies.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "header_hex": {
+                    "type": "string",
+                    "description": "16-byte header in hex format"
+                },
+                "payload_hex": {
+                    "type": "string",
+                    "description": "Payload in hex format (optional)",
+                    "default": ""
+                },
+                "packet": {
+                    "type": "string",
+                    "description": "Whole packet (header + payload) per `encoding`, instead of header_hex/payload_hex"
+                },
+                "encoding": {"type": "string", "enum": ["hex", "base64"], "default": "hex"}
+            }
+        }
+    },
+     {
+        "name": "create_packet",
+        "description": "Create a valid DOIP packet with governance header.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                 "magic": {"type": "integer"},
+                 "sequence": {"type": "integer"},
+                 "policy_id": {"type": "integer"},
+                 "payload_hex": {"type": "string", "default": ""},
+                 "fingerprint": {"type": "integer", "description": "I/O fingerprint (default 0xDEADBEEF ^ sequence)"},
+                 "rlcp_flags": {"type": "integer", "default": 0}
             },
-            "serverInfo": {
-                "name": "fdo-gate-mcp",
-                "version": "0.1.0"
+            "required": ["magic", "sequence", "policy_id"]
+        }
+    },
+    {
+        "name": "validate_segments",
+        "description": (
+            "Validate many DOIP packets (header + payload) in one call. Pass either "
+            "`packets` (array of hex strings) or `blob` (all packets concatenated, "
+            "hex or base64 per `encoding`) with `offsets` (N+1 packet boundaries). "
+            "Returns one verdict code per packet: "
+            + VERDICT_CODES
+            + ". On the binary transport the packets may instead be the request "
+            "attachment, and verdicts come back as the response attachment (one byte each)."
+        ),
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "packets": {"type": "array", "items": {"type": "string"}},
+                "blob": {"type": "string"},
+                "offsets": {"type": "array", "items": {"type": "integer"}},
+                "encoding": {"type": "string", "enum": ["hex", "base64"], "default": "hex"},
+                "details": {
+                    "type": "boolean",
+                    "default": False,
+                    "description": "also return drop reasons, keyed by packet index"
+                }
             }
         }
+    },
+    {
+        "name": "create_packets",
+        "description": (
+            "Create many valid DOIP packets in one call. Returns `blob` (all packets "
+            "concatenated, hex or base64 per `encoding`) and `offsets` (N+1 boundaries), "
+            "ready to pass to validate_segments. With `encoding` \"binary\" (binary "
+            "transport only) the packets are the response attachment instead of `blob`."
+        ),
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "policy_ids": {"type": "array", "items": {"type": "integer"}},
+                "magic": {"type": "integer", "default": 0xFD01},
+                "payload_hex": {"type": "string", "default": "", "description": "payload shared by every packet"},
+                "payloads_hex": {"type": "array", "items": {"type": "string"}, "description": "one payload per packet"},
+                "fingerprints": {"type": "array", "items": {"type": "integer"}},
+                "sequences": {"type": "array", "items": {"type": "integer"}},
+                "rlcp_flags": {"type": "integer", "default": 0},
+                "encoding": {"type": "string", "enum": ["hex", "base64", "binary"], "default": "hex"}
+            },
+            "required": ["policy_ids"]
+        }
     }
+]
+
+# Handshake results serialized once: initialize and tools/list responses only
+# splice the request id in (see precomputed_response).
+PRECOMPUTED_RESULTS = {
+    "initialize": _dumps(INITIALIZE_RESULT),
+    "tools/list": _dumps({"tools": TOOLS}),
+}
+
+
+def handle_initialize(request_id):
+    return {"jsonrpc": "2.0", "id": request_id, "result": INITIALIZE_RESULT}
+
 
 def handle_list_tools(request_id):
-    return {
-        "jsonrpc": "2.0",
-        "id": request_id,
-        "result": {
-            "tools": [
-                {
-                    "name": "validate_segment",
-                    "description": "Validate a DOIP segment header against governance policies.",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "header_hex": {
-                                "type": "string",
-                                "description": "16-byte header in hex format"
-                            },
-                            "payload_hex": {
-                                "type": "string",
-                                "description": "Payload in hex format (optional)",
-                                "default": ""
-                            }
-                        },
-                        "required": ["header_hex"]
-                    }
-                },
-                 {
-                    "name": "create_packet",
-                    "description": "Create a valid DOIP packet with governance header.",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                             "magic": {"type": "integer"},
-                             "sequence": {"type": "integer"},
-                             "policy_id": {"type": "integer"},
-                             "payload_hex": {"type": "string", "default": ""}
-                        },
-                        "required": ["magic", "sequence", "policy_id"]
-                    }
-                }
-            ]
-        }
-    }
+    return {"jsonrpc": "2.0", "id": request_id, "result": {"tools": TOOLS}}
+
+
+def precomputed_response(msg, wrap):
+    """Encoded initialize/tools/list response for `msg` (framed by `wrap`), else None."""
+    result = PRECOMPUTED_RESULTS.get(msg.get("method"))
+    if result is None:
+        return None
+    request_id = _dumps(msg.get("id"))
+    return wrap(b'{"jsonrpc":"2.0","id":' + request_id + b',"result":' + result + b"}")
 
 def handle_call_tool(request, request_id):
     params = request.get("params", {})
@@ -99,23 +413,28 @@ def handle_call_tool(request, request_id):
 
     if name == "validate_segment":
         try:
-            header_hex = args.get("header_hex", "")
-            payload_hex = args.get("payload_hex", "")
-            
-            # Clean hex strings (remove 0x prefix if present)
-            if header_hex.startswith("0x"): header_hex = header_hex[2:]
-            if payload_hex.startswith("0x"): payload_hex = payload_hex[2:]
+            gate = get_gate()
+            if "packet" in args or ("header_hex" not in args and request.get(ATTACHMENT)):
+                # Whole packet in one field (or the binary attachment): split at the header.
+                packet = request[ATTACHMENT] if "packet" not in args else decode_bytes(
+                    args["packet"], args.get("encoding", "hex")
+                )
+                header_bytes, payload_bytes = packet[:16], packet[16:]
+            else:
+                header_hex = args.get("header_hex", "")
+                payload_hex = args.get("payload_hex", "")
 
-            header_bytes = bytes.fromhex(header_hex)
-            payload_bytes = bytes.fromhex(payload_hex) if payload_hex else b''
+                # Clean hex strings (remove 0x prefix if present)
+                if header_hex.startswith("0x"): header_hex = header_hex[2:]
+                if payload_hex.startswith("0x"): payload_hex = payload_hex[2:]
+
+                header_bytes = bytes.fromhex(header_hex)
+                payload_bytes = bytes.fromhex(payload_hex) if payload_hex else b''
             
             is_valid, msg = gate.validate_segment(header_bytes, payload_bytes)
             
             # Log Layer 5 Defense Outcome
-            if is_valid:
-                logging.info(f"Layer 5 Allowed: Packet accepted. Msg: {msg}")
-            else:
-                logging.warning(f"Layer 5 BLOCK: Packet rejected. Reason: {msg}")
+            log_verdict(is_valid, msg)
 
             return {
                 "jsonrpc": "2.0",
@@ -123,12 +442,12 @@ def handle_call_tool(request, request_id):
                 "result": {
                     "content": [{
                         "type": "text",
-                        "text": json.dumps({"valid": is_valid, "message": msg})
+                        "text": _dumps({"valid": is_valid, "message": msg}).decode()
                     }]
                 }
             }
         except Exception as e:
-            logging.error(f"Error in validate_segment: {e}")
+            logger.error("Error in validate_segment: %s", e)
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
@@ -137,6 +456,7 @@ def handle_call_tool(request, request_id):
     
     elif name == "create_packet":
         try:
+            gate = get_gate()
             magic = args.get("magic")
             sequence = args.get("sequence")
             policy_id = args.get("policy_id")
@@ -145,7 +465,10 @@ def handle_call_tool(request, request_id):
             if payload_hex.startswith("0x"): payload_hex = payload_hex[2:]
             payload = bytes.fromhex(payload_hex) if payload_hex else b''
             
-            packet = gate.create_packet(magic, sequence, policy_id, payload)
+            packet = gate.create_packet(
+                magic, sequence, policy_id, payload,
+                fingerprint=args.get("fingerprint"), rlcp_flags=args.get("rlcp_flags", 0),
+            )
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
@@ -157,44 +480,776 @@ def handle_call_tool(request, request_id):
                 }
             }
         except Exception as e:
-             logging.error(f"Error in create_packet: {e}")
+             logger.error("Error in create_packet: %s", e)
              return {
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "error": {"code": -32603, "message": str(e)}
             }
 
+    elif name == "validate_segments":
+        try:
+            gate = get_gate()
+            encoding = args.get("encoding", "hex")
+            binary = ATTACHMENT in request
+            if binary and "blob" not in args and "packets" not in args:
+                packets = request[ATTACHMENT]
+                offsets = args.get("offsets")
+                if offsets is None:
+                    raise ValueError("an attachment requires `offsets`")
+            elif "blob" in args:
+                packets = decode_bytes(args["blob"], encoding)
+                offsets = args.get("offsets")
+                if offsets is None:
+                    raise ValueError("`blob` requires `offsets`")
+            else:
+                packets = [decode_bytes(p, encoding) for p in args.get("packets", [])]
+                offsets = None
+
+            result = {}
+            if args.get("details"):
+                verdicts, reasons = gate.explain_batch(packets, offsets)
+                result["reasons"] = {str(index): reason for index, reason in reasons.items()}
+            else:
+                verdicts = gate.validate_batch(packets, offsets)
+            forwarded = verdicts.count(_import_fdo_gate().VERDICT_FORWARDED)
+            if forwarded != len(verdicts):
+                logger.warning(
+                    "Layer 5 BLOCK: %d of %d packets rejected", len(verdicts) - forwarded, len(verdicts)
+                )
+            if binary:
+                # Verdict codes all fit in a byte: ship them raw instead of as a JSON array.
+                result = {"count": len(verdicts), "forwarded": forwarded, **result}
+            else:
+                result = {"count": len(verdicts), "forwarded": forwarded, "verdicts": list(verdicts), **result}
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [{
+                        "type": "text",
+                        "text": _dumps(result).decode()
+                    }]
+                }
+            }
+            if binary:
+                response[ATTACHMENT] = bytes(verdicts)
+            return response
+        except Exception as e:
+            logger.error("Error in validate_segments: %s", e)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": -32603, "message": str(e)}
+            }
+
+    elif name == "create_packets":
+        try:
+            gate = get_gate()
+            policy_ids = args["policy_ids"]
+            if "payloads_hex" in args:
+                payloads = [decode_bytes(p, "hex") for p in args["payloads_hex"]]
+            else:
+                payloads = decode_bytes(args.get("payload_hex", ""), "hex")
+            buffer, offsets = gate.create_packets(
+                args.get("magic", 0xFD01), policy_ids, payloads,
+                fingerprints=args.get("fingerprints"),
+                rlcp_flags=args.get("rlcp_flags", 0),
+                sequences=args.get("sequences"),
+            )
+            encoding = args.get("encoding", "hex")
+            if encoding == "binary":
+                if ATTACHMENT not in request:
+                    raise ValueError("encoding \"binary\" requires the binary transport")
+                result = {"offsets": offsets}
+            else:
+                result = {"blob": encode_bytes(buffer, encoding), "offsets": offsets}
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [{
+                        "type": "text",
+                        "text": _dumps(result).decode()
+                    }]
+                }
+            }
+            if encoding == "binary":
+                response[ATTACHMENT] = bytes(buffer)
+            return response
+        except Exception as e:
+            logger.error("Error in create_packets: %s", e)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": -32603, "message": str(e)}
+            }
+
     return {
         "jsonrpc": "2.0",
         "id": request_id,
         "error": {"code": -32601, "message": f"Method {name} not found"}
     }
 
-def main():
+
+def decode_bytes(value, encoding="hex"):
+    """Tool argument (hex, optionally 0x-prefixed, or base64) to bytes."""
+    if encoding == "base64":
+        import base64
+        import binascii
+
+        try:
+            return base64.b64decode(value, validate=True)
+        except binascii.Error as e:
+            raise ValueError(f"invalid base64: {e}") from None
+    if value.startswith("0x"):
+        value = value[2:]
+    return bytes.fromhex(value)
+
+
+def encode_bytes(data, encoding="hex"):
+    if encoding == "base64":
+        import base64
+
+        return base64.b64encode(data).decode("ascii")
+    return data.hex()
+
+def frame_line(body):
+    return body + b"\n"
+
+
+def frame_binary(body, attachment=b""):
+    return FRAME.pack(len(body), len(attachment)) + body + attachment
+
+
+def encode_message(msg):
+    """One JSON-RPC message as a newline-terminated UTF-8 line."""
+    return frame_line(_dumps(msg))
+
+
+def encode_frame(msg):
+    """One JSON-RPC message as a binary-transport frame, attachment last."""
+    attachment = msg.pop(ATTACHMENT, b"")
+    return frame_binary(_dumps(msg), attachment)
+
+
+def send_message(msg, stream=None):
+    """Write one JSON-RPC message to stdout (or a binary `stream`) as a line and flush."""
+    stream = stream or sys.stdout.buffer
+    stream.write(encode_message(msg))
+    stream.flush()
+
+
+def read_message(stream=None):
+    """
+    Next JSON-RPC message from stdin (or a binary `stream`), read the way
+    read_line_message reads one: blank lines are skipped and a line over
+    max_frame_size is refused. Returns None at EOF or on a malformed line
+    (logged). The server itself reads through the asyncio transports.
+    """
+    stream = stream or sys.stdin.buffer
+    try:
+        while True:
+            line = stream.readline(max_frame_size + 1)
+            if not line:
+                return None
+            if len(line) > max_frame_size and not line.endswith(b"\n"):
+                raise FrameTooLarge(f"line exceeds the {max_frame_size}-byte limit")
+            if line.strip():
+                return _loads(line)
+    except ValueError as e:
+        logger.error("Error reading message: %s", e)
+        return None
+
+
+async def read_line_message(reader):
+    """Next message from a line-delimited stream: dict, None at EOF, or ValueError."""
     while True:
-        msg = read_message()
-        if not msg:
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # The reader's limit is max_frame_size; the rest of the line cannot be resynced.
+            raise FrameTooLarge(f"line exceeds the {max_frame_size}-byte limit") from None
+        if not line:
+            return None
+        if line.strip():
+            return _loads(line)
+
+
+async def read_frame_message(reader):
+    """Next message from a binary-transport stream, its attachment under ATTACHMENT."""
+    import asyncio
+
+    try:
+        json_length, attachment_length = FRAME.unpack(await reader.readexactly(FRAME.size))
+        _check_frame(json_length, attachment_length)
+        data = await reader.readexactly(json_length + attachment_length)
+    except asyncio.IncompleteReadError:
+        return None
+    msg = _loads(data[:json_length])
+    msg[ATTACHMENT] = data[json_length:]
+    return msg
+
+
+# Handshake messages are small: answer_handshake() passes anything bigger to
+# the full server undecoded, so it never buffers more than this plus one read.
+HANDSHAKE_MESSAGE_LIMIT = 64 * 1024
+HANDSHAKE_METHODS = ("initialize", "notifications/initialized", "tools/list")
+
+
+def peek_line_message(data, searched=0):
+    """
+    (message, end) for the first line of the handshake buffer `data`: end > 0
+    once the line is complete (message None for a blank line), 0 while it is
+    not, -1 when it is too long to be a handshake message. `searched` bytes
+    are known to hold no newline, so a growing line is scanned only once.
+    """
+    end = data.find(b"\n", searched) + 1
+    if not end:
+        return None, -1 if len(data) > HANDSHAKE_MESSAGE_LIMIT else 0
+    line = data[:end]
+    return (_loads(line) if line.strip() else None), end
+
+
+def peek_frame_message(data, searched=0):
+    """
+    (message, end) for the first frame of the handshake buffer `data`, as
+    peek_line_message. The header is checked against max_frame_size, and a
+    frame whose JSON names a method outside the handshake is given up (-1)
+    before its attachment is waited for.
+    """
+    if len(data) < FRAME.size:
+        return None, 0
+    json_length, attachment_length = FRAME.unpack_from(data)
+    _check_frame(json_length, attachment_length)
+    if json_length > HANDSHAKE_MESSAGE_LIMIT:
+        return None, -1
+    body = FRAME.size + json_length
+    if len(data) < body:
+        return None, 0
+    msg = _loads(data[FRAME.size:body])
+    if msg.get("method") not in HANDSHAKE_METHODS or attachment_length > HANDSHAKE_MESSAGE_LIMIT:
+        return None, -1
+    end = body + attachment_length
+    if len(data) < end:
+        return None, 0
+    msg[ATTACHMENT] = bytes(data[body:end])
+    return msg, end
+
+
+# transport -> (async stream reader, message encoder, body framer, handshake peek)
+TRANSPORTS = {
+    "lines": (read_line_message, encode_message, frame_line, peek_line_message),
+    "binary": (read_frame_message, encode_frame, frame_binary, peek_frame_message),
+}
+
+
+def handle_message(msg):
+    """Dispatch one parsed message; returns the response dict or None."""
+    method = msg.get("method")
+    request_id = msg.get("id")
+
+    if logger.isEnabledFor(_DEBUG):
+        logger.debug("Received method: %s", method)
+
+    if method == "initialize":
+        return handle_initialize(request_id)
+    elif method == "notifications/initialized":
+        # No response needed
+        return None
+    elif method == "tools/list":
+        return handle_list_tools(request_id)
+    elif method == "tools/call":
+        return handle_call_tool(msg, request_id)
+    # Ignore other messages
+    return None
+
+
+def handle_batch(messages, encode=encode_message):
+    """Worker-pool job: handle several tools/call messages, return their encoded responses."""
+    out = []
+    for msg in messages:
+        response = handle_message(msg)
+        if response is not None:
+            out.append(encode(response))
+    return b"".join(out)
+
+
+class MCPServer:
+    """
+    One session's pipelined loop (stdio or a socket connection): concurrent
+    tools/call jobs, coalesced out-of-order writes. Flow control is per
+    session: reading stops while `max_inflight` jobs are outstanding and
+    whenever the writer's buffer is above its high-water mark.
+    """
+
+    def __init__(self, executor, batch_size=DEFAULT_BATCH_SIZE, max_inflight=8, transport="lines"):
+        self.executor = executor
+        self.read_message, self.encode, self.wrap, _ = TRANSPORTS[transport]
+        self.batch_size = batch_size
+        self.max_inflight = max_inflight
+        self._pending = []
+        self._out = []
+        self._inflight = 0
+        self._idle = None
+        self._writer = None
+        self._loop = None
+
+    async def serve(self, reader, writer):
+        import asyncio
+
+        self._loop = asyncio.get_running_loop()
+        self._writer = writer
+        self._idle = asyncio.Event()
+        self._idle.set()
+        while True:
+            try:
+                msg = await self.read_message(reader)
+            except FrameTooLarge as e:
+                logger.error("Closing session: %s", e)
+                break
+            except ValueError as e:
+                logger.error("Error reading message: %s", e)
+                continue
+            if msg is None:
+                break
+            if msg.get("method") == "tools/call":
+                self._queue_call(msg)
+            else:
+                response = precomputed_response(msg, self.wrap)
+                if response is None:
+                    response = handle_message(msg)
+                    response = None if response is None else self.encode(response)
+                if response is not None:
+                    self._send(response)
+            if self._inflight >= self.max_inflight:
+                await self._wait_below(self.max_inflight)
+            await writer.drain()
+        self._submit_pending()
+        await self._wait_below(1)
+        self._flush()
+        await writer.drain()
+
+    def _queue_call(self, msg):
+        # Calls read in the same loop pass are submitted together once the
+        # reader has drained its buffer (call_soon runs after it yields); a
+        # full batch goes at once, so serve() holds it to max_inflight.
+        if not self._pending:
+            self._loop.call_soon(self._submit_pending)
+        self._pending.append(msg)
+        if len(self._pending) >= self.batch_size:
+            self._submit_pending()
+
+    def _submit_pending(self):
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            self._inflight += 1
+            self._idle.clear()
+            future = self._loop.run_in_executor(self.executor, handle_batch, batch, self.encode)
+            future.add_done_callback(lambda future, batch=batch: self._batch_done(future, batch))
+
+    def _batch_done(self, future, batch):
+        self._inflight -= 1
+        self._idle.set()
+        try:
+            data = future.result()
+        except Exception as e:
+            # The whole job failed (e.g. a worker process died): every call in
+            # it still gets an answer, or its client would wait forever.
+            logger.error("Error in worker batch: %s", e)
+            data = b"".join(
+                self.encode({"jsonrpc": "2.0", "id": msg.get("id"), "error": {"code": -32603, "message": str(e)}})
+                for msg in batch if msg.get("id") is not None
+            )
+        if data:
+            self._send(data)
+
+    async def _wait_below(self, limit):
+        while self._inflight >= limit:
+            self._idle.clear()
+            await self._idle.wait()
+
+    def _send(self, data):
+        if not self._out:
+            self._loop.call_soon(self._flush)
+        self._out.append(data)
+
+    def _flush(self):
+        if self._out:
+            data = b"".join(self._out)
+            self._out = []
+            self._writer.write(data)
+
+
+class _FileWriter:
+    """StreamWriter stand-in for a stdout redirected to a regular file."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+
+    async def drain(self):
+        pass
+
+
+def _load_runtime(argv):
+    """
+    Parse the command line, import the serving machinery and compile the
+    gate; runs in the background while the handshake is answered. Returns
+    the parsed arguments.
+    """
+    args = parse_args(argv)
+    configure_gate(args.policy_file, args.replay_filter)
+    import asyncio  # noqa: F401
+    import base64  # noqa: F401
+    import concurrent.futures  # noqa: F401
+    import logging.handlers  # noqa: F401
+
+    use_fast_json()
+    try:
+        get_gate()
+    except Exception as e:
+        # Left for the first tools/call to raise as a JSON-RPC error.
+        logger.error("Deferred gate initialization failed: %s", e)
+    return args
+
+
+class _Loader:
+    """`load` run on a daemon thread; join() returns its result or raises what it raised."""
+
+    def __init__(self, load):
+        # threading (functools, collections, ...) is first imported here, once
+        # initialize is answered, and must be imported by the main thread.
+        import threading
+
+        self._load = load
+        self._result = self._error = None
+        self._thread = threading.Thread(target=self._run, name="mcp-runtime-loader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._result = self._load()
+        except BaseException as e:  # argparse usage errors are SystemExit
+            self._error = e
+
+    def join(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def answer_handshake(transport="lines", fd_in=0, fd_out=1, load=None):
+    """
+    Serve the session handshake synchronously on raw file descriptors:
+    initialize and tools/list get their pre-serialized responses, and
+    `load` (if given) runs in a background thread once the first one is
+    written (started earlier, the thread's imports hold the GIL while
+    initialize waits).
+    Returns (unconsumed input, _Loader or None) as soon as a message
+    needs the full server (a non-handshake method, or more than
+    HANDSHAKE_MESSAGE_LIMIT bytes), is malformed or oversized, or the input
+    ends; the caller replays those bytes, and the server reports any error.
+    """
+    wrap, peek = TRANSPORTS[transport][2:]
+    data = bytearray()
+    searched = 0
+    loader = None
+    while True:
+        try:
+            msg, end = peek(data, searched)
+        except ValueError:
             break
-        
-        method = msg.get("method")
-        request_id = msg.get("id")
-        
-        logging.debug(f"Received method: {method}")
-
-        if method == "initialize":
-            send_message(handle_initialize(request_id))
-        elif method == "notifications/initialized":
-            # No response needed
-            pass
-        elif method == "tools/list":
-            send_message(handle_list_tools(request_id))
-        elif method == "tools/call":
-            send_message(handle_call_tool(msg, request_id))
+        if end < 0:
+            break
+        if not end:
+            searched = len(data)
+            chunk = os.read(fd_in, 65536)
+            if not chunk:
+                break
+            data += chunk
+            continue
+        if msg is not None:
+            if msg.get("method") not in HANDSHAKE_METHODS:
+                break
+            response = precomputed_response(msg, wrap)
+            if response is not None:
+                os.write(fd_out, response)
+        del data[:end]
+        searched = 0
+        if loader is None and load is not None:
+            loader = _Loader(load)
+    return bytes(data), loader
+
+
+async def _stdio_streams(prefix=b""):
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=max_frame_size)
+    if prefix:
+        reader.feed_data(prefix)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except ValueError:
+        # Regular files cannot back a pipe transport; feed the reader from a thread.
+        def pump():
+            data = sys.stdin.buffer.read()
+            loop.call_soon_threadsafe(reader.feed_data, data)
+            loop.call_soon_threadsafe(reader.feed_eof)
+        loop.run_in_executor(None, pump)
+    try:
+        transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+        writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+    except ValueError:
+        writer = _FileWriter(sys.stdout.buffer)
+    return reader, writer
+
+
+async def _serve(args, prefix=b""):
+    import concurrent.futures
+
+    import logging
+
+    use_fast_json()
+    level = getattr(logging, args.log_level.upper())
+    if args.pool == "process":
+        import multiprocessing
+
+        log_queue = multiprocessing.Queue()
+    else:
+        log_queue = None
+    listener = setup_logging(
+        args.log_file, level, args.log_max_bytes, args.log_backups, args.log_sample, log_queue
+    )
+    if args.pool == "process":
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=args.workers, initializer=_init_worker,
+            initargs=(log_queue, level, args.log_sample, dict(_gate_options)),
+        )
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=args.workers)
+    try:
+        if args.listen:
+            await _serve_socket(args, executor)
         else:
-            # Ignore other messages or return error if it's a request
-            if request_id:
-                 # Minimal error response for unknown methods
-                 pass
+            reader, writer = await _stdio_streams(prefix)
+            server = MCPServer(
+                executor, batch_size=args.batch_size, max_inflight=2 * args.workers, transport=args.transport
+            )
+            await server.serve(reader, writer)
+    finally:
+        executor.shutdown(wait=True)
+        listener.stop()
+
+
+def _unlink_stale_socket(path):
+    """Remove a socket file left behind by a dead server; refuse to take over a live one."""
+    import socket
+    import stat
+
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise RuntimeError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"{path} is already served by a running gate service")
+
+
+async def _serve_socket(args, executor):
+    """Resident mode: serve MCP sessions on a Unix socket until cancelled or SIGTERM."""
+    import asyncio
+    import signal
+
+    if args.pool == "thread":
+        get_gate()  # compile the policy table once, before the first session needs it
+    sessions = asyncio.Semaphore(args.max_sessions)
+
+    async def session(reader, writer):
+        # Connections beyond --max-sessions stay queued (unread) until a slot frees.
+        async with sessions:
+            server = MCPServer(
+                executor, batch_size=args.batch_size, max_inflight=2 * args.workers, transport=args.transport
+            )
+            logger.info("Session opened")
+            try:
+                await server.serve(reader, writer)
+            except ConnectionError as e:
+                logger.info("Session dropped: %s", e)
+            finally:
+                writer.close()
+            logger.info("Session closed")
+
+    _unlink_stale_socket(args.listen)
+    server = await asyncio.start_unix_server(session, path=args.listen, limit=max_frame_size)
+    os.chmod(args.listen, 0o600)
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    logger.info("Gate service listening on %s", args.listen)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(args.listen):
+            os.unlink(args.listen)
+
+
+def bridge(path, fd_in=0, out=None):
+    """
+    --connect: relay this process's stdio to a resident server's socket, so a
+    per-session spawn costs a connect instead of a gate build. Returns when
+    the server closes the connection.
+    """
+    import socket
+    import threading
+
+    out = out or sys.stdout.buffer
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+
+    def upstream():
+        try:
+            while True:
+                chunk = os.read(fd_in, 65536)
+                if not chunk:
+                    break
+                sock.sendall(chunk)
+            sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass  # server went away; the read side below sees EOF
+
+    threading.Thread(target=upstream, name="mcp-bridge", daemon=True).start()
+    try:
+        while True:
+            data = sock.recv(1 << 20)
+            if not data:
+                break
+            out.write(data)
+            out.flush()
+    finally:
+        sock.close()
+
+
+# The options of a stdio session, and whether each takes a value: main()
+# reads these off argv itself, so the handshake is answered before argparse
+# (and re, gettext, ... behind it) is imported. scripts/test_mcp_server.py
+# checks the table against build_parser().
+_STDIO_OPTIONS = {
+    "--max-sessions": True, "--policy-file": True, "--replay-filter": False, "--transport": True,
+    "--max-frame-size": True, "--pool": True, "--workers": True, "--batch-size": True,
+    "--log-file": True, "--log-level": True, "--log-max-bytes": True, "--log-backups": True,
+    "--log-sample": True,
+}
+
+
+def _stdio_options(argv):
+    """
+    (transport, max frame size) of a stdio session read straight off argv,
+    or None unless every argument is one of _STDIO_OPTIONS spelled out in
+    full: other modes, --help and abbreviations are left to argparse.
+    """
+    options = {}
+    args = iter(argv)
+    for arg in args:
+        name, equals, value = arg.partition("=")
+        takes_value = _STDIO_OPTIONS.get(name)
+        if takes_value is None or (equals and not takes_value):
+            return None
+        if takes_value and not equals:
+            value = next(args, None)
+            if value is None:
+                return None
+        options[name] = value
+    transport = options.get("--transport", "lines")
+    frame_size = options.get("--max-frame-size", str(DEFAULT_MAX_FRAME_SIZE))
+    if transport not in TRANSPORTS or not frame_size.isdigit():
+        return None
+    return transport, int(frame_size)
+
+
+def build_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FDO Gate MCP server (stdio or Unix socket)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--listen", metavar="PATH",
+                      help="stay resident and serve concurrent sessions on this Unix socket")
+    mode.add_argument("--connect", metavar="PATH",
+                      help="relay stdio to a resident server listening on this Unix socket")
+    parser.add_argument("--max-sessions", type=int, default=64,
+                        help="concurrent socket sessions; further connections wait")
+    parser.add_argument("--policy-file", default=POLICY_FILE, help="policy dictionary or MsBV snapshot")
+    parser.add_argument("--replay-filter", action="store_true",
+                        help="drop headers replayed inside the epoch drift window (shared by all sessions)")
+    parser.add_argument("--transport", choices=tuple(TRANSPORTS), default="lines",
+                        help="stdio framing: JSON lines, or length-prefixed frames with binary attachments")
+    parser.add_argument("--max-frame-size", type=int, default=DEFAULT_MAX_FRAME_SIZE,
+                        help="close a session that sends a larger frame or line (bytes)")
+    parser.add_argument("--pool", choices=("thread", "process"), default="thread",
+                        help="worker pool for tools/call (process = parallel CPU-bound gate work)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="max tools/call requests per worker job")
+    parser.add_argument("--log-file", default=os.environ.get("FDO_MCP_LOG_FILE", DEFAULT_LOG_FILE))
+    parser.add_argument("--log-level", default=os.environ.get("FDO_MCP_LOG_LEVEL", "INFO"),
+                        choices=("DEBUG", "INFO", "WARNING", "ERROR"), type=str.upper)
+    parser.add_argument("--log-max-bytes", type=int, default=DEFAULT_LOG_MAX_BYTES,
+                        help="rotate the log file at this size")
+    parser.add_argument("--log-backups", type=int, default=DEFAULT_LOG_BACKUPS)
+    parser.add_argument("--log-sample", type=float,
+                        default=float(os.environ.get("FDO_MCP_LOG_SAMPLE", "1.0")),
+                        help="fraction of per-packet Allowed/BLOCK lines to keep (0 disables them)")
+    return parser
+
+
+def parse_args(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.replay_filter and args.pool == "process":
+        parser.error("--replay-filter needs --pool thread: the replay cache lives in one process")
+    return args
+
+
+def main(argv=None):
+    global max_frame_size
+    argv = sys.argv[1:] if argv is None else list(argv)
+    stdio = _stdio_options(argv)
+    if stdio is None:
+        args = parse_args(argv)
+        if args.connect:
+            bridge(args.connect)
+            return
+        if not args.listen:
+            stdio = args.transport, args.max_frame_size
+    prefix = b""
+    if stdio is not None:
+        # argparse runs in the loader thread, after initialize is answered.
+        transport, max_frame_size = stdio
+        prefix, loader = answer_handshake(transport, load=lambda: _load_runtime(argv))
+        args = loader.join() if loader is not None else _load_runtime(argv)
+    else:
+        configure_gate(args.policy_file, args.replay_filter)
+        max_frame_size = args.max_frame_size
+    import asyncio
+
+    try:
+        asyncio.run(_serve(args, prefix))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
 
 if __name__ == "__main__":
     main()